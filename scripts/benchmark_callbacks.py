@@ -0,0 +1,344 @@
+import argparse
+import functools
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+from callback_timing import record_steps
+
+# Benchmark harness for the dashboard callbacks.
+#
+# Drives the callbacks with the recorded input traces of benchmark_traces.json
+# (one trace per dashboard module, replayed on each of its callbacks)
+# plus randomized traces (region subsets, rating slider sweeps, typed searches,
+# city lists, chart zooms, year scrubs) and reports, per callback:
+#
+#   - latency percentiles (p50 / p95 / p99) of the whole callback, including the
+#     JSON serialization Dash performs on its output;
+#   - the same percentiles for each step marked with callback_timing.step()
+#     (filter, sort, aggregate, figure) and for "serialize";
+#   - peak memory allocated per call (tracemalloc, measured in a separate pass);
+#   - the size of the serialized output.
+#
+# Results are written as JSON, and two result files can be compared, failing
+# when a callback got slower than a given factor.
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/benchmark_callbacks.py run --output before.json
+#   python scripts/benchmark_callbacks.py run --output after.json
+#   python scripts/benchmark_callbacks.py compare before.json after.json --max-slowdown 1.2
+
+CALLBACKS = [
+    "restaurants_dashboard.filter_restaurants",
+    "restaurants_dashboard.update_search_suggestions",
+    "restaurants_dashboard.update_top_restaurants",
+    "restaurants_dashboard.update_price_levels",
+    "restaurants_dashboard.top_cuisines_figure",
+    "restaurants_dashboard.update_table",
+    "restaurants_dashboard.update_map",
+    "dash_callbacks.update_chart",
+    "dash_callbacks_practice.update_chart",
+    "stock_dashboard.update_chart",
+    "tourism_dashboard.update_comparison",
+]
+TRACES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_traces.json")
+
+
+# Import a callback; memoized callbacks are unwrapped unless `cached` is set
+def load_callback(name, cached=False):
+    module_name, function_name = name.rsplit(".", 1)
+    module = importlib.import_module(module_name)
+    function = getattr(module, function_name)
+    if not cached and hasattr(function, "cache"):
+        snapshot = function.cache.snapshot
+        function = function.__wrapped__
+        if snapshot is not None:
+            # The callback takes the data snapshot the cache would pass it
+            function = functools.partial(function, snapshot())
+    return module, function
+
+
+# Randomized inputs for the callbacks of a module, built from the options it offers
+def random_trace(module, rng, length):
+    if module.__name__ == "restaurants_dashboard":
+        data = module.dashboard_data.get()
+        trace = []
+        while len(trace) < length:
+            selected_regions = rng.sample(data.regions, rng.randint(0, 4)) or None
+            if rng.random() < 0.4:
+                # Slider sweep: the user drags the lower handle across the range
+                high = 5
+                for tenth in range(0, 50, rng.randint(1, 5)):
+                    trace.append([selected_regions, [tenth / 10, high], None])
+            elif rng.random() < 0.5:
+                # Typing: one call per keystroke of a word from the search index
+                word = str(rng.choice(data.search_index.labels))
+                for end in range(1, len(word) + 1):
+                    trace.append([selected_regions, [0, 5], word[:end]])
+            else:
+                low, high = sorted(round(rng.uniform(0, 5), 1) for _ in range(2))
+                trace.append([selected_regions, [low, high], None])
+        return trace[:length]
+    if module.__name__ == "dash_callbacks":
+        # No dataset version: the version doesn't change during the benchmark
+        return [[rng.choice(module.city_data.get().cities), None] for _ in range(length)]
+    if module.__name__ == "dash_callbacks_practice":
+        return [
+            [rng.choice(module.cities), rng.choice(module.price_levels)] for _ in range(length)
+        ]
+    if module.__name__ == "stock_dashboard":
+        # Zooms / pans: random windows of the series, from a few days to all of it
+        first, last = module.close_pyramid.bounds
+        trace = []
+        for _ in range(length):
+            width = (last - first) * rng.uniform(0.001, 1)
+            start = rng.uniform(first, last - width)
+            trace.append([[int(start), int(start + width)], rng.choice(["minmax", "lttb"])])
+        return trace
+    if module.__name__ == "tourism_dashboard":
+        # Year slider scrubs over a few countries
+        countries = module.tourism_cube.countries.tolist()
+        return [
+            [rng.sample(countries, rng.randint(1, 8)), rng.choice(module.years)]
+            for _ in range(length)
+        ]
+    return []
+
+
+# Random map pans / zooms over Greece, as sent by the map in relayoutData
+# (arguments of update_map, with no dataset version)
+def random_viewports(rng, length):
+    return [
+        [
+            {
+                "map.center": {"lon": rng.uniform(20, 28), "lat": rng.uniform(35, 41.5)},
+                "map.zoom": rng.uniform(5, 17),
+            },
+            None,
+        ]
+        for _ in range(length)
+    ]
+
+
+# Adapt the recorded / random inputs of a module to one of its callbacks
+def callback_inputs(name, module, inputs, rng):
+    if name == "restaurants_dashboard.update_map":
+        # Not driven by the filters: one initial view, then random viewports
+        # (the dataset version doesn't change during the benchmark)
+        return [[None, None]] + random_viewports(rng, len(inputs) - 1)
+    if module.__name__ == "dash_callbacks":
+        # Recorded traces have no dataset version
+        return [(args + [None])[:2] for args in inputs]
+    if module.__name__ == "restaurants_dashboard":
+        # Recorded traces have no search box value
+        inputs = [(args + [None])[:3] for args in inputs]
+    if name == "restaurants_dashboard.filter_restaurants":
+        # No dataset version and no current row set: the filter always produces a new one
+        return [args + [None, None] for args in inputs]
+    if name == "restaurants_dashboard.update_search_suggestions":
+        return [[args[2]] for args in inputs]
+    if name == "restaurants_dashboard.update_table":
+        # A few pages of each row set, sorted by a random column
+        table_inputs = []
+        for args in inputs:
+            rowset = module.filter_restaurants(*args, None, None)
+            sort_by = [
+                {
+                    "column_id": rng.choice(list(module.TABLE_COLUMNS)),
+                    "direction": rng.choice(["asc", "desc"]),
+                }
+            ]
+            for page in range(3):
+                table_inputs.append([rowset, page, module.TABLE_PAGE_SIZE, sort_by, ""])
+        return table_inputs
+    if module.__name__ == "restaurants_dashboard":
+        # The chart callbacks take the row set produced by the filter callback
+        return [[module.filter_restaurants(*args, None, None)] for args in inputs]
+    return inputs
+
+
+def summarize(values, scale=1.0):
+    values = np.asarray(values, dtype="float64") * scale
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+        "max": float(values.max()),
+    }
+
+
+def benchmark_callback(name, iterations, random_length, seed, cached, traces):
+    module, function = load_callback(name, cached)
+    rng = random.Random(seed)
+    # Recorded traces are shared by all the callbacks of a module (same inputs)
+    inputs = traces.get(module.__name__, []) + random_trace(module, rng, random_length)
+    inputs = callback_inputs(name, module, inputs, rng)
+
+    # Warm-up (imports, lazily built templates, ...)
+    for args in inputs[:5]:
+        to_json_plotly(function(*args))
+
+    latencies = []
+    step_timings = {}
+    payload_sizes = []
+    for _ in range(iterations):
+        for args in inputs:
+            with record_steps() as steps:
+                start = time.perf_counter()
+                result = function(*args)
+                computed = time.perf_counter()
+                payload = to_json_plotly(result)
+                end = time.perf_counter()
+            steps["serialize"] = end - computed
+            latencies.append(end - start)
+            payload_sizes.append(len(payload.encode("utf-8")))
+            for step_name, seconds in steps.items():
+                step_timings.setdefault(step_name, []).append(seconds)
+
+    # Allocations are measured separately, since tracing slows everything down
+    allocations = []
+    tracemalloc.start()
+    for args in inputs:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        to_json_plotly(function(*args))
+        _, peak = tracemalloc.get_traced_memory()
+        allocations.append(peak - before)
+    tracemalloc.stop()
+
+    return {
+        "calls": len(latencies),
+        "distinct_inputs": len(inputs),
+        "latency_ms": summarize(latencies, 1000),
+        "steps_ms": {
+            step_name: summarize(seconds, 1000) for step_name, seconds in step_timings.items()
+        },
+        "alloc_peak_kb": summarize(allocations, 1 / 1024),
+        "payload_bytes": summarize(payload_sizes),
+    }
+
+
+def run(args):
+    with open(args.traces, encoding="utf-8") as f:
+        traces = json.load(f)
+
+    results = {}
+    for name in args.callbacks:
+        print(f"Benchmarking {name} ...", file=sys.stderr)
+        results[name] = benchmark_callback(
+            name, args.iterations, args.random_length, args.seed, args.cached, traces
+        )
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "random_length": args.random_length,
+            "seed": args.seed,
+            "cached": args.cached,
+        },
+        "results": results,
+    }
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+def print_report(results):
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        print(
+            f"\n{name}: {result['calls']} calls, "
+            f"p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+            f"alloc p50 {result['alloc_peak_kb']['p50']:.0f} KB, "
+            f"payload p50 {result['payload_bytes']['p50']:.0f} bytes"
+        )
+        for step_name, timing in result["steps_ms"].items():
+            print(
+                f"  {step_name:<10} p50 {timing['p50']:8.3f} ms  "
+                f"p95 {timing['p95']:8.3f} ms  p99 {timing['p99']:8.3f} ms"
+            )
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)["results"]
+
+    failures = []
+    print(f"{'callback':<40} {'metric':<14} {'baseline':>10} {'candidate':>10} {'ratio':>7}")
+    for name in baseline:
+        if name not in candidate:
+            continue
+        rows = [("latency", baseline[name]["latency_ms"], candidate[name]["latency_ms"])]
+        rows += [
+            (step_name, timing, candidate[name]["steps_ms"][step_name])
+            for step_name, timing in baseline[name]["steps_ms"].items()
+            if step_name in candidate[name]["steps_ms"]
+        ]
+        for metric, before, after in rows:
+            for percentile in args.percentiles:
+                ratio = after[percentile] / before[percentile] if before[percentile] else 1.0
+                flag = ""
+                # Only the whole-callback latency can fail the comparison, steps are informative
+                if metric == "latency" and ratio > args.max_slowdown:
+                    flag = "  SLOWER"
+                    failures.append(f"{name} {percentile} {ratio:.2f}x")
+                print(
+                    f"{name:<40} {metric + ' ' + percentile:<14} "
+                    f"{before[percentile]:>10.3f} {after[percentile]:>10.3f} {ratio:>6.2f}x{flag}"
+                )
+
+    if failures:
+        print(f"\nSlowdown above {args.max_slowdown}x: " + ", ".join(failures))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmark")
+    run_parser.add_argument("--output", help="write the results to this JSON file")
+    run_parser.add_argument("--callbacks", nargs="+", default=CALLBACKS, choices=CALLBACKS)
+    run_parser.add_argument("--iterations", type=int, default=5, help="passes over each trace")
+    run_parser.add_argument(
+        "--random-length", type=int, default=50, help="randomized inputs per callback"
+    )
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--traces", default=TRACES_PATH, help="recorded input traces")
+    run_parser.add_argument(
+        "--cached", action="store_true", help="go through the callback result caches"
+    )
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=1.2,
+        help="fail if a callback's latency grew by more than this factor",
+    )
+    compare_parser.add_argument(
+        "--percentiles", nargs="+", default=["p50", "p95"], choices=["p50", "p95", "p99", "mean"]
+    )
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
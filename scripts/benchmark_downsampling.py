@@ -0,0 +1,63 @@
+import argparse
+import time
+
+import numpy as np
+
+from timeseries_pyramid import METHODS, SeriesPyramid
+
+# Window latency of the time-series pyramids (timeseries_pyramid.py) as the
+# series grows.
+#
+# Builds the pyramids of synthetic random-walk series (one point per second) of
+# increasing length, then serves random zoom windows, from a few points to the
+# whole series, and reports the build time, the window latency percentiles and
+# the number of points sent. The window latency should not grow with the length.
+#
+#   python scripts/benchmark_downsampling.py --lengths 10000 100000 1000000 10000000
+
+
+def random_walk(length, seed):
+    rng = np.random.default_rng(seed)
+    x = np.arange(length, dtype="float64") * 1000
+    y = 100 + np.cumsum(rng.normal(scale=0.1, size=length))
+    return x, y
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Window latency of the time-series pyramids")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--methods", nargs="+", default=METHODS, choices=METHODS)
+    parser.add_argument("--windows", type=int, default=1000)
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'length':>10} {'method':<8} {'build s':>8} {'levels':>6}"
+        f"   window p50 / p99 (ms)   points p50 / max"
+    )
+    for length in args.lengths:
+        x, y = random_walk(length, args.seed)
+        for method in args.methods:
+            start = time.perf_counter()
+            pyramid = SeriesPyramid(x, y, methods=[method])
+            build = time.perf_counter() - start
+
+            rng = np.random.default_rng(args.seed)
+            latencies = []
+            points = []
+            for _ in range(args.windows):
+                # Log-uniform window widths: as many deep zooms as wide views
+                width = x[-1] * 10 ** rng.uniform(-np.log10(length), 0)
+                x0 = rng.uniform(0, x[-1] - width)
+                start = time.perf_counter()
+                window_x, _, _ = pyramid.window(x0, x0 + width, args.budget, method)
+                latencies.append(time.perf_counter() - start)
+                points.append(len(window_x))
+
+            latencies = np.asarray(latencies) * 1000
+            print(
+                f"{length:>10} {method:<8} {build:>8.2f} {len(pyramid.levels[method]):>6}"
+                f"   {np.percentile(latencies, 50):>8.3f} / {np.percentile(latencies, 99):>6.3f}"
+                f"      {int(np.median(points)):>6} / {max(points)}"
+            )
@@ -0,0 +1,145 @@
+import time
+
+import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+from figure_builder import bar_figure, pie_figure
+from multivalue_index import MultiValueColumn
+from restaurants_data import load_restaurants
+from restaurants_index import RestaurantIndex
+
+# Benchmark of the lightweight figure builder against the Plotly Express path.
+#
+# For a few typical inputs of the restaurants dashboard and of dash_callbacks.py,
+# the same data is turned into figures both ways. The script checks that both
+# figures serialize to exactly the same JSON and prints the time per figure.
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/benchmark_figures.py
+
+REPEAT = 50
+
+
+def best_time(func):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+df_restaurants = load_restaurants(
+    columns=["restaurant_name", "region", "city", "price_level", "cuisines", "avg_rating", "total_reviews_count"]
+)
+df_restaurants = df_restaurants[df_restaurants["region"].notna()].reset_index(drop=True)
+restaurant_index = RestaurantIndex(df_restaurants)
+cuisines_column = MultiValueColumn(df_restaurants["cuisines"])
+regions = df_restaurants["region"].unique().tolist()
+
+# (name, px figure function, builder figure function)
+cases = []
+
+for selected_regions, rating_range in [(None, [0, 5]), (regions[:3], [3.5, 4.5])]:
+    rows = restaurant_index.query(selected_regions, rating_range)
+    filtered_df = df_restaurants.iloc[rows]
+    label = f"regions={selected_regions and len(selected_regions)}, rating={rating_range}"
+
+    top_restaurants = filtered_df.sort_values(by="total_reviews_count", ascending=False).head(10)
+    price_counts = filtered_df["price_level"].value_counts()
+    price_counts = price_counts[price_counts > 0]
+    cuisines_counts = cuisines_column.value_counts(rows).head(20)
+
+    cases += [
+        (
+            f"top restaurants bar ({label})",
+            lambda df=top_restaurants: px.bar(
+                df,
+                x="restaurant_name",
+                y="total_reviews_count",
+                labels={"restaurant_name": "Restaurant Name", "total_reviews_count": "Total Reviews"},
+                title="Top 10 Restaurants by Number of Reviews",
+            ),
+            lambda df=top_restaurants: bar_figure(
+                df["restaurant_name"],
+                df["total_reviews_count"],
+                x_label="Restaurant Name",
+                y_label="Total Reviews",
+                title="Top 10 Restaurants by Number of Reviews",
+            ),
+        ),
+        (
+            f"price level pie ({label})",
+            lambda counts=price_counts: px.pie(
+                values=counts.values,
+                names=counts.index,
+                labels={"names": "Price Level", "values": "Number of Restaurants"},
+                title="Distribution of Restaurants by Price Level",
+            ),
+            lambda counts=price_counts: pie_figure(
+                names=counts.index,
+                values=counts.values,
+                names_label="Price Level",
+                values_label="Number of Restaurants",
+                title="Distribution of Restaurants by Price Level",
+            ),
+        ),
+        (
+            f"top cuisines bar ({label})",
+            lambda counts=cuisines_counts: px.bar(
+                x=counts.index,
+                y=counts.values,
+                labels={"x": "Cuisine", "y": "Number of Restaurants"},
+                title="Top 20 Cuisines Based on Number of Restaurants",
+            ),
+            lambda counts=cuisines_counts: bar_figure(
+                counts.index,
+                counts.values,
+                x_label="Cuisine",
+                y_label="Number of Restaurants",
+                title="Top 20 Cuisines Based on Number of Restaurants",
+            ),
+        ),
+    ]
+
+for city in ["Athens", "Thessaloniki"]:
+    top_restaurants = (
+        df_restaurants[df_restaurants["city"] == city]
+        .sort_values(by="total_reviews_count", ascending=False)
+        .head(10)
+    )
+    cases.append(
+        (
+            f"dash_callbacks bar (city={city})",
+            lambda df=top_restaurants, city=city: px.bar(
+                df,
+                x="restaurant_name",
+                y="total_reviews_count",
+                title=f"Top 10 Restaurants in {city}",
+                labels={"restaurant_name": "Restaurant Name", "total_reviews_count": "Total Reviews"},
+            ),
+            lambda df=top_restaurants, city=city: bar_figure(
+                df["restaurant_name"],
+                df["total_reviews_count"],
+                x_label="Restaurant Name",
+                y_label="Total Reviews",
+                title=f"Top 10 Restaurants in {city}",
+            ),
+        )
+    )
+
+print(f"{'figure':<60} {'identical':>9} {'px (ms)':>9} {'builder (ms)':>13} {'speedup':>8}")
+all_identical = True
+for name, px_figure, builder_figure in cases:
+    # Time figure construction + JSON serialization, as Dash does for every callback
+    identical = to_json_plotly(px_figure()) == to_json_plotly(builder_figure())
+    all_identical = all_identical and identical
+    px_time = best_time(lambda: to_json_plotly(px_figure()))
+    builder_time = best_time(lambda: to_json_plotly(builder_figure()))
+    print(
+        f"{name:<60} {str(identical):>9} {px_time * 1000:>9.2f} "
+        f"{builder_time * 1000:>13.3f} {px_time / builder_time:>7.0f}x"
+    )
+
+if not all_identical:
+    raise SystemExit("Some figures differ from the Plotly Express output")
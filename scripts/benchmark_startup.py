@@ -0,0 +1,114 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Startup benchmark of a dashboard: how long until a fresh worker can answer.
+#
+# For each mode, in fresh Python processes:
+#
+#   - "import": time to import the dashboard module;
+#   - "first response": from process start to the first answer of the server
+#     (GET /), i.e. when it is listening and serving;
+#   - "ready": until `/ready` answers 200 (data loaded);
+#   - "layout": until the page layout (GET /_dash-layout, which needs the data)
+#     has been served.
+#
+# Modes: "lazy" (the default: data loaded in a background thread after import)
+# and "preload" (PRELOAD_DATA=1: data loaded during the import, like the
+# dashboard did before).
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/benchmark_startup.py --runs 5
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = {"lazy": {}, "preload": {"PRELOAD_DATA": "1"}}
+
+
+def environment(mode):
+    env = dict(os.environ)
+    env.pop("PRELOAD_DATA", None)
+    env.update(MODES[mode])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SCRIPTS_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def measure_import(module, mode):
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=environment(mode), capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+
+def measure_server(module, mode, timeout=120):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    code = f"import {module}; {module}.app.run(port={port}, debug=False)"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", code],
+        env=environment(mode),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    timings = {}
+    try:
+        # Poll in order: the server answers at all, then is ready, then serves the layout
+        for name, path in [("first response", "/"), ("ready", "/ready"), ("layout", "/_dash-layout")]:
+            while status(base + path) != 200:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{module} exited with code {process.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"{module}: no answer from {path} after {timeout} s")
+                time.sleep(0.01)
+            timings[name] = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the startup time of a dashboard")
+    parser.add_argument("--module", default="restaurants_dashboard")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'import':>10} {'first response':>16} {'ready':>10} {'layout':>10}   (median of {args.runs} runs, s)")
+    for mode in args.modes:
+        imports = [measure_import(args.module, mode) for _ in range(args.runs)]
+        servers = [measure_server(args.module, mode) for _ in range(args.runs)]
+        medians = {
+            name: statistics.median(run[name] for run in servers)
+            for name in ("first response", "ready", "layout")
+        }
+        print(
+            f"{mode:<10} {statistics.median(imports):>10.3f} {medians['first response']:>16.3f} "
+            f"{medians['ready']:>10.3f} {medians['layout']:>10.3f}"
+        )
@@ -0,0 +1,150 @@
+import argparse
+import multiprocessing
+import sys
+
+import numpy as np
+import pandas as pd
+
+from compact_store import compact_restaurants
+from restaurants_data import load_restaurants
+from streaming_ingest import current_rss_mb
+
+# Per-worker memory of the restaurants frame, as gunicorn would run it.
+#
+# Starts N worker processes (forked, like gunicorn workers) that each load the
+# columns used by restaurants_dashboard.py and read every column once, then
+# reports, per worker, the memory before and after loading:
+#
+#   - RSS: resident memory, counting shared pages in full in every worker;
+#   - PSS: shared pages divided between the processes that map them, so the sum
+#     over the workers is the physical memory they use;
+#   - USS: memory private to the worker.
+#
+# PSS / USS come from /proc/<pid>/smaps_rollup (Linux); elsewhere only RSS is shown.
+#
+# Loaders:
+#   columnar - load_restaurants() + dropping rows without a region (private copy per worker)
+#   compact  - compact_restaurants(): the memory-mapped compact frame shared by the workers
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/benchmark_worker_memory.py --workers 16
+
+COLUMNS = [
+    "restaurant_name",
+    "region",
+    "price_level",
+    "cuisines",
+    "avg_rating",
+    "total_reviews_count",
+    "latitude",
+    "longitude",
+    "keywords",
+    "top_tags",
+]
+
+
+def load_columnar():
+    df = load_restaurants(columns=COLUMNS)
+    return df[df["region"].notna()]
+
+
+def load_compact():
+    return compact_restaurants(COLUMNS, dropna=["region"]).to_pandas()
+
+
+LOADERS = {"columnar": load_columnar, "compact": load_compact}
+
+
+# {"rss": MB, "pss": MB, "uss": MB} of the current process (pss / uss None if unavailable)
+def memory_mb():
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            fields = {
+                line.split(":")[0]: int(line.split()[1]) for line in f if line.endswith("kB\n")
+            }
+    except OSError:
+        return {"rss": current_rss_mb(), "pss": None, "uss": None}
+    return {
+        "rss": fields["Rss"] / 1024,
+        "pss": fields["Pss"] / 1024,
+        "uss": (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024,
+    }
+
+
+# Read every value once, like the callbacks and the index builders do
+def touch(df):
+    total = 0
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            total += int(np.asarray(values.array.codes).sum())
+        elif pd.api.types.is_numeric_dtype(values):
+            total += int(np.nansum(values.to_numpy()))
+        else:
+            total += int(values.str.len().sum())
+    return total
+
+
+def worker(loader, loaded, measured, results):
+    before = memory_mb()
+    df = LOADERS[loader]()
+    touch(df)
+    # Measure once every worker has loaded, so that shared pages are counted as shared
+    loaded.wait()
+    results.put((before, memory_mb()))
+    measured.wait()
+
+
+def run(loader, workers):
+    context = multiprocessing.get_context("fork")
+    loaded = context.Barrier(workers)
+    measured = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(loader, loaded, measured, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in range(workers)]
+    for process in processes:
+        process.join()
+    return measurements
+
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else float("nan")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-worker memory of the restaurants frame")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--loaders", nargs="+", default=list(LOADERS), choices=list(LOADERS))
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        raise SystemExit("This benchmark forks worker processes (Linux / macOS)")
+
+    # Build the caches up front, so that no worker measures a cache build
+    for loader in args.loaders:
+        LOADERS[loader]()
+
+    print(
+        f"{'loader':<10} {'workers':>7}  per worker (MB):  {'RSS +':>7} {'PSS +':>7} {'USS +':>7}"
+        f"   total PSS + (MB)"
+    )
+    for loader in args.loaders:
+        measurements = run(loader, args.workers)
+        deltas = {
+            key: [
+                after[key] - before[key] if after[key] is not None else None
+                for before, after in measurements
+            ]
+            for key in ("rss", "pss", "uss")
+        }
+        print(
+            f"{loader:<10} {args.workers:>7}  {'':<17} {mean(deltas['rss']):>7.1f} "
+            f"{mean(deltas['pss']):>7.1f} {mean(deltas['uss']):>7.1f}"
+            f"   {sum(value for value in deltas['pss'] if value is not None):>10.1f}"
+        )
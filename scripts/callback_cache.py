@@ -0,0 +1,290 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+# Memoization layer for Dash callbacks.
+#
+# Dashboards are dominated by a handful of input combinations (all regions with
+# the full rating range, "Athens", ...), yet every callback rebuilds its figures
+# from scratch. `CallbackCache.memoize` wraps a callback so that:
+#
+#   1. its inputs are normalized (sorted lists, slider values rounded to the
+#      step, None and [] treated the same), so equivalent requests share a key;
+#   2. the serialized figure JSON is kept in a memory-bounded LRU with a TTL;
+#   3. optionally, entries are also written to a shared directory, so several
+#      gunicorn workers on the same machine can reuse each other's results.
+#
+# Usage (the cache must be the innermost decorator):
+#
+#   figure_cache = CallbackCache(max_bytes=32 * 1024 * 1024, ttl=600)
+#
+#   @app.callback(Output(...), Input(...), Input(...))
+#   @figure_cache.memoize(normalize_selection, normalize_range(0.1))
+#   def update_chart(selected_regions, rating_range):
+#       ...
+#
+# For data that is reloaded while the app runs, give the cache a `snapshot`
+# function (e.g. `dashboard_data.get`) and a `namespace` function of the
+# snapshot (e.g. its dataset version). The snapshot is then read once per call:
+# the key is made from its version and it is passed to the callback as its
+# first argument, so a result is always stored under the version of the data
+# it was computed from, even while a new version is being swapped in:
+#
+#   figure_cache = CallbackCache(snapshot=data.get, namespace=lambda d: d.dataset_version)
+#
+#   @figure_cache.memoize(normalize_selection)
+#   def update_chart(data, selected_regions):
+#       ...
+
+
+# ----- Input normalizers -----
+
+
+# Multi-select dropdown values: sorted, de-duplicated, None for "nothing selected"
+def normalize_selection(values):
+    if not values:
+        return None
+    if isinstance(values, str):
+        return values
+    return sorted(set(values))
+
+
+# Slider values: rounded to the slider step (returns a normalizer)
+def normalize_range(step, ndigits=6):
+    def normalize(values):
+        if values is None:
+            return None
+        if isinstance(values, (list, tuple)):
+            return [round(round(value / step) * step, ndigits) for value in values]
+        return round(round(values / step) * step, ndigits)
+
+    return normalize
+
+
+# Single values: None and empty values are treated the same
+def normalize_value(value):
+    if value is None or value == "" or value == []:
+        return None
+    return value
+
+
+# ----- Shared backend -----
+
+
+# Stores serialized results as files in a directory shared by all workers.
+# Writes are atomic (write to a temporary file, then rename).
+# With a TTL, expired files are deleted when they are read, and every `ttl`
+# seconds a write also sweeps the directory: entries of a previous dataset
+# version (whose keys are no longer asked for) are deleted once they expire.
+class FileCacheBackend:
+    def __init__(self, directory, ttl=None):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._next_sweep = time.monotonic() if ttl is not None else None
+        self._sweep_lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, path):
+        return self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self._expired(path):
+                os.remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+        if self._next_sweep is not None and time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+    # Delete the expired entries (and temporary files left by a crashed writer).
+    # Several workers may sweep at the same time: files already gone are skipped.
+    def sweep(self):
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._next_sweep = time.monotonic() + self.ttl
+            removed = 0
+            for entry in os.listdir(self.directory):
+                if not entry.endswith((".json", ".tmp")):
+                    continue
+                path = os.path.join(self.directory, entry)
+                try:
+                    if self._expired(path):
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+    def clear(self):
+        for entry in os.listdir(self.directory):
+            if entry.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.directory, entry))
+                except OSError:
+                    pass
+
+
+# ----- In-process LRU -----
+
+
+class CallbackCache:
+    def __init__(
+        self, max_bytes=32 * 1024 * 1024, ttl=None, backend=None, namespace="", snapshot=None
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        # Included in every key, e.g. the dataset version, so that a new dataset
+        # never serves figures computed from the previous one. May be a function,
+        # for a version that is only known once the data has been loaded: of the
+        # snapshot, if there is one.
+        self.namespace = namespace
+        # Returns the data the memoized callbacks compute from (see above)
+        self.snapshot = snapshot
+
+        self._entries = OrderedDict()  # key -> (expires_at, serialized JSON)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def make_key(self, name, args, snapshot=None):
+        namespace = self.namespace
+        if callable(namespace):
+            namespace = namespace() if self.snapshot is None else namespace(snapshot)
+        payload = json.dumps([namespace, name, args], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _store(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._size -= len(value)
+
+    # Decorator: one normalizer per positional argument of the callback
+    def memoize(self, *normalizers):
+        def decorator(func):
+            name = f"{func.__module__}.{func.__qualname__}"
+
+            def normalize_args(args):
+                return [
+                    normalize(arg) if normalize is not None else arg
+                    for normalize, arg in zip(normalizers, args)
+                ] + list(args[len(normalizers):])
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                normalized = normalize_args(args)
+
+                if self.snapshot is None:
+                    key = self.make_key(name, normalized)
+                else:
+                    snapshot = self.snapshot()
+                    key = self.make_key(name, normalized, snapshot)
+                    normalized = [snapshot] + normalized
+                cached = self.get(key)
+                if cached is not None:
+                    return json.loads(cached)
+
+                result = func(*normalized)
+                self.set(key, to_json_plotly(result))
+                return result
+
+            # The cached result for these arguments, or None (without calling func)
+            def cached(*args):
+                snapshot = self.snapshot() if self.snapshot is not None else None
+                value = self.get(self.make_key(name, normalize_args(args), snapshot))
+                return None if value is None else json.loads(value)
+
+            wrapper.cache = self
+            wrapper.cached = cached
+            return wrapper
+
+        return decorator
@@ -0,0 +1,294 @@
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import Response, g, request
+
+from callback_timing import record_counts, record_steps
+
+# Opt-in instrumentation of the Dash callbacks of an app.
+#
+# `instrument_callbacks(app)` hooks into the requests that run callbacks
+# (`/_dash-update-component`), so every registered callback is measured without
+# changing it. For each call it records:
+#
+#   - wall time and CPU time (of the thread that ran the callback);
+#   - the time of each step marked with callback_timing.step() (filter, sort, ...);
+#   - the counters reported with callback_timing.count(): rows_scanned, the rows
+#     the callback had to read, and rows_filtered, the rows left after filtering;
+#   - the size of the serialized response.
+#
+# They are exposed:
+#
+#   - on `/metrics`, in the Prometheus text format, per callback output
+#     (counters are per process: with several gunicorn workers, scrape each one);
+#   - in a `Server-Timing` header on the response, shown by the browser devtools
+#     (Network tab > Timing):  Server-Timing: total;dur=4.1, cpu;dur=3.9, filter;dur=0.2, ...
+#
+# With a `profile_dir`, requests slower than `slow_ms` also leave a profile there:
+# a cProfile dump (`.prof`, open it with `python -m pstats` or snakeviz), or an
+# HTML report when `profiler="pyinstrument"` and pyinstrument is installed.
+# One request is profiled at a time (since Python 3.12 a profiler covers the
+# whole process, and a second one can't be enabled): requests that start while
+# another one is being profiled are measured but not profiled.
+#
+# Nothing is registered unless `instrument_callbacks` is called, so an app that
+# doesn't enable it has no overhead. The dashboards enable it from environment
+# variables (see `instrument_callbacks_from_env`):
+#
+#   CALLBACK_METRICS=1 CALLBACK_PROFILE_DIR=profiles CALLBACK_PROFILE_SLOW_MS=100 python restaurants_dashboard.py
+#
+# Background callbacks run in another process: for them, the measurements cover
+# the requests that start the job and poll it, not the job itself.
+
+logger = logging.getLogger("dash.metrics")
+
+_profile_numbers = itertools.count()
+
+# Held while a request is being profiled
+_profiler_lock = threading.Lock()
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class CallbackMetrics:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.callbacks = {}  # output -> totals
+        self._lock = threading.Lock()
+
+    def observe(self, output, wall, cpu, output_bytes, steps, counts):
+        with self._lock:
+            totals = self.callbacks.get(output)
+            if totals is None:
+                totals = self.callbacks[output] = {
+                    "calls": 0,
+                    "wall": 0.0,
+                    "cpu": 0.0,
+                    "bytes": 0,
+                    "buckets": [0] * len(self.buckets),
+                    "steps": {},
+                    "counts": {},
+                }
+            totals["calls"] += 1
+            totals["wall"] += wall
+            totals["cpu"] += cpu
+            totals["bytes"] += output_bytes
+            for i, bound in enumerate(self.buckets):
+                if wall <= bound:
+                    totals["buckets"][i] += 1
+            for name, seconds in steps.items():
+                totals["steps"][name] = totals["steps"].get(name, 0.0) + seconds
+            for name, value in counts.items():
+                totals["counts"][name] = totals["counts"].get(name, 0) + value
+
+    # Prometheus text exposition format
+    def render(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+
+        with self._lock:
+            callbacks = sorted(self.callbacks.items())
+
+            duration = []
+            for output, totals in callbacks:
+                for bound, count in zip(self.buckets, totals["buckets"]):
+                    duration.append(("_bucket", [("callback", output), ("le", bound)], count))
+                duration.append(("_bucket", [("callback", output), ("le", "+Inf")], totals["calls"]))
+                duration.append(("_sum", [("callback", output)], totals["wall"]))
+                duration.append(("_count", [("callback", output)], totals["calls"]))
+            metric(
+                "dash_callback_duration_seconds",
+                "histogram",
+                "Wall time of the callback requests.",
+                duration,
+            )
+            metric(
+                "dash_callback_cpu_seconds_total",
+                "counter",
+                "CPU time of the callback requests.",
+                [("", [("callback", output)], totals["cpu"]) for output, totals in callbacks],
+            )
+            metric(
+                "dash_callback_response_bytes_total",
+                "counter",
+                "Size of the serialized callback responses.",
+                [("", [("callback", output)], totals["bytes"]) for output, totals in callbacks],
+            )
+            metric(
+                "dash_callback_step_seconds_total",
+                "counter",
+                "Wall time of the steps marked in the callbacks.",
+                [
+                    ("", [("callback", output), ("step", name)], seconds)
+                    for output, totals in callbacks
+                    for name, seconds in sorted(totals["steps"].items())
+                ],
+            )
+            names = sorted({name for _, totals in callbacks for name in totals["counts"]})
+            for name in names:
+                metric(
+                    f"dash_callback_{name}_total",
+                    "counter",
+                    f"{name.replace('_', ' ').capitalize()} reported by the callbacks.",
+                    [
+                        ("", [("callback", output)], totals["counts"][name])
+                        for output, totals in callbacks
+                        if name in totals["counts"]
+                    ],
+                )
+
+        return "\n".join(lines) + "\n"
+
+
+# Start profiling the current request, or return None if another request is
+# being profiled
+def _start_profiler(profiler):
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    try:
+        if profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logger.warning("pyinstrument is not installed, using cProfile")
+            else:
+                instance = Profiler()
+                instance.start()
+                return instance
+
+        import cProfile
+
+        instance = cProfile.Profile()
+        instance.enable()
+        return instance
+    except BaseException:
+        _profiler_lock.release()
+        raise
+
+
+def _save_profile(instance, profile_dir, output, wall):
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", output)[:80]
+    path = os.path.join(
+        profile_dir,
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_numbers)}"
+        f"-{wall * 1000:.0f}ms-{name}",
+    )
+    if hasattr(instance, "output_html"):
+        path += ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(instance.output_html())
+    else:
+        path += ".prof"
+        instance.dump_stats(path)
+    logger.info("Slow callback %s (%.1f ms), profile written to %s", output, wall * 1000, path)
+
+
+def _stop_profiler(instance):
+    try:
+        if hasattr(instance, "output_html"):
+            instance.stop()
+        else:
+            instance.disable()
+    finally:
+        _profiler_lock.release()
+
+
+def instrument_callbacks(
+    app, metrics_path="/metrics", profile_dir=None, slow_ms=200, profiler="cprofile"
+):
+    metrics = CallbackMetrics()
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def is_callback_request():
+        return request.path.endswith("_dash-update-component")
+
+    @app.server.before_request
+    def start_measurement():
+        if not is_callback_request():
+            return
+        g.callback_steps = record_steps()
+        g.callback_counts = record_counts()
+        g.callback_timings = g.callback_steps.__enter__()
+        g.callback_counters = g.callback_counts.__enter__()
+        g.callback_profiler = _start_profiler(profiler) if profile_dir else None
+        g.callback_start = (time.perf_counter(), time.thread_time())
+
+    @app.server.after_request
+    def end_measurement(response):
+        start = g.pop("callback_start", None)
+        if start is None:
+            return response
+        wall = time.perf_counter() - start[0]
+        cpu = time.thread_time() - start[1]
+        instance = g.pop("callback_profiler")
+        if instance is not None:
+            _stop_profiler(instance)
+        g.pop("callback_counts").__exit__(None, None, None)
+        g.pop("callback_steps").__exit__(None, None, None)
+
+        body = request.get_json(silent=True) or {}
+        output = body.get("output", "unknown")
+        steps = g.callback_timings
+        metrics.observe(
+            output, wall, cpu, response.calculate_content_length() or 0, steps, g.callback_counters
+        )
+
+        server_timing = [f"total;dur={wall * 1000:.2f}", f"cpu;dur={cpu * 1000:.2f}"]
+        server_timing += [
+            f"{re.sub(r'[^A-Za-z0-9_-]', '_', name)};dur={seconds * 1000:.2f}"
+            for name, seconds in steps.items()
+        ]
+        response.headers["Server-Timing"] = ", ".join(server_timing)
+
+        if instance is not None and wall * 1000 >= slow_ms:
+            try:
+                _save_profile(instance, profile_dir, output, wall)
+            except OSError as error:
+                logger.warning("Could not write the profile of %s: %s", output, error)
+        return response
+
+    # A callback that raised skips after_request: stop measuring anyway
+    @app.server.teardown_request
+    def abort_measurement(error=None):
+        g.pop("callback_start", None)
+        instance = g.pop("callback_profiler", None)
+        if instance is not None:
+            _stop_profiler(instance)
+        for name in ("callback_counts", "callback_steps"):
+            recording = g.pop(name, None)
+            if recording is not None:
+                recording.__exit__(None, None, None)
+
+    def serve_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    app.server.add_url_rule(metrics_path, "callback_metrics", serve_metrics)
+    return metrics
+
+
+# Enable the instrumentation when CALLBACK_METRICS is set; the profiles are
+# configured with CALLBACK_PROFILE_DIR, CALLBACK_PROFILE_SLOW_MS and CALLBACK_PROFILER
+def instrument_callbacks_from_env(app):
+    if not os.environ.get("CALLBACK_METRICS"):
+        return None
+    return instrument_callbacks(
+        app,
+        profile_dir=os.environ.get("CALLBACK_PROFILE_DIR"),
+        slow_ms=float(os.environ.get("CALLBACK_PROFILE_SLOW_MS", 200)),
+        profiler=os.environ.get("CALLBACK_PROFILER", "cprofile"),
+    )
@@ -0,0 +1,56 @@
+import contextlib
+import threading
+import time
+
+# Per-step timing of callback code (filter, sort, aggregate, figure, ...).
+#
+# Callbacks mark their steps with `with step("filter"): ...`. Nothing is
+# measured unless the caller is inside `record_steps()`, e.g. the benchmark:
+#
+#   with record_steps() as timings:
+#       update_top_restaurants(rowset)
+#   timings  # {"filter": 0.0012, "sort": 0.0031, ...} (seconds)
+#
+# Callbacks can also report counters (rows scanned, rows left after filtering)
+# with `count("rows_scanned", n)`, collected the same way by `record_counts()`.
+
+_state = threading.local()
+
+
+@contextlib.contextmanager
+def step(name):
+    timings = getattr(_state, "timings", None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def record_steps():
+    previous = getattr(_state, "timings", None)
+    _state.timings = {}
+    try:
+        yield _state.timings
+    finally:
+        _state.timings = previous
+
+
+def count(name, value):
+    counts = getattr(_state, "counts", None)
+    if counts is not None:
+        counts[name] = counts.get(name, 0) + value
+
+
+@contextlib.contextmanager
+def record_counts():
+    previous = getattr(_state, "counts", None)
+    _state.counts = {}
+    try:
+        yield _state.counts
+    finally:
+        _state.counts = previous
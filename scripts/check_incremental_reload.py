@@ -0,0 +1,230 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dataset_archive import dataset_path
+from multivalue_index import MultiValueColumn
+from restaurants_data import DATASET_NAME, ensure_cache, extends_version, load_restaurants
+from restaurants_index import RestaurantIndex
+from rollup_cube import RollupCube
+from search_index import SearchIndex, fold
+from spatial_grid import SpatialGrid
+from table_pages import TablePages
+from top_k import TopKIndex
+
+# Correctness check of the incremental updates used when rows are appended to the
+# restaurants CSV while the dashboards are running (see dataset_versions.py).
+#
+# The CSV is cut in two at a few row counts. For each cut, the first part is
+# written to a temporary CSV and indexed, then the second part is appended to the
+# file, and the indexes extended with `appended` are compared with indexes built
+# from scratch on the whole file. Exits with an error if any of them differs, or
+# if the cache doesn't recognize the new file as an append of the previous one.
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/check_incremental_reload.py [number of cuts]
+
+COLUMNS = [
+    "restaurant_name",
+    "region",
+    "city",
+    "price_level",
+    "cuisines",
+    "avg_rating",
+    "total_reviews_count",
+    "keywords",
+    "top_tags",
+    "latitude",
+    "longitude",
+]
+
+# Columns of the restaurants table (TABLE_COLUMNS of restaurants_dashboard.py)
+TABLE_COLUMNS = [
+    "restaurant_name",
+    "region",
+    "price_level",
+    "avg_rating",
+    "total_reviews_count",
+    "cuisines",
+]
+
+
+# The indexes of the restaurants dashboard and dash_callbacks.py, on `df`
+def build_indexes(df):
+    df_regions = df[df["region"].notna()].reset_index(drop=True)
+    cuisines_column = MultiValueColumn(df_regions["cuisines"])
+    return {
+        "restaurant_index": RestaurantIndex(df_regions),
+        "cuisines_column": cuisines_column,
+        "rollup_cube": RollupCube(df_regions, cuisines_column),
+        "search_index": SearchIndex(search_columns(df_regions)),
+        "table_pages": TablePages(table_frame(df_regions), TABLE_COLUMNS),
+        "spatial_grid": SpatialGrid(*map_columns(df_regions)),
+        "top_k": TopKIndex(df[df["city"].notna()], "total_reviews_count", ["city"], k=10),
+    }
+
+
+# The same indexes, extended from `indexes` (built on the first rows of `df`)
+def append_indexes(indexes, previous_df, df):
+    df_regions = df[df["region"].notna()].reset_index(drop=True)
+    start = int(previous_df["region"].notna().sum())
+    cuisines_column = indexes["cuisines_column"].appended(df_regions["cuisines"], start)
+    return {
+        "restaurant_index": indexes["restaurant_index"].appended(df_regions, start),
+        "cuisines_column": cuisines_column,
+        "rollup_cube": indexes["rollup_cube"].appended(df_regions, cuisines_column, start),
+        "search_index": indexes["search_index"].appended(search_columns(df_regions), start),
+        "table_pages": indexes["table_pages"].appended(table_frame(df_regions), start),
+        "spatial_grid": indexes["spatial_grid"].appended(*map_columns(df_regions), start),
+        "top_k": indexes["top_k"].appended(
+            df[df["city"].notna()],
+            "total_reviews_count",
+            int(previous_df["city"].notna().sum()),
+        ),
+    }
+
+
+def search_columns(df):
+    return [df["restaurant_name"], df["keywords"], df["top_tags"]]
+
+
+# The table columns, with text as categoricals like in the compact frame of the
+# dashboard (each version has its own dictionary)
+def table_frame(df):
+    return pd.DataFrame(
+        {
+            column: df[column]
+            if pd.api.types.is_numeric_dtype(df[column])
+            else df[column].astype("category")
+            for column in TABLE_COLUMNS
+        }
+    )
+
+
+def map_columns(df):
+    return [df["latitude"], df["longitude"], df["avg_rating"]]
+
+
+def same_arrays(expected, actual):
+    expected, actual = np.asarray(expected), np.asarray(actual)
+    return expected.shape == actual.shape and bool(np.all(expected == actual))
+
+
+def same_array_dicts(expected, actual):
+    return expected.keys() == actual.keys() and all(
+        same_arrays(expected[key], actual[key]) for key in expected
+    )
+
+
+# The same cells of a map grid level; the merged means may differ in the last bits
+def same_cells(expected, actual):
+    means = ("latitude", "longitude", "rating")
+    return (
+        expected.keys() == actual.keys()
+        and all(same_arrays(expected[key], actual[key]) for key in expected if key not in means)
+        and all(
+            np.allclose(expected[key], actual[key], rtol=1e-6, equal_nan=True) for key in means
+        )
+    )
+
+
+# Names of the parts of the incremental indexes that differ from the rebuilt ones
+def differences(expected, actual):
+    found = []
+    index, other = expected["restaurant_index"], actual["restaurant_index"]
+    if not (
+        same_arrays(index.rating_order, other.rating_order)
+        and same_arrays(index.sorted_ratings, other.sorted_ratings)
+        and same_array_dicts(index.region_order, other.region_order)
+        and same_array_dicts(index.region_ratings, other.region_ratings)
+    ):
+        found.append("restaurant_index")
+
+    column, other = expected["cuisines_column"], actual["cuisines_column"]
+    if not all(
+        same_arrays(getattr(column, name), getattr(other, name))
+        for name in ("terms", "indices", "indptr")
+    ):
+        found.append("cuisines_column")
+
+    cube, other = expected["rollup_cube"], actual["rollup_cube"]
+    if not (
+        cube.region_codes == other.region_codes
+        and cube.price_levels.equals(other.price_levels)
+        and all(
+            same_arrays(getattr(cube, name), getattr(other, name))
+            for name in ("cuisines", "restaurant_cube", "cuisine_cube", "cuisine_first_seen")
+        )
+    ):
+        found.append("rollup_cube")
+
+    index, other = expected["search_index"], actual["search_index"]
+    if not (
+        index.row_count == other.row_count
+        and all(
+            same_arrays(getattr(index, name), getattr(other, name))
+            for name in ("terms", "indptr", "rows")
+        )
+        # The original spelling shown for a term may come from another row
+        and [fold(label) for label in index.labels] == [fold(label) for label in other.labels]
+    ):
+        found.append("search_index")
+
+    pages, other = expected["table_pages"], actual["table_pages"]
+    if not (
+        pages.row_count == other.row_count
+        and all(
+            all(same_arrays(a, b) for a, b in zip(pages._ranks[column], other._ranks[column]))
+            for column in TABLE_COLUMNS
+        )
+    ):
+        found.append("table_pages")
+
+    grid, other = expected["spatial_grid"], actual["spatial_grid"]
+    if not (
+        same_arrays(grid.rows, other.rows)
+        and np.allclose(grid.bounds, other.bounds)
+        and same_cells(grid.points, other.points)
+        and all(same_cells(a, b) for a, b in zip(grid.levels, other.levels))
+    ):
+        found.append("spatial_grid")
+
+    if not same_array_dicts(expected["top_k"].rows, actual["top_k"].rows):
+        found.append("top_k")
+    return found
+
+
+if __name__ == "__main__":
+    n_cuts = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    df_source = pd.read_csv(dataset_path(DATASET_NAME), usecols=COLUMNS)
+    cuts = np.linspace(0, len(df_source), n_cuts + 2).astype(int)[1:-1]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for cut in cuts:
+            source_path = os.path.join(tmp_dir, f"restaurants-{cut}.csv")
+            cache_dir = os.path.join(tmp_dir, f"cache-{cut}")
+            df_source.iloc[:cut].to_csv(source_path, index=False)
+            previous_version = ensure_cache(source_path, cache_dir)["version"]
+            previous_df = load_restaurants(COLUMNS, source_path, cache_dir)
+            indexes = build_indexes(previous_df)
+
+            # Append the remaining rows to the file
+            with open(source_path, "a", encoding="utf-8", newline="") as f:
+                df_source.iloc[cut:].to_csv(f, index=False, header=False)
+            manifest = ensure_cache(source_path, cache_dir)
+            if not extends_version(manifest, previous_version):
+                failures += 1
+                print(f"cut at {cut}: the new CSV isn't recognized as an append")
+            df = load_restaurants(COLUMNS, source_path, cache_dir)
+
+            found = differences(build_indexes(df), append_indexes(indexes, previous_df, df))
+            failures += len(found)
+            print(f"cut at {cut} of {len(df)} rows: {', '.join(found) or 'same indexes'}")
+
+    print(f"{len(cuts)} cuts, {failures} mismatches")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,76 @@
+import random
+import sys
+
+from multivalue_index import MultiValueColumn
+from restaurants_data import load_restaurants
+from rollup_cube import RollupCube
+
+# Correctness check of the rollup cube used by restaurants_dashboard.py.
+#
+# Compares the cube answers with the original pandas code (boolean filters +
+# value_counts) for randomized region selections and rating ranges, and exits
+# with an error if any answer differs, including the order of ties.
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/check_rollup_cube.py [number of random cases]
+
+df_restaurants = load_restaurants(columns=["region", "price_level", "cuisines", "avg_rating"])
+df_restaurants = df_restaurants[df_restaurants["region"].notna()].reset_index(drop=True)
+cube = RollupCube(df_restaurants, MultiValueColumn(df_restaurants["cuisines"]))
+regions = df_restaurants["region"].unique().tolist()
+
+
+def pandas_counts(selected_regions, rating_range):
+    if selected_regions:
+        filtered_df = df_restaurants[df_restaurants["region"].isin(selected_regions)]
+    else:
+        filtered_df = df_restaurants
+    filtered_df = filtered_df[
+        (filtered_df["avg_rating"] >= rating_range[0])
+        & (filtered_df["avg_rating"] <= rating_range[1])
+    ]
+    price_counts = filtered_df["price_level"].value_counts()
+    price_counts = price_counts[price_counts > 0]
+    cuisines_counts = filtered_df["cuisines"].dropna().str.split(", ").explode().value_counts()
+    return price_counts, cuisines_counts
+
+
+def same_counts(expected, actual):
+    return expected.index.astype(str).tolist() == actual.index.astype(str).tolist() and (
+        expected.tolist() == actual.tolist()
+    )
+
+
+def random_case(rng):
+    selected_regions = rng.sample(regions, rng.randint(0, len(regions)))
+    if rng.random() < 0.1:
+        selected_regions = None
+    low, high = sorted(round(rng.uniform(0, 5), 1) for _ in range(2))
+    return selected_regions, [low, high]
+
+
+if __name__ == "__main__":
+    n_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(0)
+    cases = [
+        (None, [0, 5]),
+        ([], [0, 5]),
+        (regions[:1], [5, 5]),
+        (["Unknown"], [0, 5]),
+        (None, [3, 2]),
+    ]
+    cases += [random_case(rng) for _ in range(n_cases)]
+
+    failures = 0
+    for selected_regions, rating_range in cases:
+        price_counts, cuisines_counts = pandas_counts(selected_regions, rating_range)
+        if not same_counts(price_counts, cube.price_level_counts(selected_regions, rating_range)):
+            failures += 1
+            print(f"price_level mismatch for {selected_regions}, {rating_range}")
+        if not same_counts(cuisines_counts, cube.cuisine_counts(selected_regions, rating_range)):
+            failures += 1
+            print(f"cuisines mismatch for {selected_regions}, {rating_range}")
+
+    print(f"{len(cases)} cases, {failures} mismatches")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,59 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from restaurants_data import load_restaurants
+from search_index import SearchIndex
+
+# Correctness check of the type-ahead of the restaurant search (search_index.py).
+#
+# Words are folded before indexing, which merges Greeklish spellings ("ou" -> "u",
+# "ph" -> "f", "kh" -> "ch"). While such a digraph is half typed ("so" of
+# "souvlaki"), the query must still match. For each word below, every prefix of
+# it typed letter by letter must find all the rows the whole word finds, and
+# suggest a completion for them. Checked on a few names, then on the dataset.
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/check_search_index.py [more words to check]
+
+WORDS = ["souvlaki", "kholi", "phyllo", "σουβλάκι", "Khora", "Ouzeri"]
+
+NAMES = pd.Series(
+    ["Souvlaki Place", "Kholi Taverna", "Phyllo Bakery", "Σουβλάκι Γωνία", "To Ouzeri"]
+)
+
+
+# Prefixes of `word` whose search misses rows of the whole word, or that suggest nothing
+def failing_prefixes(index, word):
+    expected = index.search(word)
+    failing = []
+    for length in range(1, len(word) + 1):
+        prefix = word[:length]
+        missed = np.setdiff1d(expected, index.search(prefix))
+        if len(missed) or (len(expected) and not index.suggest(prefix)):
+            failing.append(prefix)
+    return failing, len(expected)
+
+
+def check(index, words, name):
+    failures = 0
+    for word in words:
+        failing, matches = failing_prefixes(index, word)
+        failures += len(failing)
+        status = f"prefixes missing matches: {failing}" if failing else "ok"
+        print(f"{name}: {word!r} ({matches} rows): {status}")
+    return failures
+
+
+if __name__ == "__main__":
+    words = WORDS + sys.argv[1:]
+    failures = check(SearchIndex([NAMES]), words[:4], "names")
+
+    df = load_restaurants(columns=["restaurant_name", "keywords", "top_tags"])
+    index = SearchIndex([df["restaurant_name"], df["keywords"], df["top_tags"]])
+    failures += check(index, words, "dataset")
+
+    print(f"{failures} failing prefixes")
+    if failures:
+        raise SystemExit(1)
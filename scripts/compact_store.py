@@ -0,0 +1,210 @@
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+from restaurants_data import CACHE_DIR as COLUMNAR_CACHE_DIR
+from restaurants_data import ensure_cache, load_restaurants
+
+# Compact, shared in-memory representation of the restaurants frame.
+#
+# Every gunicorn worker used to hold its own copy of `df_restaurants`, including
+# a Python string object per restaurant name and per cuisines list. Here the
+# columns a dashboard needs are written once into a single binary file:
+#
+#   - strings are dictionary-encoded: integer codes (int8 / int16 / int32, the
+#     smallest that fits) plus the distinct values, stored as UTF-8 bytes and
+#     offsets (like an Arrow dictionary array);
+#   - numbers are downcast when it is lossless (float64 -> float32, int64 ->
+#     the smallest integer type);
+#
+# and every worker memory-maps that file read-only. The column arrays are views
+# of the mapping, so the pages live once in the OS page cache and are shared by
+# all the workers instead of being copied into each of them. Only the decoded
+# dictionaries (one string per distinct value) are private to each worker.
+#
+# The file is built from the columnar cache of restaurants_data.py and stored
+# per dataset version and column selection:
+#
+#   datasets/.cache/compact/<dataset version>-<columns hash>.bin
+#
+#   frame = compact_restaurants(["restaurant_name", "region", "avg_rating"], dropna=["region"])
+#   df_restaurants = frame.to_pandas()
+
+CACHE_DIR = os.path.join("datasets", ".cache", "compact")
+
+MAGIC = b"DASHCOL1"
+ALIGNMENT = 64
+
+
+def _smallest_int(max_value, signed=True):
+    for dtype in ([np.int8, np.int16, np.int32, np.int64] if signed else [np.uint32, np.uint64]):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"{max_value} doesn't fit in 64 bits")
+
+
+# Encode one column into named buffers, returning (column header, buffers)
+def _encode_column(name, values):
+    if isinstance(values.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.array.codes
+            dictionary = values.cat.categories.tolist()
+        else:
+            # Sorted dictionary, like the categorical columns of restaurants_data.py
+            codes, uniques = pd.factorize(values, sort=True)
+            dictionary = uniques.tolist()
+        encoded = [value.encode("utf-8") for value in dictionary]
+        offsets = np.concatenate([[0], np.cumsum([len(value) for value in encoded])])
+        buffers = {
+            "codes": np.asarray(codes).astype(_smallest_int(max(len(dictionary) - 1, 0))),
+            "offsets": offsets.astype(_smallest_int(int(offsets[-1]), signed=False)),
+            "data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+        return {"name": name, "kind": "dictionary"}, buffers
+
+    array = values.to_numpy()
+    if array.dtype.kind == "f" and array.dtype.itemsize > 4:
+        downcast = array.astype(np.float32)
+        if np.array_equal(downcast.astype(array.dtype), array, equal_nan=True):
+            array = downcast
+    elif array.dtype.kind == "i" and len(array):
+        dtype = _smallest_int(max(int(array.max()), -int(array.min()) - 1))
+        if dtype.itemsize < array.dtype.itemsize:
+            array = array.astype(dtype)
+    elif array.dtype.kind not in "iub":
+        raise TypeError(f"Column {name} has an unsupported dtype: {array.dtype}")
+    return {"name": name, "kind": "numeric"}, {"values": array}
+
+
+# Write the columns of a DataFrame into a compact file (atomically)
+def write_compact_frame(df, path):
+    columns = []
+    chunks = []
+    offset = 0
+    for name in df.columns:
+        header, buffers = _encode_column(name, df[name])
+        header["buffers"] = {}
+        for buffer_name, array in buffers.items():
+            array = np.ascontiguousarray(array)
+            header["buffers"][buffer_name] = {
+                "offset": offset,
+                "dtype": array.dtype.str,
+                "count": len(array),
+            }
+            chunks.append((offset, array))
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        columns.append(header)
+
+    header_bytes = json.dumps(
+        {"row_count": len(df), "attrs": df.attrs, "columns": columns}, ensure_ascii=False
+    ).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for chunk_offset, array in chunks:
+            f.seek(data_start + chunk_offset)
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+class CompactFrame:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compact frame file")
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length).decode("utf-8"))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.row_count = header["row_count"]
+        self.attrs = header["attrs"]
+        self.columns = {column["name"]: column for column in header["columns"]}
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+        self._data = np.frombuffer(self._mmap, dtype=np.uint8, offset=data_start)
+        self._dictionaries = {}
+
+    def __len__(self):
+        return self.row_count
+
+    def _buffer(self, name, buffer_name):
+        spec = self.columns[name]["buffers"][buffer_name]
+        dtype = np.dtype(spec["dtype"])
+        start = spec["offset"]
+        return self._data[start : start + spec["count"] * dtype.itemsize].view(dtype)
+
+    # Values of a numeric column, or codes of a dictionary column (-1 for missing),
+    # as a read-only view of the shared mapping
+    def array(self, name):
+        kind = self.columns[name]["kind"]
+        return self._buffer(name, "values" if kind == "numeric" else "codes")
+
+    # Distinct values of a dictionary column (decoded once per process)
+    def dictionary(self, name):
+        if name not in self._dictionaries:
+            offsets = self._buffer(name, "offsets")
+            data = self._buffer(name, "data").tobytes()
+            self._dictionaries[name] = [
+                data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])
+            ]
+        return self._dictionaries[name]
+
+    # Column as a Series over the shared arrays: numeric columns keep their compact
+    # dtype, dictionary columns become categoricals whose codes stay in the mapping
+    def series(self, name):
+        if self.columns[name]["kind"] == "numeric":
+            values = self.array(name)
+        else:
+            values = pd.Categorical.from_codes(self.array(name), categories=self.dictionary(name))
+        return pd.Series(values, name=name, copy=False)
+
+    # DataFrame of `series` columns, built without copying them: each column is its
+    # own block, a view of the mapping. pandas would merge the blocks of a dtype
+    # into one private array if the frame were consolidated, which column access,
+    # row selections and reductions don't do; callbacks select the columns they
+    # need before taking rows.
+    def to_pandas(self, columns=None):
+        names = list(columns if columns is not None else self.columns)
+        df = pd.DataFrame({name: self.series(name) for name in names}, copy=False)
+        df.attrs.update(self.attrs)
+        return df
+
+    @property
+    def nbytes(self):
+        return len(self._mmap)
+
+
+# Compact frame of the restaurants dataset with the given columns, without the
+# rows that miss a value in one of the `dropna` columns. Built on first use.
+def compact_restaurants(
+    columns, dropna=(), cache_dir=CACHE_DIR, source_path=None, columnar_cache_dir=COLUMNAR_CACHE_DIR
+):
+    version = ensure_cache(source_path, columnar_cache_dir)["version"]
+    selection = json.dumps([list(columns), list(dropna)])
+    digest = hashlib.sha256(selection.encode("utf-8")).hexdigest()[:12]
+    path = os.path.join(cache_dir, f"{version}-{digest}.bin")
+    if not os.path.exists(path):
+        df = load_restaurants(list(columns), source_path, columnar_cache_dir)
+        if dropna:
+            df = df[df[list(dropna)].notna().all(axis=1)].reset_index(drop=True)
+        write_compact_frame(df, path)
+
+        # Remove the files of older dataset versions
+        for entry in os.listdir(cache_dir):
+            if entry.endswith(".bin") and not entry.startswith(f"{version}-"):
+                try:
+                    os.remove(os.path.join(cache_dir, entry))
+                except OSError:
+                    pass
+
+    return CompactFrame(path)
@@ -1,16 +1,82 @@
-import pandas as pd
-import plotly.express as px
+from types import SimpleNamespace
+
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+
+from callback_cache import CallbackCache, FileCacheBackend, normalize_value
+from callback_metrics import instrument_callbacks_from_env
+from callback_timing import count, step
+from dataset_versions import DatasetVersions
+from figure_builder import bar_figure
+from lazy_data import LazyData
+from restaurants_data import dataset_changed, ensure_cache, extends_version, load_restaurants
+from session_recording import record_sessions_from_env
+from top_k import TopKIndex
+
+# Seconds between two checks for a new version of the dataset
+DATA_POLL_SECONDS = 10
+
+
+# Load the data of one version of the dataset. With `previous` (the data being
+# served), load the current version: if rows were only appended to the CSV, the
+# top 10 lists of `previous` are updated with the new rows instead of being rebuilt.
+def load_city_data(previous=None):
+    manifest = ensure_cache()
+    if previous is not None and manifest["version"] == previous.dataset_version:
+        return SimpleNamespace(**{**vars(previous), "manifest": manifest})
+
+    # Load restaurant data and filter out entries without a city
+    df_restaurants = load_restaurants(
+        columns=["restaurant_name", "city", "total_reviews_count"]
+    )
+    df_restaurants = df_restaurants[df_restaurants["city"].notna()]
+
+    # Generate a list of unique city names to populate the dropdown options, sorted alphabetically
+    cities = df_restaurants["city"].sort_values().unique().tolist()
+
+    # Precompute the top 10 restaurants of every city, so the callback only looks them up
+    if previous is not None and extends_version(manifest, previous.dataset_version):
+        top_restaurants_by_city = previous.top_restaurants_by_city.appended(
+            df_restaurants, "total_reviews_count", len(previous.df_restaurants)
+        )
+    else:
+        top_restaurants_by_city = TopKIndex(
+            df_restaurants, "total_reviews_count", ["city"], k=10
+        )
+
+    return SimpleNamespace(
+        df_restaurants=df_restaurants,
+        cities=cities,
+        top_restaurants_by_city=top_restaurants_by_city,
+        dataset_version=df_restaurants.attrs["dataset_version"],
+        manifest=manifest,
+    )
 
-# Load restaurant data and filter out entries without a city
-df_restaurants = pd.read_csv("datasets/tripadvisor_restaurants_greece.csv")
-df_restaurants = df_restaurants[df_restaurants["city"].notna()]
 
+# Loaded at import; callbacks read `city_data.get()` once, so a callback running
+# while a new version is swapped in finishes on the version it started with
+city_data = LazyData(load_city_data)
+city_data.get()
 
-# Generate a list of unique city names to populate the dropdown options, sorted alphabetically
-cities = df_restaurants["city"].sort_values().unique().tolist()
+# Load the next version of the dataset in the background when the CSV changes
+dataset_versions = DatasetVersions(
+    city_data,
+    changed=lambda data: dataset_changed(data.manifest),
+    update=load_city_data,
+    interval=DATA_POLL_SECONDS,
+)
+
+# Cache of recently served figures, shared between the workers through a directory.
+# Keys include the dataset version, so a new CSV never serves stale figures: the
+# version of the snapshot the callback receives and computes from.
+figure_cache = CallbackCache(
+    max_bytes=16 * 1024 * 1024,
+    ttl=600,
+    backend=FileCacheBackend("datasets/.cache/callbacks", ttl=600),
+    snapshot=city_data.get,
+    namespace=lambda data: data.dataset_version,
+)
 
 
 # Initialize the Dash app and define its HTML structure
@@ -34,7 +100,7 @@ app.layout = html.Div(
                 ),
                 dcc.Dropdown(
                     id="city-dropdown",
-                    options=cities,
+                    options=city_data.get().cities,
                     value="Athens",  # Set default value to Athens
                     clearable=False,
                     style={"width": "300px"},
@@ -42,30 +108,62 @@ app.layout = html.Div(
             ]
         ),
         dcc.Graph(id="bar-chart"),
+        # Version of the dataset shown by the page, checked every DATA_POLL_SECONDS
+        dcc.Store(id="data-version", data=city_data.get().dataset_version),
+        dcc.Interval(id="data-version-poll", interval=DATA_POLL_SECONDS * 1000),
     ]
 )
 
 
+# Once this worker serves a new version of the dataset, send the page its version
+# (which updates the chart) and its cities
+@app.callback(
+    Output("data-version", "data"),
+    Output("city-dropdown", "options"),
+    Input("data-version-poll", "n_intervals"),
+    State("data-version", "data"),
+    prevent_initial_call=True,
+)
+def refresh_data_version(n_intervals, version):
+    data = dataset_versions.poll()
+    if data is None or data.dataset_version == version:
+        return dash.no_update, dash.no_update
+    return data.dataset_version, data.cities
+
+
 # Callback function to update the bar chart when a different city is selected
-@app.callback(Output("bar-chart", "figure"), Input("city-dropdown", "value"))
-def update_chart(selected_city):
-    filtered_df = df_restaurants[df_restaurants["city"] == selected_city]
-    top_restaurants = filtered_df.sort_values(
-        by="total_reviews_count", ascending=False
-    ).head(10)
-    fig = px.bar(
-        top_restaurants,
-        x="restaurant_name",
-        y="total_reviews_count",
-        title=f"Top 10 Restaurants in {selected_city}",
-        labels={
-            "restaurant_name": "Restaurant Name",
-            "total_reviews_count": "Total Reviews",
-        },
-    )
+@app.callback(
+    Output("bar-chart", "figure"),
+    Input("city-dropdown", "value"),
+    Input("data-version", "data"),
+)
+@figure_cache.memoize(normalize_value)
+def update_chart(data, selected_city, version):
+    with step("sort"):
+        top_rows = data.top_restaurants_by_city.lookup(selected_city)
+        top_restaurants = data.df_restaurants.iloc[top_rows]
+    # The per-city index is read directly: only the top rows are touched
+    count("rows_scanned", len(top_rows))
+    count("rows_filtered", len(top_rows))
+    # Same figure as px.bar, built from a cached layout so only the data changes
+    with step("figure"):
+        fig = bar_figure(
+            top_restaurants["restaurant_name"],
+            top_restaurants["total_reviews_count"],
+            x_label="Restaurant Name",
+            y_label="Total Reviews",
+            title=f"Top 10 Restaurants in {selected_city}",
+        )
     return fig
 
 
+# Measurement mode: per-callback metrics on /metrics (CALLBACK_METRICS=1)
+instrument_callbacks_from_env(app)
+
+# Record the callback requests of the user sessions for load_test.py (RECORD_SESSIONS=file)
+record_sessions_from_env(app)
+
+
 # Execute the application server with debug enabled
 if __name__ == "__main__":
     app.run(debug=True)
@@ -1,11 +1,16 @@
-import pandas as pd
 import plotly.express as px
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 
+from callback_metrics import instrument_callbacks_from_env
+from callback_timing import count, step
+from restaurants_data import load_restaurants
+from session_recording import record_sessions_from_env
+from top_k import TopKIndex
+
 # Load restaurant data and filter out entries without a city or price level
-df_restaurants = pd.read_csv("datasets/tripadvisor_restaurants_greece.csv")
+df_restaurants = load_restaurants(columns=["restaurant_name", "city", "price_level", "total_reviews_count"])
 df_restaurants = df_restaurants[df_restaurants["city"].notna() & df_restaurants["price_level"].notna()]
 
 # Generate a list of unique city names to populate the dropdown options, sorted alphabetically
@@ -14,6 +19,9 @@ cities = df_restaurants["city"].sort_values().unique().tolist()
 # Generate a list of unique price levels to populate the second dropdown
 price_levels = df_restaurants["price_level"].unique().tolist()
 
+# Precompute the top 10 restaurants of every (city, price level) pair
+top_restaurants_by_city_and_price = TopKIndex(df_restaurants, "total_reviews_count", ["city", "price_level"], k=10)
+
 # Initialize the Dash app and define its HTML structure
 app = dash.Dash(__name__)
 app.layout = html.Div([
@@ -48,17 +56,27 @@ app.layout = html.Div([
     [Input("city-dropdown", "value"), Input("price-level-dropdown", "value")]
 )
 def update_chart(selected_city, selected_price_level):
-    filtered_df = df_restaurants[(df_restaurants["city"] == selected_city) & (df_restaurants["price_level"] == selected_price_level)]
-    top_restaurants = filtered_df.sort_values(by="total_reviews_count", ascending=False).head(10)
-    fig = px.bar(
-        top_restaurants,
-        x="restaurant_name",
-        y="total_reviews_count",
-        title=f"Top 10 {selected_price_level} Restaurants in {selected_city}",
-        labels={"restaurant_name": "Restaurant Name", "total_reviews_count": "Total Reviews"}
-    )
+    with step("sort"):
+        top_rows = top_restaurants_by_city_and_price.lookup(selected_city, selected_price_level)
+        top_restaurants = df_restaurants.iloc[top_rows]
+    count("rows_scanned", len(top_rows))
+    count("rows_filtered", len(top_rows))
+    with step("figure"):
+        fig = px.bar(
+            top_restaurants,
+            x="restaurant_name",
+            y="total_reviews_count",
+            title=f"Top 10 {selected_price_level} Restaurants in {selected_city}",
+            labels={"restaurant_name": "Restaurant Name", "total_reviews_count": "Total Reviews"}
+        )
     return fig
 
+# Measurement mode: per-callback metrics on /metrics (CALLBACK_METRICS=1)
+instrument_callbacks_from_env(app)
+
+# Record the callback requests of the user sessions for load_test.py (RECORD_SESSIONS=file)
+record_sessions_from_env(app)
+
 # Execute the application server with debug enabled
 if __name__ == "__main__":
     app.run(debug=True)
@@ -1,27 +1,40 @@
 # Import necessary libraries
-import pandas as pd
 import plotly.express as px
 import dash
 from dash import dcc
 from dash import html
 
-# Load the dataset
-df_restaurants = pd.read_csv("datasets/tripadvisor_restaurants_greece.csv")
-
-# Sort the DataFrame by 'total_reviews_count' in descending order to get the top 10 restaurants
-top_restaurants = df_restaurants.sort_values(
-    by="total_reviews_count", ascending=False
-).head(10)
-
-# Create the bar chart with Plotly Express
-fig = px.bar(
-    top_restaurants,
-    x="restaurant_name",
-    y="total_reviews_count",
-    labels={
-        "restaurant_name": "Restaurant Name",
-        "total_reviews_count": "Total Reviews",
-    },
+from figure_store import cached_figure
+from restaurants_data import DATASET_NAME, load_restaurants
+
+
+def build_figure():
+    # Load the dataset (only the columns needed for the chart)
+    df_restaurants = load_restaurants(columns=["restaurant_name", "total_reviews_count"])
+
+    # Sort the DataFrame by 'total_reviews_count' in descending order to get the top 10 restaurants
+    top_restaurants = df_restaurants.sort_values(
+        by="total_reviews_count", ascending=False
+    ).head(10)
+
+    # Create the bar chart with Plotly Express
+    return px.bar(
+        top_restaurants,
+        x="restaurant_name",
+        y="total_reviews_count",
+        labels={
+            "restaurant_name": "Restaurant Name",
+            "total_reviews_count": "Total Reviews",
+        },
+    )
+
+
+# The figure only changes with the dataset, so it is built once and then read from the figure store
+fig = cached_figure(
+    {"name": "top-10-restaurants-by-reviews"},
+    build_figure,
+    datasets=[DATASET_NAME],
+    as_dict=True,
 )
 
 # Initialize the Dash app
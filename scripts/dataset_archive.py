@@ -0,0 +1,95 @@
+import hashlib
+import mmap
+import os
+import shutil
+import zipfile
+
+import pandas as pd
+
+# Access to the lab datasets straight from `datasets.zip`.
+#
+# The scripts used to expect an extracted `datasets/` folder. With this module a
+# dataset is looked up by file name ("amzn.csv", "international_tourism.csv",
+# "tripadvisor_restaurants_greece.csv"):
+#
+#   1. if `datasets/<name>` exists (the archive was extracted), it is used as is;
+#   2. otherwise the member is decompressed from `datasets.zip`, streaming it in
+#      blocks, into `datasets/.cache/archive/<crc>-<name>`. This happens once:
+#      every later call, from any process, reuses that file.
+#
+# Files are read through memory maps, so the decompressed bytes live once in the
+# OS page cache and are shared by all the worker processes that read them,
+# instead of each worker holding a private copy.
+
+DATASETS_DIR = "datasets"
+DATASETS_ZIP = "datasets.zip"
+CACHE_DIR = os.path.join(DATASETS_DIR, ".cache", "archive")
+
+
+def _find_member(archive, name):
+    for info in archive.infolist():
+        if not info.is_dir() and os.path.basename(info.filename) == name:
+            return info
+    raise FileNotFoundError(f"{name} not found in {archive.filename}")
+
+
+# Return the path of a decompressed copy of a dataset, decompressing it if needed
+def dataset_path(
+    name, archive_path=DATASETS_ZIP, datasets_dir=DATASETS_DIR, cache_dir=CACHE_DIR
+):
+    extracted_path = os.path.join(datasets_dir, name)
+    if os.path.exists(extracted_path):
+        return extracted_path
+    if not os.path.exists(archive_path):
+        raise FileNotFoundError(f"Neither {extracted_path} nor {archive_path} exist")
+
+    with zipfile.ZipFile(archive_path) as archive:
+        info = _find_member(archive, name)
+        # The CRC identifies the content, so a new archive never reuses a stale copy
+        cached_path = os.path.join(cache_dir, f"{info.CRC:08x}-{name}")
+        if os.path.exists(cached_path) and os.path.getsize(cached_path) == info.file_size:
+            return cached_path
+
+        # Decompress into a temporary file, then rename it, so that concurrent
+        # workers never see a partially written file
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+        with archive.open(info) as source, open(tmp_path, "wb") as target:
+            shutil.copyfileobj(source, target, 1 << 20)
+        os.replace(tmp_path, cached_path)
+
+    # Remove copies decompressed from older versions of the archive
+    for entry in os.listdir(cache_dir):
+        if entry.endswith(f"-{name}") and entry != os.path.basename(cached_path):
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except OSError:
+                pass
+
+    return cached_path
+
+
+# Compute the SHA-256 of a file (of its first `size` bytes if given), reading it
+# in blocks to keep memory flat
+def file_sha256(path, size=None):
+    digest = hashlib.sha256()
+    remaining = float("inf") if size is None else size
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(int(min(remaining, 1 << 20)))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+# Open a dataset as a read-only memory map (shared between processes)
+def open_dataset(name, **kwargs):
+    with open(dataset_path(name, **kwargs), "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Read a CSV dataset with pandas, through a memory map of the decompressed file
+def read_dataset_csv(name, **read_csv_kwargs):
+    return pd.read_csv(dataset_path(name), memory_map=True, **read_csv_kwargs)
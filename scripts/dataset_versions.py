@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+# Hot reload of the data of a dashboard when its dataset changes.
+#
+# The data a dashboard loads once (see lazy_data.py) is a snapshot of one
+# version of the dataset. `DatasetVersions(data, changed, update)` keeps it
+# current without restarting the server:
+#
+#   - `poll()` is called from a periodic callback (dcc.Interval). At most once
+#     per `interval` seconds, it calls `changed(snapshot)`, which must be cheap
+#     (e.g. a stat of the CSV against the manifest of the snapshot);
+#   - if the dataset changed, `update(snapshot)` builds the next snapshot in a
+#     background thread: from the previous one, when only rows were appended, or
+#     from scratch. The requests keep being served from the previous snapshot;
+#   - the new snapshot replaces the previous one with a single assignment.
+#
+# Callbacks read `data.get()` once and use that snapshot until they return, so a
+# callback that is running during the swap finishes on the version it started
+# with. Every worker process polls and swaps on its own; they converge on the
+# version published in the cache directory within one polling interval.
+
+
+class DatasetVersions:
+    def __init__(self, data, changed, update, interval=5.0):
+        self.data = data
+        self.changed = changed
+        self.update = update
+        self.interval = interval
+        self.reloads = 0
+        self.last_reload_seconds = None
+        self.error = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self._updating = False
+
+    def _run(self, previous):
+        start = time.perf_counter()
+        try:
+            self.data.value = self.update(previous)
+            self.reloads += 1
+            self.error = None
+        except Exception as error:  # the previous snapshot keeps being served
+            self.error = error
+        self.last_reload_seconds = time.perf_counter() - start
+        with self._lock:
+            self._updating = False
+
+    # Start loading the next snapshot if the dataset changed (rate-limited); return
+    # the current snapshot. Doesn't wait for the data if it is still loading.
+    def poll(self):
+        # An update running in the parent process doesn't exist after a fork
+        if self._pid != os.getpid():
+            self._reset()
+        if not self.data.ready:
+            return None
+        snapshot = self.data.value
+        now = time.monotonic()
+        with self._lock:
+            if self._updating or now - self._checked_at < self.interval:
+                return snapshot
+            self._checked_at = now
+        if not self.changed(snapshot):
+            return snapshot
+        with self._lock:
+            if self._updating:
+                return snapshot
+            self._updating = True
+        threading.Thread(
+            target=self._run, args=(snapshot,), name="data-reloader", daemon=True
+        ).start()
+        return snapshot
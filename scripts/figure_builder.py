@@ -0,0 +1,297 @@
+import base64
+import functools
+
+import numpy as np
+from dash import Patch
+
+# Lightweight figure construction for the hot dashboard callbacks.
+#
+# `px.bar` / `px.pie` validate their arguments and build a whole DataFrame just
+# to draw 10-20 bars, which is a large share of each callback's latency. The
+# functions below produce the same figures as plain dicts:
+#
+#   - the layout and trace "skeleton" are generated once per chart spec with
+#     Plotly Express itself (so the output matches it) and then cached;
+#   - each call only fills in the trace data, encoding numeric NumPy arrays
+#     the same way `Figure.to_dict()` does.
+#
+# Dash accepts figure dicts directly, and they serialize to the same JSON as the
+# Plotly Express figures they replace.
+#
+# `bar_patch` / `pie_patch` go one step further: they return a `dash.Patch` that
+# only replaces the trace data of a figure created with `bar_figure` /
+# `pie_figure`, so the layout is sent to the browser once, with the page.
+
+# Placeholder title used while building a skeleton, replaced on every call
+_TITLE_PLACEHOLDER = "\0title"
+
+
+# plotly.js typed array types, by NumPy dtype
+_TYPED_ARRAY_DTYPES = {
+    "int8": "i1",
+    "uint8": "u1",
+    "int16": "i2",
+    "uint16": "u2",
+    "int32": "i4",
+    "uint32": "u4",
+    "float32": "f4",
+    "float64": "f8",
+}
+
+
+# Encode trace data the same way `Figure.to_dict()` does (Plotly 6):
+# numeric arrays become base64 typed arrays ({"dtype", "bdata", "shape"}),
+# 64-bit integers narrowed to the smallest type holding their range
+# (plotly.js has no 64-bit integer arrays), everything else becomes a list
+def _encode(values):
+    array = np.asarray(values)
+    if array.size == 0 or array.dtype.kind not in "iuf":
+        return array.tolist()
+    if array.dtype.name in ("int64", "uint64"):
+        narrower = ["int8", "int16", "int32"] if array.dtype.kind == "i" else ["uint8", "uint16", "uint32"]
+        low, high = array.min(), array.max()
+        dtype = next(
+            (dtype for dtype in narrower if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max),
+            None,
+        )
+        if dtype is None:
+            return array.tolist()
+        array = array.astype(dtype)
+    typed_array_type = _TYPED_ARRAY_DTYPES.get(array.dtype.name)
+    if typed_array_type is None:
+        return array.tolist()
+    data = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    spec = {"dtype": typed_array_type, "bdata": base64.b64encode(data).decode("ascii")}
+    if array.ndim > 1:
+        spec["shape"] = ", ".join(str(length) for length in array.shape)
+    return spec
+
+
+def _with_title(layout, title):
+    if title is None:
+        return {key: value for key, value in layout.items() if key != "title"}
+    return {
+        key: ({**value, "text": title} if key == "title" else value)
+        for key, value in layout.items()
+    }
+
+
+# Plotly Express (and pandas with it) is only imported when the first skeleton
+# is built, not when a dashboard imports this module
+@functools.lru_cache(maxsize=None)
+def _bar_skeleton(x_label, y_label):
+    import plotly.express as px
+
+    fig = px.bar(
+        x=["x"],
+        y=[0],
+        labels={"x": x_label, "y": y_label},
+        title=_TITLE_PLACEHOLDER,
+    ).to_dict()
+    return fig["data"][0], fig["layout"]
+
+
+@functools.lru_cache(maxsize=None)
+def _pie_skeleton(names_label, values_label):
+    import plotly.express as px
+
+    fig = px.pie(
+        names=["x"],
+        values=[0],
+        labels={"names": names_label, "values": values_label},
+        title=_TITLE_PLACEHOLDER,
+    ).to_dict()
+    return fig["data"][0], fig["layout"]
+
+
+@functools.lru_cache(maxsize=None)
+def _line_skeleton(x_label, y_label):
+    import plotly.express as px
+
+    fig = px.line(
+        x=[0],
+        y=[0],
+        labels={"x": x_label, "y": y_label},
+        title=_TITLE_PLACEHOLDER,
+    ).to_dict()
+    return fig["data"][0], fig["layout"]
+
+
+# Bar chart, equivalent to
+# px.bar(x=x, y=y, labels={"x": x_label, "y": y_label}, title=title)
+def bar_figure(x, y, x_label, y_label, title=None):
+    trace, layout = _bar_skeleton(x_label, y_label)
+    trace = {**trace, "x": _encode(x), "y": _encode(y)}
+    return {"data": [trace], "layout": _with_title(layout, title)}
+
+
+# Pie chart, equivalent to
+# px.pie(names=names, values=values, labels={"names": names_label, "values": values_label}, title=title)
+def pie_figure(names, values, names_label, values_label, title=None):
+    trace, layout = _pie_skeleton(names_label, values_label)
+    trace = {**trace, "labels": _encode(names), "values": _encode(values)}
+    return {"data": [trace], "layout": _with_title(layout, title)}
+
+
+# Line chart, equivalent to
+# px.line(x=x, y=y, labels={"x": x_label, "y": y_label}, title=title).
+# x_type sets the type of the x axis, e.g. "date" for timestamps in milliseconds
+# (which are sent as a typed array, unlike datetime strings).
+def line_figure(x, y, x_label, y_label, title=None, x_type=None):
+    trace, layout = _line_skeleton(x_label, y_label)
+    trace = {**trace, "x": _encode(x), "y": _encode(y)}
+    layout = _with_title(layout, title)
+    if x_type is not None:
+        layout["xaxis"] = {**layout["xaxis"], "type": x_type}
+    return {"data": [trace], "layout": layout}
+
+
+# Animated horizontal bar chart ("bar race") with a slider and a play button.
+# `frames` is a list of (label, names, values), e.g. one per year, with the
+# largest value first, and `title` a template of the frame titles ("... {label}").
+# Each frame only holds its bars (as plain lists, which plotly.js animates), the
+# x axis range and the title: the browser plays and scrubs through them without
+# calling the server.
+def bar_race_figure(frames, x_label, y_label, title, frame_duration=400):
+    trace, layout = _bar_skeleton(x_label, y_label)
+    trace = {
+        **trace,
+        "orientation": "h",
+        "hovertemplate": f"{y_label}=%{{y}}<br>{x_label}=%{{x}}<extra></extra>",
+        "texttemplate": "%{x:.3s}",
+        "textposition": "outside",
+    }
+
+    def frame_fragment(label, names, values):
+        values = np.asarray(values, dtype="float64")
+        return {
+            "name": str(label),
+            "data": [{"x": values.tolist(), "y": list(names)}],
+            "layout": {
+                "xaxis": {"range": [0, float(values.max(initial=0)) * 1.15 or 1]},
+                "title": {"text": title.format(label=label)},
+            },
+        }
+
+    fragments = [frame_fragment(*frame) for frame in frames]
+    labels = [fragment["name"] for fragment in fragments]
+
+    # Frames are redrawn (their bars may be other categories) with a short transition
+    def animate(frame_labels, duration):
+        return [
+            frame_labels,
+            {
+                "mode": "immediate",
+                "frame": {"duration": duration, "redraw": True},
+                "transition": {"duration": duration // 2},
+            },
+        ]
+
+    layout = _with_title(layout, None)
+    layout = {
+        **layout,
+        "xaxis": {**layout["xaxis"], "autorange": False},
+        "yaxis": {**layout["yaxis"], "autorange": "reversed"},
+        "updatemenus": [
+            {
+                "type": "buttons",
+                "showactive": False,
+                "x": 0,
+                "y": -0.15,
+                "xanchor": "right",
+                "yanchor": "top",
+                "buttons": [
+                    {
+                        "label": "Play",
+                        "method": "animate",
+                        "args": animate(None, frame_duration),
+                    },
+                    {"label": "Pause", "method": "animate", "args": animate([None], 0)},
+                ],
+            }
+        ],
+        "sliders": [
+            {
+                "active": len(fragments) - 1,
+                "x": 0.05,
+                "len": 0.95,
+                "y": -0.1,
+                "yanchor": "top",
+                "steps": [
+                    {"label": label, "method": "animate", "args": animate([label], 0)}
+                    for label in labels
+                ],
+            }
+        ],
+    }
+    if fragments:
+        last = fragments[-1]
+        trace = {**trace, **last["data"][0]}
+        layout["xaxis"]["range"] = last["layout"]["xaxis"]["range"]
+        layout["title"] = last["layout"]["title"]
+    return {"data": [trace], "layout": layout, "frames": fragments}
+
+
+# Patch replacing the data of a figure created with `bar_figure`
+def bar_patch(x, y):
+    patch = Patch()
+    patch["data"][0]["x"] = _encode(x)
+    patch["data"][0]["y"] = _encode(y)
+    return patch
+
+
+# Patch replacing the data of a figure created with `pie_figure`
+def pie_patch(names, values):
+    patch = Patch()
+    patch["data"][0]["labels"] = _encode(names)
+    patch["data"][0]["values"] = _encode(values)
+    return patch
+
+
+# Patch replacing the data of a figure created with `line_figure`
+def line_patch(x, y):
+    patch = Patch()
+    patch["data"][0]["x"] = _encode(x)
+    patch["data"][0]["y"] = _encode(y)
+    return patch
+
+
+# Map of clustered markers (scattermap, MapLibre tiles: no token needed), colored
+# by `color_label` (e.g. the average rating). The markers are set with `map_patch`;
+# uirevision keeps the user's pan / zoom when they are replaced.
+def map_figure(center, zoom, color_label, color_range, title=None):
+    layout = {
+        "map": {"style": "open-street-map", "center": center, "zoom": zoom},
+        "margin": {"l": 0, "r": 0, "t": 40 if title else 0, "b": 0},
+        "uirevision": "map",
+    }
+    if title is not None:
+        layout["title"] = {"text": title}
+    trace = {
+        "type": "scattermap",
+        "mode": "markers",
+        "lat": [],
+        "lon": [],
+        "text": [],
+        "hoverinfo": "text",
+        "marker": {
+            "size": [],
+            "color": [],
+            "cmin": color_range[0],
+            "cmax": color_range[1],
+            "colorscale": "Viridis",
+            "colorbar": {"title": {"text": color_label}},
+        },
+    }
+    return {"data": [trace], "layout": layout}
+
+
+# Patch replacing the markers of a figure created with `map_figure`
+def map_patch(latitude, longitude, sizes, colors, text):
+    patch = Patch()
+    patch["data"][0]["lat"] = _encode(latitude)
+    patch["data"][0]["lon"] = _encode(longitude)
+    patch["data"][0]["text"] = list(text)
+    patch["data"][0]["marker"]["size"] = _encode(sizes)
+    patch["data"][0]["marker"]["color"] = _encode(colors)
+    return patch
@@ -0,0 +1,123 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+
+import plotly
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+from dataset_archive import dataset_path, file_sha256
+
+# Content-addressed store for figures that only depend on the datasets.
+#
+# Some figures (the top-10 chart of dash_components.py, the figures of the
+# Plotly exercises) are the same on every run unless the data changes, yet they
+# are rebuilt on every start. `cached_figure` stores the serialized figure JSON
+# under a key that hashes:
+#
+#   - the content of the datasets it reads,
+#   - a JSON "spec" describing the figure,
+#   - the source code of the function that builds it, and the Plotly version,
+#
+# and returns the stored figure on later runs, without reading the datasets or
+# calling Plotly Express. Static PNG / SVG exports can be stored alongside
+# (`image_formats`), which needs the optional `kaleido` package.
+#
+#   fig = cached_figure({"name": "top-10-restaurants"}, build_figure,
+#                       datasets=["tripadvisor_restaurants_greece.csv"])
+
+STORE_DIR = os.path.join("datasets", ".cache", "figures")
+
+logger = logging.getLogger(__name__)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# Content hash of a dataset. Hashes are remembered per (path, size, mtime), so a
+# dataset is only read again after it has changed. Each dataset has its own
+# file, replaced atomically, so processes hashing different datasets at the same
+# time don't overwrite each other's entries.
+def dataset_fingerprint(name, store_dir=STORE_DIR):
+    path = os.path.abspath(dataset_path(name))
+    stat = os.stat(path)
+    path_digest = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+    fingerprint_path = os.path.join(store_dir, "fingerprints", f"{path_digest}.json")
+    try:
+        with open(fingerprint_path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        entry = None
+
+    if (
+        entry
+        and entry["path"] == path
+        and entry["size"] == stat.st_size
+        and entry["mtime_ns"] == stat.st_mtime_ns
+    ):
+        return entry["sha256"]
+
+    sha256 = file_sha256(path)
+    entry = {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    os.makedirs(os.path.dirname(fingerprint_path), exist_ok=True)
+    _write_atomic(fingerprint_path, json.dumps(entry, indent=2).encode("utf-8"))
+    return sha256
+
+
+def figure_key(spec, build, datasets=(), store_dir=STORE_DIR):
+    try:
+        source = inspect.getsource(build)
+    except (OSError, TypeError):
+        source = build.__qualname__
+    payload = {
+        "spec": spec,
+        "datasets": {name: dataset_fingerprint(name, store_dir) for name in datasets},
+        "build": hashlib.sha256(source.encode("utf-8")).hexdigest(),
+        "plotly": plotly.__version__,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Return the figure built by `build()`, from the store if it is already there.
+# - spec: JSON-serializable description of the figure (anything that changes it)
+# - datasets: names of the datasets read by `build`
+# - image_formats: e.g. ("png", "svg"), also stored as static images
+# - as_dict: return a plain figure dict (enough for dcc.Graph, and faster)
+def cached_figure(
+    spec, build, datasets=(), image_formats=(), as_dict=False, store_dir=STORE_DIR
+):
+    key = figure_key(spec, build, datasets, store_dir)
+    json_path = os.path.join(store_dir, f"{key}.json")
+
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            figure = json.load(f)
+    except (OSError, ValueError):
+        figure = None
+
+    if figure is None:
+        fig = build()
+        os.makedirs(store_dir, exist_ok=True)
+        _write_atomic(json_path, to_json_plotly(fig).encode("utf-8"))
+        for image_format in image_formats:
+            image_path = os.path.join(store_dir, f"{key}.{image_format}")
+            try:
+                go.Figure(fig).write_image(image_path)
+            except (ImportError, ValueError, RuntimeError) as error:
+                logger.warning("Could not export %s: %s", image_path, error)
+        figure = json.loads(to_json_plotly(fig))
+
+    return figure if as_dict else go.Figure(figure)
+
+
+# Path of a stored static image of a figure, or None if it hasn't been exported
+def figure_image_path(spec, build, image_format, datasets=(), store_dir=STORE_DIR):
+    key = figure_key(spec, build, datasets, store_dir)
+    path = os.path.join(store_dir, f"{key}.{image_format}")
+    return path if os.path.exists(path) else None
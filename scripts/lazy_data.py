@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+from flask import jsonify
+
+# Deferred loading of the data a dashboard needs.
+#
+# Reading the CSV and building the indexes at import time means a worker can't
+# answer anything, not even a health check, until all of it is done. With
+# `LazyData(load)`:
+#
+#   - `start()` runs `load()` in a background thread, so the module can be
+#     imported and the server can start listening right away;
+#   - `get()` returns the loaded value, waiting for the load if it is still
+#     running (or running it, if nothing started it);
+#   - `register_readiness(app, data)` adds a `/ready` endpoint answering 503
+#     until the data is loaded, for load balancers / orchestrators.
+#
+# With `gunicorn --preload`, call `get()` at import instead: the data is then
+# loaded once in the master process and the NumPy arrays are shared with the
+# forked workers (copy-on-write, they are never written to). A thread started
+# before a fork doesn't exist in the child: `get()` notices and loads again there.
+
+
+class LazyData:
+    def __init__(self, load):
+        self.load = load
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started = False
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.value = self.load()
+        except Exception as error:  # reported by get() and the readiness endpoint
+            self.error = error
+        self.load_seconds = time.perf_counter() - start
+        self._done.set()
+
+    def _claim(self):
+        if self._pid != os.getpid() and not self._done.is_set():
+            self._reset()
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            return True
+
+    # Start loading in a background thread (no-op if already started)
+    def start(self):
+        if self._claim():
+            threading.Thread(target=self._run, name="data-loader", daemon=True).start()
+        return self
+
+    # The loaded value; loads it in the calling thread if nobody started it
+    def get(self):
+        if not self._done.is_set() and self._claim():
+            self._run()
+        self._done.wait()
+        if self.error is not None:
+            raise RuntimeError("Loading the dashboard data failed") from self.error
+        return self.value
+
+
+# `/ready`: 200 once all the given data are loaded, 503 before (or if loading failed)
+def register_readiness(app, *data, path="/ready"):
+    def readiness():
+        errors = [repr(item.error) for item in data if item.error is not None]
+        body = {
+            "ready": all(item.ready for item in data),
+            "load_seconds": [item.load_seconds for item in data],
+        }
+        if errors:
+            body["errors"] = errors
+        return jsonify(body), 200 if body["ready"] else 503
+
+    app.server.add_url_rule(path, "readiness", readiness)
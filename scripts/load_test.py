@@ -0,0 +1,717 @@
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from dash._utils import split_callback_id
+
+from benchmark_callbacks import TRACES_PATH, summarize
+from benchmark_startup import SCRIPTS_DIR, free_port, status
+
+# Load test of a dashboard: where does it saturate?
+#
+# benchmark_callbacks.py measures the callbacks one call at a time, in-process.
+# This tool measures the whole server under concurrent users: it starts the
+# dashboard (or targets one that is already running), then replays user
+# sessions, i.e. sequences of `/_dash-update-component` requests, from N
+# simulated clients (asyncio tasks, each with its own keep-alive connection),
+# for each N of a concurrency ramp (1, 2, 4, ... by default). Per step it reports:
+#
+#   - throughput (completed requests per second) and latency percentiles;
+#   - error rate (HTTP errors, timeouts, dropped connections);
+#   - CPU of the server processes (100% = one core) and their total RSS (shared
+#     pages are counted in every worker, see benchmark_worker_memory.py for PSS),
+#     and the same per gunicorn worker (an idle or saturated worker doesn't show
+#     in the totals).
+#
+# Sessions come from a JSON Lines file (one request per line), either recorded
+# from real browsers with session_recording.py (RECORD_SESSIONS=file), or
+# generated from the input traces of benchmark_traces.json by the `sessions`
+# command. A client replays the requests of a session in order, like a browser
+# tab: the values the server sent back (e.g. the key of the filtered row set)
+# replace the recorded ones in the following requests, and background callbacks
+# are polled until they finish. Think times between user actions are kept,
+# scaled by --think-time-scale (0, the default, replays back to back).
+#
+# Servers (--server):
+#   thread   - the app's Flask server in a thread of this process (the CPU and
+#              RSS then include the clients)
+#   dev      - `app.run()` in a subprocess
+#   gunicorn - gunicorn with --workers / --threads (pip install gunicorn)
+# or --url for a server that is already running (--pid for its CPU / RSS).
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/load_test.py sessions --module restaurants_dashboard --output sessions.jsonl
+#   python scripts/load_test.py run --module restaurants_dashboard --sessions sessions.jsonl \
+#       --server gunicorn --workers 4 --output gunicorn-4.json
+#   python scripts/load_test.py compare gunicorn-4.json gunicorn-8.json
+
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16, 32, 64]
+UPDATE_PATH = "/_dash-update-component"
+
+# Callback whose inputs the steps of benchmark_traces.json set, per dashboard
+TRACE_CALLBACKS = {
+    "restaurants_dashboard": "filtered-rowset.data",
+    "dash_callbacks": "bar-chart.figure",
+    "dash_callbacks_practice": "bar-chart.figure",
+}
+
+
+def prop_key(component_id, prop):
+    if isinstance(component_id, dict):
+        component_id = json.dumps(component_id, sort_keys=True)
+    return f"{component_id}.{prop}"
+
+
+# Request body of a callback, as the Dash renderer sends it
+def request_body(output, callback, values, changed):
+    def props(dependencies):
+        return [
+            {
+                "id": dependency["id"],
+                "property": dependency["property"],
+                "value": values.get(prop_key(dependency["id"], dependency["property"])),
+            }
+            for dependency in dependencies
+        ]
+
+    return {
+        "output": output,
+        "outputs": split_callback_id(output),
+        "inputs": props(callback["inputs"]),
+        "changedPropIds": sorted(changed),
+        "state": props(callback.get("state", [])),
+    }
+
+
+# The requests a browser sends after the user changed `changed` (prop keys): the
+# callbacks with one of them as input, then the callbacks with one of their
+# outputs as input, and so on. Chained requests are only sent by the client if
+# the server changed one of their inputs ("requires_change").
+def requests_after_change(callback_map, values, changed):
+    requests = []
+    sent = set()
+    frontier = set(changed)
+    while frontier:
+        outputs = set()
+        for output, callback in callback_map.items():
+            inputs = {prop_key(i["id"], i["property"]) for i in callback["inputs"]}
+            triggers = inputs & frontier
+            if output in sent or not triggers:
+                continue
+            sent.add(output)
+            request = {"body": request_body(output, callback, values, triggers)}
+            if not triggers & set(changed):
+                request["requires_change"] = sorted(triggers)
+            requests.append(request)
+            for dependency in coerce_list(split_callback_id(output)):
+                outputs.add(prop_key(dependency["id"], dependency["property"]))
+        frontier = outputs
+    return requests
+
+
+def coerce_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+# One session per recorded trace of the module, plus `shuffled` sessions with the
+# same steps in random orders. A step sets the inputs of the module's trace
+# callback (in order); only the inputs that changed trigger callbacks.
+def sessions_from_traces(module_name, traces, shuffled, think_time, seed):
+    module = importlib.import_module(module_name)
+    callback_map = {
+        output: callback
+        for output, callback in module.app.callback_map.items()
+        # Pattern-matching callbacks need the ids of the page: not generated
+        if not any(isinstance(i["id"], dict) for i in callback["inputs"])
+    }
+    entry = callback_map[TRACE_CALLBACKS[module_name]]
+    entry_props = [prop_key(i["id"], i["property"]) for i in entry["inputs"]]
+
+    rng = random.Random(seed)
+    steps = traces.get(module_name, [])
+    orders = [steps] + [rng.sample(steps, len(steps)) for _ in range(shuffled)]
+
+    lines = []
+    for number, order in enumerate(orders):
+        values = {}
+        clock = 0.0
+        for args in order:
+            step_values = dict(zip(entry_props, list(args) + [None] * len(entry_props)))
+            changed = [
+                key
+                for key, value in step_values.items()
+                if key not in values or values[key] != value
+            ]
+            values.update(step_values)
+            for request in requests_after_change(callback_map, values, changed):
+                lines.append({"session": f"{module_name}-{number}", "time": clock, **request})
+            clock += think_time
+    return lines
+
+
+# Read a sessions file: one list of {"body", "wait", "requires_change"} per
+# session, in time order, with the waits between requests capped at `max_think`
+def load_sessions(path, max_think):
+    sessions = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                sessions.setdefault(entry["session"], []).append(entry)
+
+    replays = []
+    for entries in sessions.values():
+        entries.sort(key=lambda entry: entry["time"])
+        previous = entries[0]["time"]
+        requests = []
+        for entry in entries:
+            requests.append(
+                {
+                    "body": entry["body"],
+                    "wait": min(max(entry["time"] - previous, 0.0), max_think),
+                    "requires_change": set(entry.get("requires_change", [])),
+                }
+            )
+            previous = entry["time"]
+        replays.append(requests)
+    return replays
+
+
+# Minimal HTTP/1.1 client on asyncio streams, with a keep-alive connection
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def post(self, path, body):
+        payload = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+        ).encode("latin-1")
+        # A kept-alive connection the server has closed fails once: reconnect
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(head + payload)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by the server")
+        status_code = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self.reader.read()
+            self.close()
+            return status_code, data
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status_code, data
+
+
+# Send a callback request; background callbacks are polled until they finish.
+# Returns the HTTP status and the decoded response ({} for "no update").
+async def call_callback(connection, body, poll_interval):
+    status_code, data = await connection.post(UPDATE_PATH, body)
+    result = json.loads(data) if status_code == 200 and data else {}
+    while status_code == 200 and "cacheKey" in result and "response" not in result:
+        handles = {"cacheKey": result["cacheKey"], "job": result["job"]}
+        while True:
+            await asyncio.sleep(poll_interval)
+            status_code, data = await connection.post(f"{UPDATE_PATH}?{urlencode(handles)}", body)
+            result = json.loads(data) if status_code == 200 and data else {}
+            # Still running: an empty answer (or only progress)
+            if status_code != 200 or "response" in result:
+                break
+    return status_code, result
+
+
+# Copy of a request body with the input / state values the server sent instead of
+# the recorded ones
+def with_values(body, props):
+    body = dict(body)
+    for name in ("inputs", "state"):
+        dependencies = []
+        for dependency in body.get(name, []):
+            key = prop_key(dependency["id"], dependency["property"])
+            if key in props:
+                dependency = {**dependency, "value": props[key]}
+            dependencies.append(dependency)
+        body[name] = dependencies
+    return body
+
+
+# Replay a session like one browser tab, until the end of the session or the
+# deadline. Appends (latency in seconds, ok, output) to `results` per request.
+async def replay(connection, session, deadline, args, results):
+    props = {}  # values sent by the server, by prop key
+    changed = set()  # prop keys changed by the server since the last user action
+    for request in session:
+        wait = request["wait"] * args.think_time_scale
+        if wait > 0:
+            await asyncio.sleep(min(wait, max(deadline - time.monotonic(), 0)))
+        if time.monotonic() >= deadline:
+            return
+        if request["requires_change"]:
+            if not request["requires_change"] & changed:
+                continue
+        else:
+            changed = set()
+
+        body = with_values(request["body"], props)
+
+        start = time.perf_counter()
+        try:
+            status_code, result = await asyncio.wait_for(
+                call_callback(connection, body, args.poll_interval), args.timeout
+            )
+            ok = status_code in (200, 204)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            connection.close()
+            status_code, result, ok = None, {}, False
+        results.append((time.perf_counter() - start, ok, body["output"]))
+
+        for component_id, values in (result.get("response") or {}).items():
+            for prop, value in values.items():
+                # Patches only update figures, which are not callback inputs
+                if isinstance(value, dict) and "__dash_patch_update" in value:
+                    continue
+                key = prop_key(component_id, prop)
+                props[key] = value
+                changed.add(key)
+
+
+# CPU seconds and RSS (MB) of a process and its descendants, from /proc (Linux), in
+# total and per worker ({pid: usage}). With `split_children` (a gunicorn master),
+# each child of `root` is a worker, with its own descendants (e.g. the processes
+# of background jobs), and `root` is another one; otherwise the tree is one worker.
+# CPU includes the children that exited (once waited for: cutime / cstime of
+# their parent), e.g. finished background jobs. None where /proc is not available.
+def process_tree_usage(root, split_children=False):
+    if root is None or not os.path.isdir("/proc"):
+        return None
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="ascii") as f:
+                # Fields after the command name (which may contain spaces)
+                stats[int(entry)] = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+
+    children = {}
+    for pid, fields in stats.items():
+        children.setdefault(int(fields[1]), []).append(pid)
+
+    # Process -> the worker it belongs to
+    worker_of = {}
+    pending = [(root, root)] if root in stats else []
+    while pending:
+        pid, worker = pending.pop()
+        worker_of[pid] = worker
+        for child in children.get(pid, []):
+            if child not in worker_of:
+                pending.append((child, child if split_children and pid == root else worker))
+
+    ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    workers = {}
+    for pid, worker in worker_of.items():
+        fields = stats[pid]
+        usage = workers.setdefault(worker, {"cpu_seconds": 0.0, "rss_mb": 0.0})
+        # utime, stime, cutime, cstime
+        usage["cpu_seconds"] += sum(int(value) for value in fields[11:15]) / ticks
+        usage["rss_mb"] += int(fields[21]) * page_size / 2**20
+    return {
+        "cpu_seconds": sum(usage["cpu_seconds"] for usage in workers.values()),
+        "rss_mb": sum(usage["rss_mb"] for usage in workers.values()),
+        "processes": len(worker_of),
+        "workers": workers,
+    }
+
+
+# Application of the gunicorn workers: the Flask server of a dashboard module.
+# gunicorn only takes a name or a call after the colon, not "module:app.server".
+def flask_server(module_name):
+    return importlib.import_module(module_name).app.server
+
+
+def environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SCRIPTS_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+# Wait until the server answers "/" and, if it has a readiness endpoint, "/ready"
+def wait_until_ready(base, process=None, timeout=300):
+    start = time.perf_counter()
+    for path, accepted in (("/", {200}), ("/ready", {200, 404})):
+        while status(base + path) not in accepted:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"the server exited with code {process.returncode}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"no answer from {base}{path} after {timeout} s")
+            time.sleep(0.1)
+
+
+# Start the server to test; returns (host, port, pid to measure, stop function)
+def start_server(args):
+    if args.url:
+        address = urlsplit(args.url)
+        wait_until_ready(args.url.rstrip("/"))
+        return address.hostname, address.port or 80, args.pid, lambda: None
+
+    port = free_port()
+    if args.server == "thread":
+        from werkzeug.serving import make_server
+
+        # The request log would go to this terminal, between the results
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        module = importlib.import_module(args.module)
+        server = make_server("127.0.0.1", port, module.app.server, threaded=True)
+        threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+        wait_until_ready(f"http://127.0.0.1:{port}")
+        return "127.0.0.1", port, os.getpid(), server.shutdown
+
+    if args.server == "gunicorn":
+        if importlib.util.find_spec("gunicorn") is None:
+            raise SystemExit("gunicorn is not installed (pip install gunicorn)")
+        command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--workers",
+            str(args.workers),
+            "--threads",
+            str(args.threads),
+            "--bind",
+            f"127.0.0.1:{port}",
+            f"load_test:flask_server({args.module!r})",
+        ]
+        if args.preload:
+            command.insert(3, "--preload")
+    else:
+        command = [
+            sys.executable,
+            "-c",
+            f"import {args.module}; {args.module}.app.run(port={port}, debug=False)",
+        ]
+    process = subprocess.Popen(
+        command, env=environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    def stop():
+        process.terminate()
+        process.wait()
+
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}", process)
+    except RuntimeError:
+        stop()
+        raise
+    return "127.0.0.1", port, process.pid, stop
+
+
+async def run_step(address, sessions, concurrency, duration, args, pid):
+    results = []
+    deadline = time.monotonic() + duration
+
+    async def client(index):
+        rng = random.Random(f"{args.seed}-{index}")
+        connection = Connection(*address)
+        try:
+            while time.monotonic() < deadline:
+                await replay(connection, rng.choice(sessions), deadline, args, results)
+        finally:
+            connection.close()
+
+    # Gunicorn workers are the children of the master (or of the --url process)
+    split_children = args.server == "gunicorn" or args.url is not None
+
+    # Peak RSS over the step, in total and per worker, sampled while the clients run
+    peak_rss = [None]
+    worker_peak_rss = {}
+
+    async def sample_rss():
+        while True:
+            usage = process_tree_usage(pid, split_children)
+            if usage is not None:
+                peak_rss[0] = max(peak_rss[0] or 0, usage["rss_mb"])
+                for worker, worker_usage in usage["workers"].items():
+                    worker_peak_rss[worker] = max(
+                        worker_peak_rss.get(worker, 0), worker_usage["rss_mb"]
+                    )
+            await asyncio.sleep(0.5)
+
+    usage_before = process_tree_usage(pid, split_children)
+    sampler = asyncio.ensure_future(sample_rss())
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    usage_after = process_tree_usage(pid, split_children)
+
+    latencies = [latency for latency, ok, _ in results if ok]
+    errors = sum(1 for _, ok, _ in results if not ok)
+    step = {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "throughput": len(latencies) / elapsed,
+        "latency_ms": summarize(latencies, 1000) if latencies else None,
+        "cpu_percent": None,
+        "rss_mb": peak_rss[0],
+    }
+    if usage_before is not None and usage_after is not None:
+        cpu = usage_after["cpu_seconds"] - usage_before["cpu_seconds"]
+        step["cpu_percent"] = 100 * cpu / elapsed
+        step["processes"] = usage_after["processes"]
+        # Workers started during the step count from zero; the CPU of those that
+        # exited is in the cutime of the master
+        workers_before = usage_before["workers"]
+        step["workers"] = [
+            {
+                "pid": worker,
+                "cpu_percent": 100
+                * (usage["cpu_seconds"] - workers_before.get(worker, {}).get("cpu_seconds", 0))
+                / elapsed,
+                "rss_mb": worker_peak_rss.get(worker, usage["rss_mb"]),
+            }
+            for worker, usage in sorted(usage_after["workers"].items())
+        ]
+    return step
+
+
+def format_step(step):
+    latency = step["latency_ms"] or {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+    cpu = "-" if step["cpu_percent"] is None else f"{step['cpu_percent']:.0f}"
+    rss = "-" if step["rss_mb"] is None else f"{step['rss_mb']:.0f}"
+    line = (
+        f"{step['concurrency']:>11} {step['throughput']:>9.1f} {latency['p50']:>9.1f} "
+        f"{latency['p95']:>9.1f} {latency['p99']:>9.1f} {100 * step['error_rate']:>7.1f}% "
+        f"{cpu:>6} {rss:>8}"
+    )
+    workers = step.get("workers") or []
+    if len(workers) > 1:
+        # One line per step: "pid CPU %/RSS MB" of every worker
+        line += "\n" + " " * 12 + "workers (pid CPU %/RSS MB): " + ", ".join(
+            f"{worker['pid']} {worker['cpu_percent']:.0f}/{worker['rss_mb']:.0f}"
+            for worker in workers
+        )
+    return line
+
+
+def run(args):
+    sessions = load_sessions(args.sessions, args.max_think_time)
+    if not sessions:
+        raise SystemExit(f"No requests in {args.sessions}")
+
+    host, port, pid, stop = start_server(args)
+    try:
+        if args.warmup > 0:
+            print(f"Warming up for {args.warmup} s ...", file=sys.stderr)
+            asyncio.run(run_step((host, port), sessions, 1, args.warmup, args, pid))
+
+        print(
+            f"{'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'errors':>8} {'CPU %':>6} {'RSS MB':>8}"
+        )
+        steps = []
+        for concurrency in args.concurrency:
+            step = asyncio.run(
+                run_step((host, port), sessions, concurrency, args.duration, args, pid)
+            )
+            steps.append(step)
+            print(format_step(step), flush=True)
+            if step["error_rate"] > args.max_error_rate:
+                print(f"Error rate above {args.max_error_rate:.0%}, stopping", file=sys.stderr)
+                break
+    finally:
+        stop()
+
+    peak = max(steps, key=lambda step: step["throughput"])
+    print(f"\nPeak throughput {peak['throughput']:.1f} req/s at concurrency {peak['concurrency']}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "module": args.module,
+                "server": "url" if args.url else args.server,
+                "workers": args.workers if args.server == "gunicorn" else None,
+                "threads": args.threads if args.server == "gunicorn" else None,
+                "sessions": args.sessions,
+                "duration": args.duration,
+                "think_time_scale": args.think_time_scale,
+                "seed": args.seed,
+            },
+            "steps": steps,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+def write_sessions(args):
+    with open(args.traces, encoding="utf-8") as f:
+        traces = json.load(f)
+    lines = sessions_from_traces(args.module, traces, args.shuffled, args.think_time, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+    sessions = len({line["session"] for line in lines})
+    print(f"{len(lines)} requests in {sessions} sessions written to {args.output}", file=sys.stderr)
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = {step["concurrency"]: step for step in json.load(f)["steps"]}
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = {step["concurrency"]: step for step in json.load(f)["steps"]}
+
+    print(
+        f"{'concurrency':>11} {'req/s':>19} {'ratio':>7} {'p95 ms':>19} {'ratio':>7} "
+        f"{'errors':>17}"
+    )
+    for concurrency in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[concurrency], candidate[concurrency]
+        p95_before = (before["latency_ms"] or {}).get("p95", float("nan"))
+        p95_after = (after["latency_ms"] or {}).get("p95", float("nan"))
+        throughput_ratio = (
+            after["throughput"] / before["throughput"] if before["throughput"] else 1.0
+        )
+        p95_ratio = p95_after / p95_before if p95_before else 1.0
+        print(
+            f"{concurrency:>11} {before['throughput']:>9.1f} {after['throughput']:>9.1f} "
+            f"{throughput_ratio:>6.2f}x {p95_before:>9.1f} {p95_after:>9.1f} {p95_ratio:>6.2f}x "
+            f"{100 * before['error_rate']:>7.1f}% {100 * after['error_rate']:>7.1f}%"
+        )
+    for name, steps in (("baseline", baseline), ("candidate", candidate)):
+        peak = max(steps.values(), key=lambda step: step["throughput"])
+        print(
+            f"{name}: peak {peak['throughput']:.1f} req/s at concurrency {peak['concurrency']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a dashboard with replayed sessions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sessions_parser = subparsers.add_parser(
+        "sessions", help="generate sessions from the traces of benchmark_traces.json"
+    )
+    sessions_parser.add_argument(
+        "--module", default="restaurants_dashboard", choices=list(TRACE_CALLBACKS)
+    )
+    sessions_parser.add_argument("--traces", default=TRACES_PATH, help="recorded input traces")
+    sessions_parser.add_argument(
+        "--shuffled", type=int, default=7, help="extra sessions with the steps reordered"
+    )
+    sessions_parser.add_argument(
+        "--think-time", type=float, default=1.0, help="seconds between two user actions"
+    )
+    sessions_parser.add_argument("--seed", type=int, default=0)
+    sessions_parser.add_argument("--output", default="sessions.jsonl")
+    sessions_parser.set_defaults(handler=write_sessions)
+
+    run_parser = subparsers.add_parser("run", help="run the load test")
+    run_parser.add_argument("--module", default="restaurants_dashboard")
+    run_parser.add_argument("--sessions", required=True, help="sessions file (JSON Lines)")
+    run_parser.add_argument("--output", help="write the results to this JSON file")
+    run_parser.add_argument(
+        "--server", default="dev", choices=["thread", "dev", "gunicorn"], help="server to start"
+    )
+    run_parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    run_parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker")
+    run_parser.add_argument(
+        "--preload", action="store_true", help="gunicorn --preload (load the app once)"
+    )
+    run_parser.add_argument("--url", help="test a running server instead of starting one")
+    run_parser.add_argument("--pid", type=int, help="process (tree) of --url to measure")
+    run_parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY, help="clients per step"
+    )
+    run_parser.add_argument("--duration", type=float, default=20, help="seconds per step")
+    run_parser.add_argument("--warmup", type=float, default=5, help="seconds of warm-up")
+    run_parser.add_argument(
+        "--think-time-scale",
+        type=float,
+        default=0.0,
+        help="scale of the recorded think times (0: back to back)",
+    )
+    run_parser.add_argument(
+        "--max-think-time", type=float, default=5.0, help="cap of a recorded think time (s)"
+    )
+    run_parser.add_argument("--timeout", type=float, default=30, help="request timeout (s)")
+    run_parser.add_argument(
+        "--poll-interval", type=float, default=0.1, help="background callback polling (s)"
+    )
+    run_parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        default=0.5,
+        help="stop the ramp after a step with more errors than this",
+    )
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
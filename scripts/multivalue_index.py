@@ -0,0 +1,87 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Pre-parsed representation of the comma-separated columns of the restaurants
+# dataset (cuisines, meals, special_diets, features, top_tags).
+#
+# Splitting and exploding these strings on every callback allocates a Python
+# string per value. Instead, each column is parsed once into a sparse
+# row x term incidence matrix in CSR form:
+#
+#   terms   -> the distinct values, in order of first appearance
+#   indices -> the term code of every value, row after row
+#   indptr  -> row i owns indices[indptr[i]:indptr[i + 1]]
+#
+# Counting the terms of any set of rows is then a vectorized column sum
+# (`np.bincount`) over integer codes.
+
+MULTIVALUE_COLUMNS = ["cuisines", "meals", "special_diets", "features", "top_tags"]
+
+
+class MultiValueColumn:
+    def __init__(self, values, separator=", "):
+        self.name = values.name
+        self.separator = separator
+
+        lists = values.str.split(separator)
+        lengths = lists.str.len().fillna(0).to_numpy(dtype=np.intp)
+        exploded = lists.explode().dropna()
+
+        codes, terms = pd.factorize(exploded)
+        self.terms = np.asarray(terms, dtype=object)
+        self.indices = codes.astype(np.intp)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+
+    # New column over `values`, whose values from `start` on were appended after the
+    # values this column was built on: only those are parsed, and new terms get the
+    # next codes (still in order of first appearance). This column is left untouched.
+    def appended(self, values, start):
+        delta = MultiValueColumn(values.iloc[start:], self.separator)
+        terms = pd.Index(self.terms, dtype=object)
+        new_terms = delta.terms[terms.get_indexer(delta.terms) < 0]
+        terms = terms.append(pd.Index(new_terms, dtype=object))
+
+        column = copy.copy(self)
+        column.name = values.name
+        column.terms = np.asarray(terms, dtype=object)
+        column.indices = np.concatenate(
+            [self.indices, terms.get_indexer(delta.terms)[delta.indices]]
+        ).astype(np.intp)
+        column.indptr = np.concatenate([self.indptr, self.indptr[-1] + delta.indptr[1:]])
+        return column
+
+    # Return the term codes of the given rows (all rows if None), row after row
+    def codes_for_rows(self, rows=None):
+        if rows is None:
+            return self.indices
+        rows = np.asarray(rows, dtype=np.intp)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        # Position of every value of the selected rows inside `indices`
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(len(offsets))]
+
+    # Count the terms of the given rows, in the same order as
+    # `values.iloc[rows].dropna().str.split(separator).explode().value_counts()`:
+    # descending count, ties broken by first appearance.
+    def value_counts(self, rows=None):
+        codes = self.codes_for_rows(rows)
+        counts = np.bincount(codes, minlength=len(self.terms))
+
+        present = np.flatnonzero(counts)
+        first_seen = np.full(len(self.terms), len(codes), dtype=np.intp)
+        np.minimum.at(first_seen, codes, np.arange(len(codes)))
+        order = present[np.lexsort((first_seen[present], -counts[present]))]
+
+        return pd.Series(
+            counts[order],
+            index=pd.Index(self.terms[order], name=self.name),
+            name="count",
+        )
+
+
+# Parse the comma-separated columns of a restaurants DataFrame
+def build_multivalue_columns(df, columns=MULTIVALUE_COLUMNS):
+    return {column: MultiValueColumn(df[column]) for column in columns}
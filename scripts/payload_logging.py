@@ -0,0 +1,100 @@
+import copy
+import json
+import logging
+
+from flask import request
+
+# Measurement mode for Dash apps: logs the size of every callback response.
+#
+# For outputs updated with `dash.Patch`, the log also shows how many bytes the
+# same update would have taken as a complete figure (the patch is applied to
+# the figure defined in the app layout), so the bandwidth saving is visible:
+#
+#   POST /_dash-update-component top-restaurants-bar-chart.figure...: 1234 bytes (full figures: 23456 bytes)
+#
+# Enable it with `log_callback_payloads(app)` after the layout has been defined.
+
+logger = logging.getLogger("dash.payload")
+
+
+# Collect the `figure` of every component with an id in a layout tree
+def _layout_figures(component, figures=None):
+    if figures is None:
+        figures = {}
+    if getattr(component, "id", None) is not None and getattr(component, "figure", None) is not None:
+        figures[component.id] = json.loads(json.dumps(component.figure, default=_to_json))
+    children = getattr(component, "children", None)
+    if isinstance(children, (list, tuple)):
+        for child in children:
+            _layout_figures(child, figures)
+    elif children is not None and not isinstance(children, str):
+        _layout_figures(children, figures)
+    return figures
+
+
+def _to_json(value):
+    if hasattr(value, "to_plotly_json"):
+        return value.to_plotly_json()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Apply the operations of a serialized dash.Patch to a value (Assign / Merge / Delete only)
+def _apply_patch(value, patch):
+    value = copy.deepcopy(value)
+    for operation in patch["operations"]:
+        *path, last = operation["location"]
+        target = value
+        for key in path:
+            target = target[key]
+        if operation["operation"] == "Assign":
+            target[last] = operation["params"]["value"]
+        elif operation["operation"] == "Merge":
+            target[last].update(operation["params"]["value"])
+        elif operation["operation"] == "Delete":
+            del target[last]
+    return value
+
+
+def _is_patch(value):
+    return isinstance(value, dict) and "__dash_patch_update" in value
+
+
+# `layout`: the layout holding the initial figures, if `app.layout` is a function
+def log_callback_payloads(app, level=logging.INFO, layout=None):
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=level)
+    logger.setLevel(level)
+    layout_figures = _layout_figures(layout if layout is not None else app.layout)
+
+    @app.server.after_request
+    def log_payload(response):
+        if not request.path.endswith("_dash-update-component") or response.status_code != 200:
+            return response
+
+        body = response.get_data()
+        output = request.get_json(silent=True) or {}
+        message = f"POST {request.path} {output.get('output')}: {len(body)} bytes"
+
+        # Size of the same update as complete figures, for patched outputs
+        try:
+            outputs = json.loads(body).get("response", {})
+        except ValueError:
+            outputs = {}
+        patched = False
+        full_outputs = {}
+        for component_id, props in outputs.items():
+            full_outputs[component_id] = {}
+            for prop, value in props.items():
+                if _is_patch(value) and component_id in layout_figures:
+                    patched = True
+                    value = _apply_patch(layout_figures[component_id], value)
+                full_outputs[component_id][prop] = value
+        if patched:
+            full_body = json.dumps({"multi": True, "response": full_outputs}, separators=(",", ":"))
+            full_size = len(full_body.encode("utf-8"))
+            message += f" (full figures: {full_size} bytes)"
+
+        logger.info(message)
+        return response
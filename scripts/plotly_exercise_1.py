@@ -3,19 +3,31 @@
 import plotly.express as px
 import pandas as pd
 
-# Although not necessary, we can convert 'Date' to datetime
-df_stock['Date'] = pd.to_datetime(df_stock['Date'])
-
-df_filtered = df_stock[df_stock['Date'].dt.year >= 2015]
-
-# Create the line plot
-fig = px.line(
-    df_filtered,
-    x='Date',
-    y='Close',
-    title='Daily Close Prices since 2015',
-    labels={'Close': 'Close Price'}  # Custom labels for the y-axis
-)
+from dataset_archive import read_dataset_csv
+from figure_store import cached_figure
+
+
+def build_figure():
+    # Read the stock prices (directly from datasets.zip if it hasn't been extracted)
+    df_stock = read_dataset_csv("amzn.csv")
+
+    # Although not necessary, we can convert 'Date' to datetime
+    df_stock['Date'] = pd.to_datetime(df_stock['Date'])
+
+    df_filtered = df_stock[df_stock['Date'].dt.year >= 2015]
+
+    # Create the line plot
+    return px.line(
+        df_filtered,
+        x='Date',
+        y='Close',
+        title='Daily Close Prices since 2015',
+        labels={'Close': 'Close Price'}  # Custom labels for the y-axis
+    )
+
+
+# The figure only changes with the dataset, so it is built once and then read from the figure store
+fig = cached_figure({'name': 'amzn-close-since-2015'}, build_figure, datasets=['amzn.csv'])
 
 # Display the figure
 fig.show()
@@ -1,34 +1,43 @@
 # First, let's import necessary libraries
-import pandas as pd
 import plotly.express as px
 
-# Read the .csv file and store it as a pandas DataFrame
-df_tourism = pd.read_csv("datasets/international_tourism.csv")
+from dataset_archive import read_dataset_csv
+from figure_store import cached_figure
 
-# Display the data to understand its structure
-df_tourism.head()
 
+def build_figure():
+    # Read the .csv file and store it as a pandas DataFrame
+    # (directly from datasets.zip if it hasn't been extracted)
+    df_tourism = read_dataset_csv("international_tourism.csv")
 
-# Type your answer here
+    # Display the data to understand its structure
+    df_tourism.head()
 
-# Filter the data to include only the specified countries
-df_tourism_filtered = df_tourism[df_tourism['Country Name'].isin(['Greece', 'Spain', 'France', 'Italy'])]
+    # Type your answer here
 
-# Sorting the data in descending order by the number of tourists in 2020
-df_tourism_filtered = df_tourism_filtered.sort_values('2020', ascending=False)
+    # Filter the data to include only the specified countries
+    df_tourism_filtered = df_tourism[df_tourism['Country Name'].isin(['Greece', 'Spain', 'France', 'Italy'])]
 
-# Create the bar chart using Plotly Express
-fig = px.bar(
-    df_tourism_filtered,
-    x='Country Name',
-    y='2020',  # Directly use the '2020' column for tourist numbers
-    title='Tourist Arrivals in 2020',
-    labels={'Country Name': 'Country', '2020': 'Number of Tourists'},
-    text='2020'  # Display the tourist number on each bar
-)
+    # Sorting the data in descending order by the number of tourists in 2020
+    df_tourism_filtered = df_tourism_filtered.sort_values('2020', ascending=False)
 
-# Adjust bar width appearance
-fig.update_traces(width=0.3)
+    # Create the bar chart using Plotly Express
+    fig = px.bar(
+        df_tourism_filtered,
+        x='Country Name',
+        y='2020',  # Directly use the '2020' column for tourist numbers
+        title='Tourist Arrivals in 2020',
+        labels={'Country Name': 'Country', '2020': 'Number of Tourists'},
+        text='2020'  # Display the tourist number on each bar
+    )
+
+    # Adjust bar width appearance
+    fig.update_traces(width=0.3)
+    return fig
+
+
+# The figure only changes with the dataset, so it is built once and then read from the figure store
+fig = cached_figure({'name': 'tourist-arrivals-2020'}, build_figure, datasets=['international_tourism.csv'])
 
 # Display the figure
-fig.show()
\ No newline at end of file
+fig.show()
@@ -0,0 +1,84 @@
+import functools
+import logging
+import threading
+
+from callback_timing import record_steps
+
+# Measurement mode for the restaurants dashboard: shows which figures were
+# recomputed on each interaction.
+#
+# Every chart callback is wrapped with `track(figure)`, outside the result cache.
+# A callback whose body ran reports the steps it went through (callback_timing);
+# one answered by the cache runs no step at all. The filter callback reports the
+# interactions that didn't change the filtered rows, for which no chart callback
+# runs at all. Each interaction is identified by the key of its filtered row set:
+#
+#   rowset 3f2a9c1e0b7d4a55 (2143 rows): top-restaurants-bar-chart recomputed (sort 0.41 ms, figure 0.12 ms)
+#   rowset 3f2a9c1e0b7d4a55 (2143 rows): price-level-pie-chart from cache
+#   rowset 3f2a9c1e0b7d4a55 (2143 rows): unchanged, skipped top-restaurants-bar-chart, ...
+#
+# Totals per figure are kept in `counts` ({"recomputed": n, "cached": n, "skipped": n}).
+# When the log is disabled, `track` returns the callbacks unchanged.
+
+logger = logging.getLogger("dash.recompute")
+
+
+class RecomputeLog:
+    def __init__(self, enabled=False, level=logging.INFO):
+        self.enabled = enabled
+        self.counts = {}
+        self._lock = threading.Lock()
+        if enabled:
+            if not logging.getLogger().handlers:
+                logging.basicConfig(level=level)
+            logger.setLevel(level)
+
+    def _count(self, figure, outcome):
+        with self._lock:
+            figure_counts = self.counts.setdefault(
+                figure, {"recomputed": 0, "cached": 0, "skipped": 0}
+            )
+            figure_counts[outcome] += 1
+
+    @staticmethod
+    def _interaction(rowset):
+        if not rowset:
+            return "rowset -"
+        return f"rowset {rowset['key']} ({rowset['rows']} rows)"
+
+    # Decorator for a chart callback whose first argument is the filtered row set
+    def track(self, figure):
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(rowset, *args):
+                with record_steps() as steps:
+                    result = func(rowset, *args)
+                if steps:
+                    self._count(figure, "recomputed")
+                    timings = ", ".join(
+                        f"{name} {seconds * 1000:.2f} ms" for name, seconds in steps.items()
+                    )
+                    logger.info(
+                        "%s: %s recomputed (%s)", self._interaction(rowset), figure, timings
+                    )
+                else:
+                    self._count(figure, "cached")
+                    logger.info("%s: %s from cache", self._interaction(rowset), figure)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    # Called by the filter callback when the filtered rows didn't change
+    def skipped(self, rowset, figures):
+        if not self.enabled:
+            return
+        for figure in figures:
+            self._count(figure, "skipped")
+        logger.info(
+            "%s: unchanged, skipped %s", self._interaction(rowset), ", ".join(figures)
+        )
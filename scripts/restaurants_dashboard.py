@@ -1,175 +1,773 @@
-import pandas as pd
-import plotly.express as px
+import os
+from types import SimpleNamespace
+
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
+import numpy as np
+from dash import dash_table, dcc, html
+from dash.dependencies import Input, Output, State
+from flask import has_request_context, request
+
+from callback_cache import (
+    CallbackCache,
+    FileCacheBackend,
+    normalize_range,
+    normalize_selection,
+)
+from callback_metrics import instrument_callbacks_from_env
+from callback_timing import count, step
+from dataset_versions import DatasetVersions
+from figure_builder import (
+    bar_figure,
+    bar_patch,
+    map_figure,
+    map_patch,
+    pie_figure,
+    pie_patch,
+)
+from lazy_data import LazyData, register_readiness
+from payload_logging import log_callback_payloads
+from recompute_log import RecomputeLog
+from rowset_store import RowsetStore
+from session_recording import record_sessions_from_env
+from spatial_grid import viewport_from_relayout
+from top_k import top_k_positions
+
+
+# Columns of the restaurants table (column id -> header)
+TABLE_COLUMNS = {
+    "restaurant_name": "Restaurant",
+    "region": "Region",
+    "price_level": "Price Level",
+    "avg_rating": "Avg Rating",
+    "total_reviews_count": "Total Reviews",
+    "cuisines": "Cuisines",
+}
+TABLE_PAGE_SIZE = 15
+
+# Seconds between two checks for a new version of the dataset
+DATA_POLL_SECONDS = 10
+
+# Search results of at least this many rows have their cuisines counted in a
+# background worker, when there is a background callback manager. Counting takes
+# about 50 ns per row, so below a million rows it is faster than starting the
+# worker process and polling it (BACKGROUND_MIN_ROWS=0 sends every search there).
+BACKGROUND_MIN_ROWS = int(os.environ.get("BACKGROUND_MIN_ROWS", 1_000_000))
+
+# Milliseconds between two polls of a background job by the page
+BACKGROUND_POLL_INTERVAL = 100
+
+
+# Load the data and build the structures used by the callbacks. This runs once,
+# after the module is imported (see `dashboard_data` below), so that the app can
+# start serving before the CSV has been read.
+# With `previous` (the data of the version being served), it loads the current
+# version of the dataset instead (see `dataset_versions` below): when rows were
+# only appended to the CSV, the indexes of `previous` are extended with the new
+# rows instead of being built again. The compact frame is written again in full:
+# its dictionaries are sorted, so new values change the codes of existing rows.
+def load_dashboard_data(previous=None):
+    # Imported here: importing the dashboard module doesn't need pandas
+    from compact_store import compact_restaurants
+    from multivalue_index import MultiValueColumn
+    from restaurants_data import ensure_cache, extends_version
+    from restaurants_index import RestaurantIndex
+    from rollup_cube import RollupCube
+    from search_index import SearchIndex
+    from spatial_grid import SpatialGrid
+    from table_pages import TablePages
+
+    # Manifest of the dataset version, to detect the next one
+    manifest = ensure_cache()
+    if previous is not None and manifest["version"] == previous.dataset_version:
+        # Same content (e.g. the file was only touched)
+        return SimpleNamespace(**{**vars(previous), "manifest": manifest})
+
+    # Load the dataset (only the columns used by the dashboard) as a compact frame,
+    # memory-mapped from a file so that all the workers share one copy of it.
+    # Ensure there are no null values in the 'region' column (dropna)
+    df_restaurants = compact_restaurants(
+        [
+            "restaurant_name",
+            "region",
+            "price_level",
+            "cuisines",
+            "avg_rating",
+            "total_reviews_count",
+            "latitude",
+            "longitude",
+            "keywords",
+            "top_tags",
+        ],
+        dropna=["region"],
+    ).to_pandas()
 
-# Load the dataset
-df_restaurants = pd.read_csv("datasets/tripadvisor_restaurants_greece.csv")
+    # Step 1: Create a list of unique regions from the dataset
 
-# Ensure there are no null values in the 'region' column
-df_restaurants = df_restaurants[df_restaurants["region"].notna()]
+    # ----- > Your code here
+    regions = df_restaurants["region"].unique().tolist()
+
+    search_columns = [
+        df_restaurants["restaurant_name"],
+        df_restaurants["keywords"],
+        df_restaurants["top_tags"],
+    ]
+    map_columns = [
+        df_restaurants["latitude"],
+        df_restaurants["longitude"],
+        df_restaurants["avg_rating"],
+    ]
+    if previous is None or not extends_version(manifest, previous.dataset_version):
+        # Build the region / rating query index once, so that callbacks don't scan every row
+        restaurant_index = RestaurantIndex(df_restaurants)
+
+        # Parse the comma-separated 'cuisines' column once into integer codes per restaurant
+        cuisines_column = MultiValueColumn(df_restaurants["cuisines"])
+
+        # Pre-aggregate the counts needed by the pie chart and the cuisines chart
+        rollup_cube = RollupCube(df_restaurants, cuisines_column)
+
+        # Inverted index of the words of the names, review keywords and tags, for the search box
+        search_index = SearchIndex(search_columns)
+
+        # Sorted orders of the table columns, to serve the table pages from
+        table_pages = TablePages(df_restaurants, TABLE_COLUMNS)
+
+        # Pre-aggregate the restaurants into map grid cells, per zoom level, for the map tab
+        spatial_grid = SpatialGrid(*map_columns)
+    else:
+        # Rows were appended (the rows of `previous` come first, in the same order):
+        # only the new rows are added to the indexes and counts
+        start = len(previous.df_restaurants)
+        restaurant_index = previous.restaurant_index.appended(df_restaurants, start)
+        cuisines_column = previous.cuisines_column.appended(df_restaurants["cuisines"], start)
+        rollup_cube = previous.rollup_cube.appended(df_restaurants, cuisines_column, start)
+        search_index = previous.search_index.appended(search_columns, start)
+        table_pages = previous.table_pages.appended(df_restaurants, start)
+        spatial_grid = previous.spatial_grid.appended(*map_columns, start)
+
+    # Filtered row sets, kept server-side as bitmaps; the page only holds their keys
+    rowsets = RowsetStore(
+        len(df_restaurants), namespace=df_restaurants.attrs["dataset_version"]
+    )
+
+    return SimpleNamespace(
+        df_restaurants=df_restaurants,
+        cuisines_column=cuisines_column,
+        dataset_version=df_restaurants.attrs["dataset_version"],
+        manifest=manifest,
+        regions=regions,
+        restaurant_index=restaurant_index,
+        rollup_cube=rollup_cube,
+        rowsets=rowsets,
+        search_index=search_index,
+        spatial_grid=spatial_grid,
+        table_pages=table_pages,
+    )
 
-# Step 1: Create a list of unique regions from the dataset
 
-# ----- > Your code here
-regions = df_restaurants["region"].unique().tolist()
+# Callbacks call `dashboard_data.get()`, which waits for the data if needed.
+# It is loaded in a background thread started at the end of this module, while
+# the server starts (see below).
+dashboard_data = LazyData(load_dashboard_data)
+
+
+# Whether the dataset changed since `data` was loaded (a stat of the CSV)
+def data_changed(data):
+    from restaurants_data import dataset_changed
+
+    return dataset_changed(data.manifest)
+
+
+# Reload the data when the dataset changes, without restarting the server. The
+# page polls (see `refresh_data_version`); the callbacks that are running keep
+# the snapshot they started with.
+dataset_versions = DatasetVersions(
+    dashboard_data,
+    changed=data_changed,
+    update=load_dashboard_data,
+    interval=DATA_POLL_SECONDS,
+)
+
+# Measurement mode: log which figures are recomputed on each interaction
+recompute_log = RecomputeLog(enabled=bool(os.environ.get("LOG_RECOMPUTED_FIGURES")))
+
+# Cache of recently served figures, shared between the workers through a directory.
+# Keys include the dataset version, so a new CSV never serves stale figures: the
+# version of the snapshot the chart callbacks receive and compute from.
+figure_cache = CallbackCache(
+    max_bytes=32 * 1024 * 1024,
+    ttl=600,
+    backend=FileCacheBackend("datasets/.cache/callbacks", ttl=600),
+    snapshot=dashboard_data.get,
+    namespace=lambda data: data.dataset_version,
+)
+
+
+# Run the heavy cuisine aggregations in background worker processes when the
+# optional dependencies are installed (pip install "dash[diskcache]"); otherwise
+# they run in the request threads as usual
+try:
+    import diskcache
+
+    background_callback_manager = dash.DiskcacheManager(
+        diskcache.Cache("datasets/.cache/background"), expire=600
+    )
+except ImportError:
+    background_callback_manager = None
 
 
 # Initialize the Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, background_callback_manager=background_callback_manager)
 
 
 # Define the application layout
-app.layout = html.Div(
-    [
-        html.H1(
-            "Restaurants in Greece Dashboard",
-            style={"color": "blue", "textAlign": "center"},
-        ),
-        html.Div(
-            [
-                html.Label(
-                    "Select Regions:",
-                    style={
-                        "display": "inline-block",
-                        "font-size": "20px",
-                        "margin-bottom": "10px",
-                    },
-                ),
-                # Step 2: Create a Region Selection Dropdown
-                # - Fill in code here to create a dropdown with id `region-dropdown` that allows multiple selections of regions
-                # - Use the 'regions' list to populate the dropdown options.
-                dcc.Dropdown(
-                    id="region-dropdown",
-                    options=regions,
-                    value=None,
-                    multi=True,
-                    placeholder="Select one or more regions",
-                    clearable=True,
-                    style={"width": "500px"},
-                ),
-            ],
-            style={"margin-bottom": "20px"},
-        ),
-        html.Div(
-            [
-                html.Label(
-                    "Select Rating Range:",
-                    style={
-                        "display": "inline-block",
-                        "font-size": "20px",
-                        "margin-bottom": "20px",
-                    },
-                ),
-                # Step 3: Create an average rating Range Slider
-                # - Use the dcc.RangeSlider component to create a range slider with id `rating-range-slider` for filtering by average rating.
-                # - Set the minimum to 0, the maximum to 5, and step to 0.1.
-                dcc.RangeSlider(
-                    id="rating-range-slider",
-                    min=0,
-                    max=5,
-                    value=[
-                        0,
-                        5,
-                    ],
-                    marks={i: str(i) for i in range(0, 6)},
-                    step=0.1,
-                ),
-            ],
-            style={"width": "500px", "margin-top": "20px", "margin-bottom": "20px"},
-        ),
-        # First row: Top Restaurants bar chart and pie chart for price level
-        html.Div(
-            [
-                html.Div(
-                    [dcc.Graph(id="top-restaurants-bar-chart")],
-                    style={"display": "inline-block", "width": "50%"},
-                ),
-                html.Div(
-                    [dcc.Graph(id="price-level-pie-chart")],
-                    style={"display": "inline-block", "width": "50%"},
-                ),
-            ],
-            style={"margin-bottom": "50px"},
-        ),
-        # Second row: Bar Chart for Cuisine Popularity
-        html.Div([dcc.Graph(id="top-cuisines-bar-chart")]),
-    ],
-    style={"padding": "20px"},
+# (figures=False leaves out the chart figures, see serve_layout)
+def build_layout(regions, figures=True, version=None):
+    return html.Div(
+        [
+            html.H1(
+                "Restaurants in Greece Dashboard",
+                style={"color": "blue", "textAlign": "center"},
+            ),
+            dcc.Tabs(
+                [
+                    dcc.Tab(
+                        label="Charts",
+                        children=[
+                            html.Div(
+                                [
+                                    html.Label(
+                                        "Select Regions:",
+                                        style={
+                                            "display": "inline-block",
+                                            "font-size": "20px",
+                                            "margin-bottom": "10px",
+                                        },
+                                    ),
+                                    # Step 2: Create a Region Selection Dropdown
+                                    # - Fill in code here to create a dropdown with id `region-dropdown` that allows multiple selections of regions
+                                    # - Use the 'regions' list to populate the dropdown options.
+                                    dcc.Dropdown(
+                                        id="region-dropdown",
+                                        options=regions,
+                                        value=None,
+                                        multi=True,
+                                        placeholder="Select one or more regions",
+                                        clearable=True,
+                                        style={"width": "500px"},
+                                    ),
+                                ],
+                                style={"margin-bottom": "20px"},
+                            ),
+                            html.Div(
+                                [
+                                    html.Label(
+                                        "Select Rating Range:",
+                                        style={
+                                            "display": "inline-block",
+                                            "font-size": "20px",
+                                            "margin-bottom": "20px",
+                                        },
+                                    ),
+                                    # Step 3: Create an average rating Range Slider
+                                    # - Use the dcc.RangeSlider component to create a range slider with id `rating-range-slider` for filtering by average rating.
+                                    # - Set the minimum to 0, the maximum to 5, and step to 0.1.
+                                    dcc.RangeSlider(
+                                        id="rating-range-slider",
+                                        min=0,
+                                        max=5,
+                                        value=[
+                                            0,
+                                            5,
+                                        ],
+                                        marks={i: str(i) for i in range(0, 6)},
+                                        step=0.1,
+                                    ),
+                                ],
+                                style={"width": "500px", "margin-top": "20px", "margin-bottom": "20px"},
+                            ),
+                            # Search by name, review keywords or tags (Greek or Latin spelling);
+                            # the browser suggests completions of the last word from the datalist
+                            html.Div(
+                                [
+                                    html.Label(
+                                        "Search Restaurants:",
+                                        style={
+                                            "display": "inline-block",
+                                            "font-size": "20px",
+                                            "margin-bottom": "10px",
+                                        },
+                                    ),
+                                    html.Br(),
+                                    dcc.Input(
+                                        id="restaurant-search",
+                                        type="search",
+                                        value="",
+                                        placeholder="e.g. souvlaki, θάλασσα, fresh fish",
+                                        list="search-suggestions",
+                                        style={"width": "500px"},
+                                    ),
+                                    html.Datalist(id="search-suggestions", children=[]),
+                                ],
+                                style={"margin-bottom": "20px"},
+                            ),
+                            # First row: Top Restaurants bar chart and pie chart for price level
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            # The figure layouts are sent once with the page, the callback only updates their data
+                                            dcc.Graph(
+                                                id="top-restaurants-bar-chart",
+                                                figure=bar_figure(
+                                                    [],
+                                                    [],
+                                                    x_label="Restaurant Name",
+                                                    y_label="Total Reviews",
+                                                    title="Top 10 Restaurants by Number of Reviews",
+                                                )
+                                                if figures
+                                                else None,
+                                            )
+                                        ],
+                                        style={"display": "inline-block", "width": "50%"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            dcc.Graph(
+                                                id="price-level-pie-chart",
+                                                figure=pie_figure(
+                                                    [],
+                                                    [],
+                                                    names_label="Price Level",
+                                                    values_label="Number of Restaurants",
+                                                    title="Distribution of Restaurants by Price Level",
+                                                )
+                                                if figures
+                                                else None,
+                                            )
+                                        ],
+                                        style={"display": "inline-block", "width": "50%"},
+                                    ),
+                                ],
+                                style={"margin-bottom": "50px"},
+                            ),
+                            # Key and filter values of the filtered rows (the rows themselves stay on the server)
+                            dcc.Store(id="filtered-rowset"),
+                            # Row set whose cuisines are counted in a background job
+                            dcc.Store(id="top-cuisines-job"),
+                            # Second row: Bar Chart for Cuisine Popularity
+                            html.Div(
+                                [
+                                    dcc.Graph(
+                                        id="top-cuisines-bar-chart",
+                                        figure=bar_figure(
+                                            [],
+                                            [],
+                                            x_label="Cuisine",
+                                            y_label="Number of Restaurants",
+                                            title="Top 20 Cuisines Based on Number of Restaurants",
+                                        )
+                                        if figures
+                                        else None,
+                                    )
+                                ]
+                            ),
+                            # Third row: the filtered restaurants, one page at a time. Paging,
+                            # sorting and the header filters run on the server ("custom"),
+                            # so only the rows of the visible page are sent.
+                            html.Div(
+                                [
+                                    dash_table.DataTable(
+                                        id="restaurants-table",
+                                        columns=[
+                                            {"name": name, "id": column_id}
+                                            for column_id, name in TABLE_COLUMNS.items()
+                                        ],
+                                        data=[],
+                                        page_action="custom",
+                                        page_current=0,
+                                        page_size=TABLE_PAGE_SIZE,
+                                        page_count=1,
+                                        sort_action="custom",
+                                        sort_mode="multi",
+                                        sort_by=[],
+                                        filter_action="custom",
+                                        filter_query="",
+                                        # Text filters ignore case unless toggled (see table_pages.py)
+                                        filter_options={"case": "insensitive"},
+                                        style_cell={
+                                            "textAlign": "left",
+                                            "maxWidth": "300px",
+                                            "overflow": "hidden",
+                                            "textOverflow": "ellipsis",
+                                        },
+                                    )
+                                ],
+                                style={"margin-top": "20px"},
+                            ),
+                        ],
+                    ),
+                    # Map of the restaurants: only the clusters in the viewport are sent
+                    dcc.Tab(
+                        label="Map",
+                        children=[
+                            dcc.Graph(
+                                id="restaurant-map",
+                                figure=map_figure(
+                                    center={"lat": 38.3, "lon": 23.8},
+                                    zoom=5.5,
+                                    color_label="Avg Rating",
+                                    color_range=[1, 5],
+                                    title="Restaurants in Greece",
+                                )
+                                if figures
+                                else None,
+                                style={"height": "700px"},
+                            )
+                        ],
+                    ),
+                ]
+            ),
+            # Version of the dataset shown by the page, checked every DATA_POLL_SECONDS
+            dcc.Store(id="data-version", data=version),
+            dcc.Interval(id="data-version-poll", interval=DATA_POLL_SECONDS * 1000),
+        ],
+        style={"padding": "20px"},
+    )
+
+
+# Dash also builds the layout to validate it, when it is assigned and before the
+# first request, possibly while the data is still loading. Only the page's layout
+# request needs the regions and the figures (which import Plotly Express), and
+# waits for the data.
+def serve_layout():
+    if has_request_context() and request.path.endswith("_dash-layout"):
+        data = dashboard_data.get()
+        return build_layout(data.regions, version=data.dataset_version)
+    return build_layout([], figures=False)
+
+
+app.layout = serve_layout
+
+# `/ready` answers 503 until the data is loaded
+register_readiness(app, dashboard_data)
+
+
+# The region / rating / search filters are applied once, by `filter_restaurants`, which stores
+# the matching rows server-side and puts their key in the "filtered-rowset" store.
+# The three charts are updated by three independent callbacks on that store, so that
+# each chart is shown as soon as it is ready, and none of them runs again when an
+# interaction doesn't change the filtered rows.
+# The chart callbacks run in the request threads. DiskcacheManager starts a process
+# per background job, which takes longer than most aggregations: only the cuisine
+# counts of large search results (see `update_top_cuisines`) run in a worker.
+CHART_IDS = ["top-restaurants-bar-chart", "price-level-pie-chart", "top-cuisines-bar-chart"]
+
+
+# Check for a new version of the dataset (loaded in the background, see
+# `dataset_versions`). Once this worker serves it, the page gets the new version,
+# which runs the filter again, and the regions of the new version.
+@app.callback(
+    Output(component_id="data-version", component_property="data"),
+    Output(component_id="region-dropdown", component_property="options"),
+    Input(component_id="data-version-poll", component_property="n_intervals"),
+    State(component_id="data-version", component_property="data"),
+    prevent_initial_call=True,
 )
+def refresh_data_version(n_intervals, version):
+    data = dataset_versions.poll()
+    if data is None or data.dataset_version == version:
+        return dash.no_update, dash.no_update
+    return data.dataset_version, data.regions
 
 
 @app.callback(
-    [
-        Output(component_id="top-restaurants-bar-chart", component_property="figure"),
-        Output(component_id="price-level-pie-chart", component_property="figure"),
-        Output(component_id="top-cuisines-bar-chart", component_property="figure"),
-    ],
-    [
-        Input(component_id="region-dropdown", component_property="value"),
-        Input(component_id="rating-range-slider", component_property="value"),
-    ],
+    Output(component_id="filtered-rowset", component_property="data"),
+    Input(component_id="region-dropdown", component_property="value"),
+    Input(component_id="rating-range-slider", component_property="value"),
+    Input(component_id="restaurant-search", component_property="value"),
+    Input(component_id="data-version", component_property="data"),
+    State(component_id="filtered-rowset", component_property="data"),
 )
-def update_charts(selected_regions, rating_range):
-    top_restaurants_fig = None
-    price_level_fig = None
-    top_cuisines_fig = None
+def filter_restaurants(selected_regions, rating_range, search, version, current_rowset):
+    data = dashboard_data.get()
+    selected_regions = normalize_selection(selected_regions)
+    rating_range = normalize_range(0.1)(rating_range)
+    search = (search or "").strip() or None
 
-    if selected_regions:
-        filtered_df = df_restaurants[df_restaurants["region"].isin(selected_regions)]
-    else:
-        filtered_df = df_restaurants
-    filtered_df = filtered_df[
-        (filtered_df["avg_rating"] >= rating_range[0])
-        & (filtered_df["avg_rating"] <= rating_range[1])
-    ]
+    # Look up the rows of the selected regions and rating range in the query index,
+    # and keep those that match the search in the inverted index
+    with step("filter"):
+        filtered_rows = query_rows(data, selected_regions, rating_range, search)
+        key = data.rowsets.put(filtered_rows)
+    count("rows_filtered", len(filtered_rows))
+
+    rowset = {
+        "key": key,
+        "rows": len(filtered_rows),
+        "regions": selected_regions,
+        "rating_range": rating_range,
+        "search": search,
+    }
+    # Same rows as the charts already show: don't trigger the chart callbacks
+    # (keys include the dataset version, so a new version always updates them)
+    if current_rowset and current_rowset["key"] == key:
+        recompute_log.skipped(rowset, CHART_IDS)
+        return dash.no_update
+    return rowset
+
+
+# Sorted positions of the rows that match the filters (search: None for no search;
+# a search without any word, e.g. "!!", doesn't filter either)
+def query_rows(data, selected_regions, rating_range, search):
+    rows = data.restaurant_index.query(selected_regions, rating_range)
+    # The index only reads the rating slices of the selected regions
+    count("rows_scanned", len(rows))
+    matches = data.search_index.search(search) if search is not None else None
+    if matches is not None:
+        rows = np.intersect1d(rows, matches, assume_unique=True)
+    return rows
+
+
+# Rows of a filtered row set; recomputed from its filter values if this process
+# doesn't have them (computed by another worker, or evicted)
+def rowset_rows(data, rowset):
+    rows = data.rowsets.get(rowset["key"])
+    if rows is None:
+        rows = query_rows(
+            data, rowset["regions"], rowset["rating_range"], rowset.get("search")
+        )
+        data.rowsets.put(rows)
+    return rows
+
+
+# Completions of the last word typed in the search box
+@app.callback(
+    Output(component_id="search-suggestions", component_property="children"),
+    Input(component_id="restaurant-search", component_property="value"),
+)
+def update_search_suggestions(search):
+    from search_index import WORD
+
+    with step("search"):
+        completions = dashboard_data.get().search_index.suggest(search, limit=10)
+    if not completions:
+        return []
+    # Each suggestion replaces the last word of the box, as tokenize() splits it
+    # (so "fish-ta" keeps "fish-")
+    last_word = list(WORD.finditer(search))[-1]
+    head = search[: last_word.start()]
+    return [html.Option(value=head + completion) for completion in completions]
+
+
+@app.callback(
+    Output(component_id="top-restaurants-bar-chart", component_property="figure"),
+    Input(component_id="filtered-rowset", component_property="data"),
+)
+@recompute_log.track("top-restaurants-bar-chart")
+@figure_cache.memoize()
+def update_top_restaurants(data, rowset):
+    df_restaurants = data.df_restaurants
     # Step 4: Sort the filtered restaurants by 'total_reviews_count' in descending order to get the top 10 restaurants
 
     # ----- > Your code here to find the top restaurants
-    top_restaurants = filtered_df.sort_values(
-        by="total_reviews_count", ascending=False
-    ).head(10)
+    # (partial selection of the 10 largest values instead of sorting every row)
+    with step("sort"):
+        filtered_rows = rowset_rows(data, rowset)
+        top_rows = top_k_positions(
+            df_restaurants["total_reviews_count"], 10, rows=filtered_rows
+        )
+        top_restaurants = df_restaurants[["restaurant_name", "total_reviews_count"]].iloc[top_rows]
+    count("rows_scanned", len(filtered_rows))
+    count("rows_filtered", len(top_rows))
 
     # ----- > Your code here to generate the top restaurants bar chart
-    top_restaurants_fig = px.bar(
-        top_restaurants,
-        x="restaurant_name",
-        y="total_reviews_count",
-        labels={
-            "restaurant_name": "Restaurant Name",
-            "total_reviews_count": "Total Reviews",
-        },
-        title="Top 10 Restaurants by Number of Reviews",
-    )
+    # (only the bar data is sent, the rest of the figure is already in the page)
+    with step("figure"):
+        top_restaurants_fig = bar_patch(
+            top_restaurants["restaurant_name"], top_restaurants["total_reviews_count"]
+        )
+    return top_restaurants_fig
+
+
+@app.callback(
+    Output(component_id="price-level-pie-chart", component_property="figure"),
+    Input(component_id="filtered-rowset", component_property="data"),
+)
+@recompute_log.track("price-level-pie-chart")
+@figure_cache.memoize()
+def update_price_levels(data, rowset):
     # Step 5: Generate pie chart for price levels
 
     # ----- > Your code here to find the number of restaurants per price level
-    price_counts = filtered_df["price_level"].value_counts()
+    # (read from the pre-aggregated cube instead of counting the filtered rows;
+    # the cube has no search dimension, so search results are counted directly)
+    with step("aggregate"):
+        if rowset.get("search") is None:
+            price_counts = data.rollup_cube.price_level_counts(
+                rowset["regions"], rowset["rating_range"]
+            )
+        else:
+            price_counts = data.df_restaurants["price_level"].iloc[
+                rowset_rows(data, rowset)
+            ].value_counts()
+            price_counts = price_counts[price_counts > 0]
 
     # ----- > Your code here to generate the pie chart to analyze restaurants per price level
-    price_level_fig = px.pie(
-        values=price_counts.values,
-        names=price_counts.index,
-        labels={"names": "Price Level", "values": "Number of Restaurants"},
-        title="Distribution of Restaurants by Price Level",
-    )
+    with step("figure"):
+        price_level_fig = pie_patch(names=price_counts.index, values=price_counts.values)
+    return price_level_fig
 
+
+@recompute_log.track("top-cuisines-bar-chart")
+@figure_cache.memoize()
+def top_cuisines_figure(data, rowset):
     # Step 6: The cuisines column is a comma-separated string. To find specific cuisines, split and explode 'cuisines' column, then aggregate by count
 
     # ----- > Your code here to find the number of restaurants per cuisine
-    exploded_cuisines = filtered_df["cuisines"].dropna().str.split(", ").explode()
-    cuisines_counts = exploded_cuisines.value_counts().head(20)
+    # (read from the pre-aggregated cube, where the column has already been split;
+    # search results are counted from the pre-split column instead)
+    with step("aggregate"):
+        if rowset.get("search") is None:
+            cuisines_counts = data.rollup_cube.cuisine_counts(
+                rowset["regions"], rowset["rating_range"]
+            ).head(20)
+        else:
+            cuisines_counts = data.cuisines_column.value_counts(
+                rowset_rows(data, rowset)
+            ).head(20)
 
     # ----- > Your code here to generate the top cuisines bar chart
-    top_cuisines_fig = px.bar(
-        x=cuisines_counts.index,
-        y=cuisines_counts.values,
-        labels={"x": "Cuisine", "y": "Number of Restaurants"},
-        title="Top 20 Cuisines Based on Number of Restaurants",
+    with step("figure"):
+        top_cuisines_fig = bar_patch(cuisines_counts.index, cuisines_counts.values)
+    return top_cuisines_fig
+
+
+# Top cuisines chart. The figure is computed here, unless it is a cache miss on
+# a search result large enough for a background job: then the row set is handed
+# to `run_top_cuisines_job` through the "top-cuisines-job" store.
+@app.callback(
+    Output(component_id="top-cuisines-bar-chart", component_property="figure"),
+    Output(component_id="top-cuisines-job", component_property="data"),
+    Input(component_id="filtered-rowset", component_property="data"),
+)
+def update_top_cuisines(rowset):
+    if (
+        background_callback_manager is None
+        or rowset.get("search") is None
+        or rowset["rows"] < BACKGROUND_MIN_ROWS
+    ):
+        return top_cuisines_figure(rowset), dash.no_update
+    cached = top_cuisines_figure.cached(rowset)
+    if cached is not None:
+        return cached, dash.no_update
+    # The worker is forked from this process: with the rows in the row set
+    # store, it doesn't search them again
+    rowset_rows(dashboard_data.get(), rowset)
+    return dash.no_update, rowset
+
+
+# The job writes its figure to the shared cache directory, where the request
+# threads of every worker find it. A change of the filtered rows cancels it.
+if background_callback_manager is not None:
+
+    @app.callback(
+        Output(
+            component_id="top-cuisines-bar-chart",
+            component_property="figure",
+            allow_duplicate=True,
+        ),
+        Input(component_id="top-cuisines-job", component_property="data"),
+        background=True,
+        interval=BACKGROUND_POLL_INTERVAL,
+        cancel=[Input(component_id="filtered-rowset", component_property="data")],
+        prevent_initial_call=True,
     )
+    def run_top_cuisines_job(rowset):
+        return top_cuisines_figure(rowset)
+
+
+# Restaurants table: one page of the filtered rows, in the order and with the
+# header filters chosen in the table. The rows are ordered once per row set,
+# filter and sort (see table_pages.py); turning pages only slices them.
+@app.callback(
+    Output(component_id="restaurants-table", component_property="data"),
+    Output(component_id="restaurants-table", component_property="page_count"),
+    Output(component_id="restaurants-table", component_property="page_current"),
+    Input(component_id="filtered-rowset", component_property="data"),
+    Input(component_id="restaurants-table", component_property="page_current"),
+    Input(component_id="restaurants-table", component_property="page_size"),
+    Input(component_id="restaurants-table", component_property="sort_by"),
+    Input(component_id="restaurants-table", component_property="filter_query"),
+)
+def update_table(rowset, page_current, page_size, sort_by, filter_query):
+    data = dashboard_data.get()
+    with step("page"):
+        if rowset:
+            rows, key = (lambda: rowset_rows(data, rowset)), rowset["key"]
+        else:
+            rows, key = data.restaurant_index.query(None, [0, 5]), None
+        records, page_count, page_current, matched = data.table_pages.page(
+            key, rows, page_current, page_size or TABLE_PAGE_SIZE, filter_query, sort_by
+        )
+    count("rows_filtered", matched)
+    # The page number is clamped when the filters leave fewer pages
+    return records, page_count, page_current
+
+
+# Most markers drawn on the map at once
+MAP_MARKER_BUDGET = 500
+
+
+# Map tab: on every pan / zoom, send only the markers of the visible area, with
+# the restaurants grouped into clusters at the zoom level. Not memoized: the
+# query only reads the pre-aggregated grid cells in view. Also redrawn when a new
+# version of the dataset is loaded.
+@app.callback(
+    Output("restaurant-map", "figure"),
+    Input("restaurant-map", "relayoutData"),
+    Input("data-version", "data"),
+)
+def update_map(relayout_data, version):
+    data = dashboard_data.get()
+    with step("viewport"):
+        bounds = viewport_from_relayout(relayout_data, data.spatial_grid.bounds)
+        level, markers = data.spatial_grid.query(bounds, MAP_MARKER_BUDGET)
+        count("markers", len(markers["counts"]))
+
+    with step("figure"):
+        counts = markers["counts"]
+        names = data.df_restaurants["restaurant_name"].array.take(markers["row"])
+        text = [
+            name if n == 1 else f"{n} restaurants, avg rating {rating:.2f}"
+            for name, n, rating in zip(names, counts.tolist(), markers["rating"].tolist())
+        ]
+        sizes = np.clip(6 + 3 * np.log2(counts), 6, 30)
+        map_fig = map_patch(
+            markers["latitude"], markers["longitude"], sizes, markers["rating"], text
+        )
+    return map_fig
+
+
+# Measurement mode: log the response size of every callback
+if os.environ.get("LOG_CALLBACK_PAYLOADS"):
+    log_callback_payloads(app, layout=build_layout([]))
+
+# Measurement mode: per-callback metrics on /metrics (CALLBACK_METRICS=1)
+instrument_callbacks_from_env(app)
+
+# Record the callback requests of the user sessions for load_test.py (RECORD_SESSIONS=file)
+record_sessions_from_env(app)
+
 
-    return [top_restaurants_fig, price_level_fig, top_cuisines_fig]
+# Load the data in the background, once the app is defined. With PRELOAD_DATA=1
+# it is loaded right away instead, e.g. with `gunicorn --preload`, so that the
+# forked workers share the arrays loaded by the master process.
+if os.environ.get("PRELOAD_DATA"):
+    dashboard_data.get()
+else:
+    dashboard_data.start()
 
 
 # Start the Dash server with debug mode enabled for development
@@ -0,0 +1,238 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from dataset_archive import dataset_path, file_sha256
+
+# Shared loader for the TripAdvisor restaurants dataset.
+#
+# Parsing the 41-column CSV takes a noticeable amount of time, and every Dash
+# worker used to pay it again on startup. Here the CSV is converted once into a
+# typed, columnar cache (one NumPy file per column) stored next to the dataset:
+#
+#   datasets/.cache/tripadvisor_restaurants_greece/
+#       current.json          -> points to the active version
+#       <sha256 prefix>/      -> one directory per version of the source CSV
+#           manifest.json
+#           <column>.npy      -> numeric columns (memory-mapped on load)
+#           <column>.codes.npy + <column>.categories.json -> categorical columns
+#           <column>.json     -> free-text columns
+#
+# The cache rebuilds itself when the CSV's modification time changes and its
+# content hash no longer matches the one recorded in the manifest. The CSV is
+# located with dataset_archive.py, so `datasets.zip` doesn't need to be extracted.
+#
+# When the new CSV starts with the exact bytes of the previous one (rows were
+# appended), the manifest lists the previous versions in "appended_to", so that
+# a running dashboard can update its indexes with the new rows only instead of
+# rebuilding them (see dataset_versions.py).
+
+DATASET_NAME = "tripadvisor_restaurants_greece.csv"
+CACHE_DIR = "datasets/.cache/tripadvisor_restaurants_greece"
+
+# Low-cardinality text columns stored as integer codes plus a sorted list of
+# categories (so that sorting by the column stays alphabetical)
+CATEGORICAL_COLUMNS = ["region", "city", "price_level"]
+
+# Columns that must always be parsed as floats, even if a future version of the
+# CSV happens to contain only whole numbers in them
+FLOAT_COLUMNS = [
+    "latitude",
+    "longitude",
+    "avg_rating",
+    "total_reviews_count",
+    "food",
+    "service",
+    "value",
+    "atmosphere",
+]
+
+
+# Whether the CSV at `source_path` is the CSV of `previous` (a manifest) with rows
+# appended: it is larger, and starts with the previous content, up to a line end
+def _is_append(source_path, previous):
+    size = previous["source_size"]
+    if os.stat(source_path).st_size <= size or size == 0:
+        return False
+    with open(source_path, "rb") as f:
+        f.seek(size - 1)
+        if f.read(1) != b"\n":
+            return False
+    return file_sha256(source_path, size) == previous["source_sha256"]
+
+
+# Most previous versions listed in a manifest's "appended_to"
+MAX_APPENDED_TO = 16
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Write a JSON file atomically, so that concurrent workers never read half a file
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# Convert the CSV into the columnar layout described at the top of the module
+# (previous: the manifest of the version being replaced, if any)
+def build_cache(source_path=None, cache_dir=CACHE_DIR, source_hash=None, previous=None):
+    if source_path is None:
+        source_path = dataset_path(DATASET_NAME)
+    if source_hash is None:
+        source_hash = file_sha256(source_path)
+    stat = os.stat(source_path)
+
+    df = pd.read_csv(source_path, dtype={column: "float64" for column in FLOAT_COLUMNS})
+
+    version = source_hash[:16]
+    version_dir = os.path.join(cache_dir, version)
+    tmp_dir = f"{version_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    kinds = {}
+    for column in df.columns:
+        values = df[column]
+        if column in CATEGORICAL_COLUMNS:
+            categorical = pd.Categorical(values, categories=sorted(values.dropna().unique()))
+            np.save(os.path.join(tmp_dir, f"{column}.codes.npy"), categorical.codes)
+            _write_json(
+                os.path.join(tmp_dir, f"{column}.categories.json"),
+                categorical.categories.tolist(),
+            )
+            kinds[column] = "category"
+        elif pd.api.types.is_numeric_dtype(values):
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), values.to_numpy())
+            kinds[column] = "numeric"
+        else:
+            strings = [None if pd.isna(value) else value for value in values]
+            _write_json(os.path.join(tmp_dir, f"{column}.json"), strings)
+            kinds[column] = "text"
+
+    manifest = {
+        "source_path": os.path.abspath(source_path),
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_size": stat.st_size,
+        "source_sha256": source_hash,
+        "version": version,
+        "row_count": len(df),
+        "columns": kinds,
+    }
+    if previous is not None and _is_append(source_path, previous):
+        manifest["appended_to"] = (
+            [previous["version"]] + previous.get("appended_to", [])
+        )[:MAX_APPENDED_TO]
+    _write_json(os.path.join(tmp_dir, "manifest.json"), manifest)
+
+    # Publish the new version: move the directory into place, then flip the pointer
+    if os.path.isdir(version_dir):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, version_dir)
+    _write_json(os.path.join(cache_dir, "current.json"), {"version": version})
+
+    # Remove older versions that are no longer referenced
+    for entry in os.listdir(cache_dir):
+        entry_path = os.path.join(cache_dir, entry)
+        if entry != version and os.path.isdir(entry_path) and not entry.endswith(".tmp"):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+    return manifest
+
+
+# Return the manifest of an up-to-date cache, building or rebuilding it if needed
+def ensure_cache(source_path=None, cache_dir=CACHE_DIR):
+    if source_path is None:
+        source_path = dataset_path(DATASET_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(source_path)
+
+    pointer = _read_json(os.path.join(cache_dir, "current.json"))
+    manifest = None
+    if pointer is not None:
+        manifest = _read_json(os.path.join(cache_dir, pointer["version"], "manifest.json"))
+
+    if manifest is not None:
+        if (
+            manifest["source_mtime_ns"] == stat.st_mtime_ns
+            and manifest["source_size"] == stat.st_size
+        ):
+            return manifest
+
+        # The file was touched: only rebuild if the content actually changed
+        source_hash = file_sha256(source_path)
+        if source_hash == manifest["source_sha256"]:
+            manifest["source_mtime_ns"] = stat.st_mtime_ns
+            _write_json(os.path.join(cache_dir, manifest["version"], "manifest.json"), manifest)
+            return manifest
+        return build_cache(source_path, cache_dir, source_hash, previous=manifest)
+
+    return build_cache(source_path, cache_dir)
+
+
+# Whether the source CSV or the active cache version changed since `manifest` was
+# read: a stat and a small JSON read, cheap enough to poll
+def dataset_changed(manifest, cache_dir=CACHE_DIR):
+    try:
+        stat = os.stat(manifest["source_path"])
+    except OSError:
+        return False
+    if (stat.st_mtime_ns, stat.st_size) != (manifest["source_mtime_ns"], manifest["source_size"]):
+        return True
+    pointer = _read_json(os.path.join(cache_dir, "current.json"))
+    return pointer is not None and pointer["version"] != manifest["version"]
+
+
+# Whether the data of `version` is the beginning of the data of `manifest`'s
+# version (the same version, or one that only had rows appended since)
+def extends_version(manifest, version):
+    return version == manifest["version"] or version in manifest.get("appended_to", [])
+
+
+# Load the restaurants dataset from the columnar cache.
+# - columns: the columns to load (all of them if None); only these files are read
+# - Numeric columns are memory-mapped: each one stays a read-only view of its
+#   file in the DataFrame (they are not copied into one block), so opening them
+#   is practically free and the pages are shared between processes
+def load_restaurants(columns=None, source_path=None, cache_dir=CACHE_DIR):
+    manifest = ensure_cache(source_path, cache_dir)
+    version_dir = os.path.join(cache_dir, manifest["version"])
+    kinds = manifest["columns"]
+
+    if columns is None:
+        columns = list(kinds)
+    unknown = [column for column in columns if column not in kinds]
+    if unknown:
+        raise KeyError(f"Unknown columns: {unknown}")
+
+    data = {}
+    for column in columns:
+        kind = kinds[column]
+        if kind == "category":
+            codes = np.load(os.path.join(version_dir, f"{column}.codes.npy"))
+            categories = _read_json(os.path.join(version_dir, f"{column}.categories.json"))
+            data[column] = pd.Categorical.from_codes(codes, categories=categories)
+        elif kind == "numeric":
+            data[column] = pd.Series(
+                np.load(os.path.join(version_dir, f"{column}.npy"), mmap_mode="r"), copy=False
+            )
+        else:
+            data[column] = pd.Series(
+                _read_json(os.path.join(version_dir, f"{column}.json")), dtype="str"
+            )
+
+    df = pd.DataFrame(data, columns=columns, copy=False)
+    # Identifies the version of the source CSV, e.g. to namespace derived caches
+    df.attrs["dataset_version"] = manifest["version"]
+    return df
@@ -0,0 +1,108 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Query index for the region / rating filters of the restaurants dashboard.
+#
+# Filtering with boolean masks scans every row on each callback, which adds up
+# quickly while a user drags the rating RangeSlider. The index is built once at
+# startup and keeps, for every region, the row positions of its restaurants
+# sorted by average rating. A rating range then becomes two binary searches per
+# selected region, and the matching row positions are merged into one sorted
+# array that can be passed to `DataFrame.iloc`.
+#
+# When rows are appended to the dataset, `appended` merges the new rows into
+# the sorted arrays of their regions instead of sorting everything again.
+
+
+class RestaurantIndex:
+    def __init__(self, df, region_column="region", rating_column="avg_rating"):
+        self.row_count = len(df)
+
+        codes, uniques = pd.factorize(df[region_column])
+        ratings = df[rating_column].to_numpy(dtype="float64")
+        valid = ~np.isnan(ratings)
+
+        # All rows with a rating, sorted by rating (used when no region is selected)
+        self.rating_order = np.flatnonzero(valid)
+        self.rating_order = self.rating_order[
+            np.argsort(ratings[self.rating_order], kind="stable")
+        ]
+        self.sorted_ratings = ratings[self.rating_order]
+
+        # Per region: row positions sorted by rating, and the matching ratings
+        self.region_order = {}
+        self.region_ratings = {}
+        for code, region in enumerate(uniques):
+            rows = np.flatnonzero((codes == code) & valid)
+            rows = rows[np.argsort(ratings[rows], kind="stable")]
+            self.region_order[region] = rows
+            self.region_ratings[region] = ratings[rows]
+
+    # Merge rows into arrays sorted by rating (new rows go after equal ratings,
+    # like a stable sort over all the rows, since their positions are larger)
+    @staticmethod
+    def _merge(order, sorted_ratings, rows, ratings):
+        rows_order = np.argsort(ratings, kind="stable")
+        rows, ratings = rows[rows_order], ratings[rows_order]
+        positions = np.searchsorted(sorted_ratings, ratings, side="right")
+        return np.insert(order, positions, rows), np.insert(sorted_ratings, positions, ratings)
+
+    # New index over `df`, whose rows before `start` are the rows this index was
+    # built on, and whose rows from `start` on were appended. This index is left
+    # untouched (callbacks may still be reading it).
+    def appended(self, df, start, region_column="region", rating_column="avg_rating"):
+        index = copy.copy(self)
+        index.row_count = len(df)
+        index.region_order = dict(self.region_order)
+        index.region_ratings = dict(self.region_ratings)
+
+        delta = df.iloc[start:]
+        ratings = delta[rating_column].to_numpy(dtype="float64")
+        valid = ~np.isnan(ratings)
+        rows = start + np.flatnonzero(valid)
+        ratings = ratings[valid]
+        index.rating_order, index.sorted_ratings = self._merge(
+            self.rating_order, self.sorted_ratings, rows, ratings
+        )
+
+        codes, uniques = pd.factorize(delta[region_column].iloc[np.flatnonzero(valid)])
+        for code, region in enumerate(uniques):
+            in_region = codes == code
+            empty = np.empty(0, dtype=np.intp)
+            index.region_order[region], index.region_ratings[region] = self._merge(
+                self.region_order.get(region, empty),
+                self.region_ratings.get(region, empty.astype("float64")),
+                rows[in_region],
+                ratings[in_region],
+            )
+        return index
+
+    # Return the positions (sorted) of the rows whose rating lies in [low, high]
+    @staticmethod
+    def _rating_slice(order, sorted_ratings, low, high):
+        start = np.searchsorted(sorted_ratings, low, side="left")
+        end = np.searchsorted(sorted_ratings, high, side="right")
+        return order[start:end]
+
+    # Return the sorted row positions that match the selected regions and rating range.
+    # - selected_regions: list of regions, or None / [] for all regions
+    # - rating_range: [low, high], both inclusive
+    def query(self, selected_regions, rating_range):
+        low, high = rating_range
+
+        if selected_regions:
+            parts = [
+                self._rating_slice(
+                    self.region_order[region], self.region_ratings[region], low, high
+                )
+                for region in set(selected_regions)
+                if region in self.region_order
+            ]
+            rows = np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+        else:
+            rows = self._rating_slice(self.rating_order, self.sorted_ratings, low, high)
+
+        # Keep the original row order, so results match a boolean-mask filter
+        return np.sort(rows)
@@ -0,0 +1,251 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated counts for the pie chart and the cuisines chart of the
+# restaurants dashboard.
+#
+# Both charts only need counts, so instead of counting raw rows on every
+# callback, the counts are aggregated once over
+#
+#   region x price_level x avg_rating bucket (0.1 wide) [x cuisine]
+#
+# Any region selection / rating range is then answered by summing a slice of the
+# cube, which takes the same time whatever the number of restaurants.
+#
+# The results are ordered exactly like the pandas `value_counts()` calls they
+# replace. For cuisines, ties are broken by first appearance, so the cube also
+# keeps the position of the first value that fell in each cell.
+#
+# When rows are appended to the dataset, `appended` adds their counts to a copy
+# of the cube (growing its axes for new regions, price levels or cuisines)
+# instead of aggregating every row again.
+
+
+class RollupCube:
+    def __init__(
+        self,
+        df,
+        cuisines_column,
+        region_column="region",
+        price_column="price_level",
+        rating_column="avg_rating",
+        resolution=0.1,
+    ):
+        self.resolution = resolution
+
+        # Regions (the dashboard has already dropped rows without a region)
+        region_codes, regions = pd.factorize(df[region_column])
+        self.region_codes = {region: code for code, region in enumerate(regions)}
+
+        # Price levels, in category order (like value_counts on a categorical);
+        # rows without a price level go into an extra, last slot
+        prices = df[price_column]
+        if not isinstance(prices.dtype, pd.CategoricalDtype):
+            prices = prices.astype(pd.CategoricalDtype(sorted(prices.dropna().unique())))
+        self.price_levels = prices.cat.categories
+        price_codes = prices.cat.codes.to_numpy().astype(np.intp)
+        price_codes[price_codes < 0] = len(self.price_levels)
+
+        # Rating buckets; rows without a rating never match a rating range
+        ratings = df[rating_column].to_numpy(dtype="float64")
+        valid = ~np.isnan(ratings) & (region_codes >= 0)
+        buckets = np.zeros(len(ratings), dtype=np.intp)
+        buckets[valid] = np.rint(ratings[valid] / resolution).astype(np.intp)
+        if valid.any() and not np.allclose(buckets[valid] * resolution, ratings[valid]):
+            raise ValueError(f"{rating_column} values are not multiples of {resolution}")
+        n_buckets = int(buckets.max()) + 1 if valid.any() else 1
+
+        shape = (len(regions), len(self.price_levels) + 1, n_buckets)
+        rows = np.flatnonzero(valid)
+        cells = np.ravel_multi_index(
+            (region_codes[rows], price_codes[rows], buckets[rows]), shape
+        )
+        self.restaurant_cube = np.bincount(cells, minlength=np.prod(shape)).reshape(shape)
+
+        # Cuisines: one entry per (restaurant, cuisine) pair
+        self.cuisines = cuisines_column.terms
+        lengths = np.diff(cuisines_column.indptr)
+        value_rows = np.repeat(np.arange(len(df)), lengths)
+        value_offsets = np.arange(len(value_rows))
+        keep = valid[value_rows]
+        value_rows = value_rows[keep]
+
+        cuisine_shape = shape + (len(self.cuisines),)
+        cuisine_cells = np.ravel_multi_index(
+            (
+                region_codes[value_rows],
+                price_codes[value_rows],
+                buckets[value_rows],
+                cuisines_column.indices[keep],
+            ),
+            cuisine_shape,
+        )
+        size = np.prod(cuisine_shape)
+        self.cuisine_cube = np.bincount(cuisine_cells, minlength=size).reshape(cuisine_shape)
+        first_seen = np.full(size, np.iinfo(np.intp).max, dtype=np.intp)
+        np.minimum.at(first_seen, cuisine_cells, value_offsets[keep])
+        self.cuisine_first_seen = first_seen.reshape(cuisine_shape)
+
+    # Create a cube from counts aggregated elsewhere (e.g. by streaming_ingest.py).
+    # Arrays are indexed like the ones built by __init__.
+    @classmethod
+    def from_arrays(
+        cls,
+        regions,
+        price_levels,
+        cuisines,
+        restaurant_cube,
+        cuisine_cube,
+        cuisine_first_seen,
+        resolution=0.1,
+    ):
+        cube = cls.__new__(cls)
+        cube.resolution = resolution
+        cube.region_codes = {region: code for code, region in enumerate(regions)}
+        cube.price_levels = pd.Index(price_levels)
+        cube.cuisines = np.asarray(cuisines, dtype=object)
+        cube.restaurant_cube = restaurant_cube
+        cube.cuisine_cube = cuisine_cube
+        cube.cuisine_first_seen = cuisine_first_seen
+        return cube
+
+    # New cube with the counts of the rows of `df` from `start` on added; the rows
+    # before `start` are the rows this cube was built on. `cuisines_column` is the
+    # cuisines of the whole `df`, extended from the one the cube was built with
+    # (MultiValueColumn.appended). This cube is left untouched.
+    def appended(
+        self,
+        df,
+        cuisines_column,
+        start,
+        region_column="region",
+        price_column="price_level",
+        rating_column="avg_rating",
+    ):
+        delta = df.iloc[start:]
+
+        # Regions: new ones get the next codes
+        delta_regions = delta[region_column].astype(object)
+        regions = pd.Index(list(self.region_codes), dtype=object)
+        regions = regions.append(
+            pd.Index([r for r in delta_regions.dropna().unique() if r not in self.region_codes])
+        )
+        region_codes = regions.get_indexer(delta_regions)
+
+        # Price levels in category order (or sorted), so the old slots may move; the
+        # last slot is still for rows without a price level
+        prices = df[price_column]
+        if isinstance(prices.dtype, pd.CategoricalDtype):
+            price_levels = prices.cat.categories
+        else:
+            price_levels = pd.Index(
+                sorted(set(self.price_levels) | set(delta[price_column].dropna().unique()))
+            )
+        price_codes = price_levels.get_indexer(delta[price_column].astype(object))
+        price_codes[price_codes < 0] = len(price_levels)
+        old_price_slots = np.append(price_levels.get_indexer(self.price_levels), len(price_levels))
+
+        ratings = delta[rating_column].to_numpy(dtype="float64")
+        valid = ~np.isnan(ratings) & (region_codes >= 0)
+        buckets = np.zeros(len(ratings), dtype=np.intp)
+        buckets[valid] = np.rint(ratings[valid] / self.resolution).astype(np.intp)
+        if valid.any() and not np.allclose(buckets[valid] * self.resolution, ratings[valid]):
+            raise ValueError(f"{rating_column} values are not multiples of {self.resolution}")
+        n_buckets = max(self.restaurant_cube.shape[2], int(buckets.max(initial=0)) + 1)
+
+        # Copy the counts into the grown cube, then add the new rows
+        old_regions, _, old_buckets = self.restaurant_cube.shape
+        shape = (len(regions), len(price_levels) + 1, n_buckets)
+        restaurant_cube = np.zeros(shape, dtype=self.restaurant_cube.dtype)
+        restaurant_cube[:old_regions, old_price_slots, :old_buckets] = self.restaurant_cube
+        rows = np.flatnonzero(valid)
+        np.add.at(restaurant_cube, (region_codes[rows], price_codes[rows], buckets[rows]), 1)
+
+        # Cuisines: the values of the new rows, with their global positions
+        old_cuisines = len(self.cuisines)
+        cuisine_shape = shape + (len(cuisines_column.terms),)
+        cuisine_cube = np.zeros(cuisine_shape, dtype=self.cuisine_cube.dtype)
+        cuisine_cube[:old_regions, old_price_slots, :old_buckets, :old_cuisines] = (
+            self.cuisine_cube
+        )
+        cuisine_first_seen = np.full(
+            cuisine_shape, np.iinfo(self.cuisine_first_seen.dtype).max, self.cuisine_first_seen.dtype
+        )
+        cuisine_first_seen[:old_regions, old_price_slots, :old_buckets, :old_cuisines] = (
+            self.cuisine_first_seen
+        )
+        first_value, last_value = cuisines_column.indptr[start], cuisines_column.indptr[-1]
+        lengths = np.diff(cuisines_column.indptr[start:])
+        value_rows = np.repeat(np.arange(len(delta)), lengths)
+        value_offsets = np.arange(first_value, last_value)
+        keep = valid[value_rows]
+        value_rows = value_rows[keep]
+        cells = (
+            region_codes[value_rows],
+            price_codes[value_rows],
+            buckets[value_rows],
+            cuisines_column.indices[first_value:last_value][keep],
+        )
+        np.add.at(cuisine_cube, cells, 1)
+        np.minimum.at(cuisine_first_seen, cells, value_offsets[keep])
+
+        return RollupCube.from_arrays(
+            regions=regions,
+            price_levels=price_levels,
+            cuisines=cuisines_column.terms,
+            restaurant_cube=restaurant_cube,
+            cuisine_cube=cuisine_cube,
+            cuisine_first_seen=cuisine_first_seen,
+            resolution=self.resolution,
+        )
+
+    # Index along the region and rating bucket axes for the given filters
+    def _selection(self, selected_regions, rating_range):
+        if selected_regions:
+            regions = sorted(
+                {
+                    self.region_codes[region]
+                    for region in selected_regions
+                    if region in self.region_codes
+                }
+            )
+        else:
+            regions = slice(None)
+
+        low, high = rating_range
+        first_bucket = max(math.ceil(low / self.resolution - 1e-9), 0)
+        last_bucket = math.floor(high / self.resolution + 1e-9)
+        return regions, slice(first_bucket, last_bucket + 1)
+
+    # Restaurants per price level, like `filtered_df["price_level"].value_counts()`
+    # without the price levels that have no restaurants
+    def price_level_counts(self, selected_regions, rating_range):
+        regions, buckets = self._selection(selected_regions, rating_range)
+        counts = self.restaurant_cube[regions, :-1, buckets].sum(axis=(0, 2))
+
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-counts[present], kind="stable")]
+        return pd.Series(
+            counts[order],
+            index=pd.Index(self.price_levels[order], name="price_level"),
+            name="count",
+        )
+
+    # Restaurants per cuisine, like
+    # `filtered_df["cuisines"].dropna().str.split(", ").explode().value_counts()`
+    def cuisine_counts(self, selected_regions, rating_range):
+        regions, buckets = self._selection(selected_regions, rating_range)
+        counts = self.cuisine_cube[regions, :, buckets].sum(axis=(0, 1, 2))
+        first_seen = self.cuisine_first_seen[regions, :, buckets].min(
+            axis=(0, 1, 2), initial=np.iinfo(np.intp).max
+        )
+
+        present = np.flatnonzero(counts)
+        order = present[np.lexsort((first_seen[present], -counts[present]))]
+        return pd.Series(
+            counts[order],
+            index=pd.Index(self.cuisines[order], name="cuisines"),
+            name="count",
+        )
@@ -0,0 +1,57 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Server-side store of filtered row sets for the restaurants dashboard.
+#
+# The filter callback computes the rows matching the region / rating filters once
+# and keeps them here as a bitmap (one bit per restaurant, ~4 KB for the whole
+# dataset). Only a short key goes to the browser, in a dcc.Store; the chart
+# callbacks receive that key and look the rows up again.
+#
+# Keys are content hashes of the bitmap, so two filters that match the same rows
+# (e.g. moving the rating slider over a gap between ratings) produce the same
+# key, and the charts that depend on it don't need to be recomputed.
+#
+# The store is per process and bounded (LRU): a worker that doesn't have a key
+# (another gunicorn worker computed it, or it was evicted) recomputes the rows
+# from the filter values sent along with the key.
+
+
+class RowsetStore:
+    def __init__(self, row_count, max_entries=1024, namespace=""):
+        self.row_count = row_count
+        self.max_entries = max_entries
+        # Included in every key, e.g. the dataset version
+        self.namespace = namespace
+
+        self._entries = OrderedDict()  # key -> packed bitmap
+        self._lock = threading.Lock()
+
+    # Store a set of row positions, return its key
+    def put(self, rows):
+        mask = np.zeros(self.row_count, dtype=bool)
+        mask[rows] = True
+        bitmap = np.packbits(mask)
+
+        digest = hashlib.sha256(self.namespace.encode("utf-8"))
+        digest.update(bitmap.tobytes())
+        key = digest.hexdigest()[:16]
+
+        with self._lock:
+            self._entries[key] = bitmap
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    # Sorted row positions stored under a key, or None if this process doesn't have it
+    def get(self, key):
+        with self._lock:
+            bitmap = self._entries.get(key)
+            if bitmap is None:
+                return None
+            self._entries.move_to_end(key)
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.row_count))
@@ -0,0 +1,196 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Full-text search index for the restaurants dashboard.
+#
+# Matching a query with `str.contains` on every keystroke scans every name,
+# keyword list and tag list of the dataset. Instead, the text columns are
+# tokenized once into an inverted index in CSR form:
+#
+#   terms   -> the distinct (folded) words, sorted
+#   indptr  -> term i occurs in rows[indptr[i]:indptr[i + 1]]
+#   rows    -> the row positions of every term, term after term, sorted
+#
+# Because the terms are sorted, all the terms that start with a prefix are one
+# contiguous range of `terms`, found with two binary searches, and their rows are
+# one contiguous slice of `rows`. Every word of a query is matched as a prefix
+# (type-ahead: "souv" finds "souvlaki"), and a row must match all of them.
+#
+# Words are folded before indexing and before searching: lowercased, accents
+# removed and Greek transliterated to Latin, with a few spelling variants of
+# Greeklish merged, so that "σουβλάκι", "Souvlaki" and "suvlaki" are one term.
+# A prefix that ends halfway through a merged digraph ("so", "p", "k") also
+# looks up the merged spelling ("su", "f", "ch"), so type-ahead keeps matching
+# while the digraph is typed (see check_search_index.py).
+#
+# When rows are appended to the dataset, `appended` indexes only the new rows
+# and merges their postings into a copy of the index.
+
+# Greek letter -> Latin (ELOT 743 without the diphthong rules)
+GREEK_TO_LATIN = {
+    "α": "a", "β": "v", "γ": "g", "δ": "d", "ε": "e", "ζ": "z", "η": "i", "θ": "th",
+    "ι": "i", "κ": "k", "λ": "l", "μ": "m", "ν": "n", "ξ": "x", "ο": "o", "π": "p",
+    "ρ": "r", "σ": "s", "ς": "s", "τ": "t", "υ": "y", "φ": "f", "χ": "ch", "ψ": "ps",
+    "ω": "o",
+}
+
+# Latin spellings of the same Greek sounds, merged after transliteration
+VARIANTS = [("ou", "u"), ("ph", "f"), ("kh", "ch"), ("y", "i"), ("w", "o")]
+
+# A word typed up to the first letter of a merged digraph ("so" of "souvlaki")
+# also matches the words where the digraph was merged ("suvlaki")
+PARTIAL_DIGRAPHS = {"o": "u", "p": "f", "k": "ch"}
+
+WORD = re.compile(r"\w+")
+
+
+# Lowercase, strip accents, transliterate Greek and merge spelling variants
+def fold(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    # "ου" is one sound, written "ou" (not "oy")
+    text = "".join(GREEK_TO_LATIN.get(char, char) for char in text.replace("ου", "ou"))
+    for variant, canonical in VARIANTS:
+        text = text.replace(variant, canonical)
+    return text
+
+
+# Folded words of a text
+def tokenize(text):
+    return WORD.findall(fold(text))
+
+
+class SearchIndex:
+    # columns: the text columns to index (e.g. name, keywords, tags), all of the same length
+    def __init__(self, columns):
+        columns = [pd.Series(values) for values in columns]
+        self.row_count = len(columns[0]) if columns else 0
+
+        pair_terms = []  # folded term of every (term, row) pair, over all the columns
+        pair_rows = []
+        labels = {}  # folded term -> first original spelling, for the suggestions
+        folded = {}  # word -> folded term
+        for values in columns:
+            # Tokenize every distinct text once (tags and keywords repeat a lot)
+            codes, uniques = pd.factorize(values)
+            value_terms = []
+            for text in uniques:
+                terms = []
+                for word in WORD.findall(text.lower()):
+                    term = folded.get(word)
+                    if term is None:
+                        term = folded[word] = fold(word)
+                        labels.setdefault(term, word)
+                    terms.append(term)
+                value_terms.append(terms)
+
+            # Expand every row into the terms of its text (like MultiValueColumn.codes_for_rows)
+            lengths = np.array([len(terms) for terms in value_terms], dtype=np.intp)
+            starts = np.concatenate([[0], np.cumsum(lengths)])[:-1]
+            flat = np.array([term for terms in value_terms for term in terms], dtype=object)
+            rows = np.flatnonzero(codes >= 0)
+            row_lengths = lengths[codes[rows]]
+            offsets = np.repeat(
+                starts[codes[rows]] - np.cumsum(row_lengths) + row_lengths, row_lengths
+            )
+            pair_terms.append(flat[offsets + np.arange(len(offsets))])
+            pair_rows.append(np.repeat(rows, row_lengths))
+
+        terms, term_codes = np.unique(
+            np.concatenate(pair_terms + [np.empty(0, dtype=object)]).astype(str),
+            return_inverse=True,
+        )
+        rows = np.concatenate(pair_rows + [np.empty(0, dtype=np.intp)])
+
+        # One entry per (term, row), sorted by term then row
+        width = max(self.row_count, 1)
+        pairs = np.unique(term_codes.astype(np.int64) * width + rows)
+        self.terms = terms
+        self.rows = (pairs % width).astype(np.int32)
+        self.indptr = np.searchsorted(pairs // width, np.arange(len(terms) + 1))
+        self.labels = np.array([labels[term] for term in terms], dtype=object)
+
+    # New index over `columns`, whose rows from `start` on were appended after the
+    # rows this index was built on: only those are tokenized. This index is left
+    # untouched.
+    def appended(self, columns, start):
+        columns = [pd.Series(values) for values in columns]
+        delta = SearchIndex([values.iloc[start:] for values in columns])
+
+        terms = np.union1d(self.terms, delta.terms)
+        old_codes = np.searchsorted(terms, self.terms)
+        delta_codes = np.searchsorted(terms, delta.terms)
+
+        # Re-key every (term, row) pair on the merged terms; old rows come before
+        # the new ones, so sorting by term keeps the rows of every term sorted
+        row_count = len(columns[0]) if columns else 0
+        width = max(row_count, 1)
+        pairs = np.concatenate(
+            [
+                np.repeat(old_codes, np.diff(self.indptr)).astype(np.int64) * width
+                + self.rows,
+                np.repeat(delta_codes, np.diff(delta.indptr)).astype(np.int64) * width
+                + delta.rows
+                + start,
+            ]
+        )
+        pairs.sort(kind="stable")
+
+        index = SearchIndex.__new__(SearchIndex)
+        index.row_count = row_count
+        index.terms = terms
+        index.rows = (pairs % width).astype(np.int32)
+        index.indptr = np.searchsorted(pairs // width, np.arange(len(terms) + 1))
+        labels = np.empty(len(terms), dtype=object)
+        labels[delta_codes] = delta.labels
+        labels[old_codes] = self.labels
+        index.labels = labels
+        return index
+
+    # Range [start, end) of the terms that start with a folded prefix
+    def _prefix_range(self, prefix):
+        start = np.searchsorted(self.terms, prefix, side="left")
+        # Every string that starts with `prefix` sorts before prefix + U+10FFFF
+        end = np.searchsorted(self.terms, prefix + "\U0010ffff", side="left")
+        return int(start), int(end)
+
+    # Ranges of the terms that start with a folded word, and with the word where a
+    # digraph it ends with the start of was merged (the ranges are disjoint)
+    def _prefix_ranges(self, word):
+        prefixes = [word]
+        if word[-1:] in PARTIAL_DIGRAPHS:
+            prefixes.append(word[:-1] + PARTIAL_DIGRAPHS[word[-1]])
+        return [self._prefix_range(prefix) for prefix in prefixes]
+
+    # Sorted positions of the rows that contain every word of the query (as a prefix);
+    # None for an empty query (no filter)
+    def search(self, query):
+        words = tokenize(query or "")
+        if not words:
+            return None
+        matched = None
+        # Longest words first: they match the fewest rows
+        for word in sorted(set(words), key=len, reverse=True):
+            mask = np.zeros(self.row_count, dtype=bool)
+            for start, end in self._prefix_ranges(word):
+                mask[self.rows[self.indptr[start] : self.indptr[end]]] = True
+            matched = mask if matched is None else matched & mask
+            if not matched.any():
+                break
+        return np.flatnonzero(matched)
+
+    # Completions of the last word of a query: up to `limit` words (original spelling)
+    # that start with it, most frequent first
+    def suggest(self, query, limit=10):
+        words = tokenize(query or "")
+        if not words or (query and not query[-1].isalnum()):
+            return []
+        terms = np.concatenate(
+            [np.arange(start, end) for start, end in self._prefix_ranges(words[-1])]
+        ).astype(np.intp)
+        frequencies = self.indptr[terms + 1] - self.indptr[terms]
+        order = np.argsort(-frequencies, kind="stable")[:limit]
+        return self.labels[terms[order]].tolist()
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+import time
+
+from flask import request
+
+# Recording of the callback requests of real user sessions, for load_test.py.
+#
+# `record_sessions(app, path)` appends every `/_dash-update-component` request
+# the app receives (dropdown picks, slider drags, and the chained callbacks the
+# browser runs after them) to a JSON Lines file, one request per line:
+#
+#   {"session": "127.0.0.1 Mozilla/5.0 ...", "time": 1700000000.12, "body": {...}}
+#
+# Requests are grouped into sessions by client address and user agent: open the
+# dashboard in a few browsers, click around, and replay the file with
+#
+#   python scripts/load_test.py run --module restaurants_dashboard --sessions sessions.jsonl
+#
+# The polls of background callbacks (requests with a `cacheKey`) are left out:
+# the load test polls on its own. Lines are appended with a single write, so
+# several gunicorn workers can record into the same file.
+#
+# The dashboards enable it from the environment:
+#
+#   RECORD_SESSIONS=sessions.jsonl python restaurants_dashboard.py
+
+
+def record_sessions(app, path):
+    lock = threading.Lock()
+
+    @app.server.before_request
+    def record_request():
+        if not request.path.endswith("_dash-update-component") or "cacheKey" in request.args:
+            return
+        body = request.get_json(silent=True)
+        if body is None:
+            return
+        line = json.dumps(
+            {
+                "session": f"{request.remote_addr} {request.user_agent.string}",
+                "time": time.time(),
+                "body": body,
+            },
+            separators=(",", ":"),
+        )
+        with lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# Enable the recording when RECORD_SESSIONS is set (to the path of the file)
+def record_sessions_from_env(app):
+    path = os.environ.get("RECORD_SESSIONS")
+    if path:
+        record_sessions(app, path)
+    return path
@@ -0,0 +1,292 @@
+import copy
+import math
+
+import numpy as np
+
+# Spatial index for the restaurants map.
+#
+# Sending every restaurant to the browser as a map marker makes panning and
+# zooming crawl. Instead, the restaurants are pre-aggregated once into a
+# pyramid of grids aligned with the map tiles (Web Mercator):
+#
+#   level z: the world is cut into (2^z * cells_per_tile)^2 cells, so a cell
+#            covers about the same number of screen pixels at map zoom z;
+#            each non-empty cell keeps its restaurant count, the mean position
+#            of its restaurants (where its marker is drawn) and their mean rating.
+#
+# Cells are sorted by (column, row), so the cells in a viewport are found with
+# two binary searches and a filter over one strip of columns. A query picks the
+# level matching the viewport size and moves to coarser levels until the number
+# of markers fits in the budget; past the finest level it returns the individual
+# restaurants. The work therefore depends on the number of cells in view, not
+# on the number of restaurants.
+#
+# When rows are appended to the dataset, `appended` merges their cells into the
+# levels (cell counts, and means weighted by the counts) instead of aggregating
+# every restaurant again.
+
+CELLS_PER_TILE = 8
+
+# Web Mercator is only defined up to this latitude
+MAX_LATITUDE = 85.05112878
+
+
+# Longitude / latitude -> Web Mercator coordinates in [0, 1) (y grows southwards)
+def mercator(longitude, latitude):
+    latitude = np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE)
+    x = (np.asarray(longitude, dtype="float64") + 180.0) / 360.0
+    sin = np.sin(np.radians(latitude))
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return np.clip(x, 0, 1 - 1e-12), np.clip(y, 0, 1 - 1e-12)
+
+
+# Web Mercator y (see `mercator`) -> latitude
+def latitude_of(y):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+# Viewport (west, south, east, north) of a map from the relayoutData of its dcc.Graph.
+# Plotly sends the corners of the visible area in "<subplot>._derived"; otherwise
+# the viewport is estimated from the center and zoom and the size of the graph in
+# pixels (512 px per tile). Returns `default` for anything else (autosize, reset).
+def viewport_from_relayout(relayout_data, default, subplot="map", size=(900, 600)):
+    relayout_data = relayout_data or {}
+
+    derived = relayout_data.get(f"{subplot}._derived") or {}
+    coordinates = derived.get("coordinates")
+    if coordinates:
+        longitudes = [point[0] for point in coordinates]
+        latitudes = [point[1] for point in coordinates]
+        return (min(longitudes), min(latitudes), max(longitudes), max(latitudes))
+
+    center = relayout_data.get(f"{subplot}.center")
+    zoom = relayout_data.get(f"{subplot}.zoom")
+    if center is None or zoom is None:
+        return default
+    x, y = mercator(center["lon"], center["lat"])
+    half_width = size[0] / (512 * 2**zoom) / 2
+    half_height = size[1] / (512 * 2**zoom) / 2
+    return (
+        float(x - half_width) * 360 - 180,
+        latitude_of(min(float(y + half_height), 1.0)),
+        float(x + half_width) * 360 - 180,
+        latitude_of(max(float(y - half_height), 0.0)),
+    )
+
+
+class SpatialGrid:
+    def __init__(self, latitude, longitude, rating=None, max_level=16, cells_per_tile=CELLS_PER_TILE):
+        self.max_level = max_level
+        self.cells_per_tile = cells_per_tile
+
+        self.rows, latitude, longitude, rating = self._valid(latitude, longitude, rating)
+        x, y = mercator(longitude, latitude)
+
+        # Extent of the data: the default viewport
+        if len(self.rows):
+            self.bounds = tuple(
+                float(value)
+                for value in (longitude.min(), latitude.min(), longitude.max(), latitude.max())
+            )
+        else:
+            self.bounds = (-180.0, -MAX_LATITUDE, 180.0, MAX_LATITUDE)
+
+        self.levels = []
+        for level in range(max_level + 1):
+            sums = self._cell_sums(self._keys(x, y, level), latitude, longitude, rating, self.rows)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.levels.append(
+                    {
+                        "keys": sums["keys"],
+                        "counts": sums["counts"].astype(np.int32),
+                        "latitude": (sums["latitude"] / sums["counts"]).astype(np.float32),
+                        "longitude": (sums["longitude"] / sums["counts"]).astype(np.float32),
+                        "rating": (sums["rating"] / sums["rated"]).astype(np.float32),
+                        # Restaurants with a rating, to merge appended restaurants
+                        "rated": sums["rated"].astype(np.int32),
+                        # For single-restaurant cells, the restaurant
+                        "row": sums["row"].astype(np.int32),
+                    }
+                )
+
+        # Individual restaurants, sorted by their cell at the finest level
+        self.points = self._points(x, y, latitude, longitude, rating, self.rows)
+
+    # Rows with a position on the map, and their latitude, longitude and rating
+    @staticmethod
+    def _valid(latitude, longitude, rating):
+        latitude = np.asarray(latitude, dtype="float64")
+        longitude = np.asarray(longitude, dtype="float64")
+        rating = (
+            np.full(len(latitude), np.nan) if rating is None else np.asarray(rating, dtype="float64")
+        )
+        valid = np.isfinite(latitude) & np.isfinite(longitude) & (np.abs(latitude) <= MAX_LATITUDE)
+        return np.flatnonzero(valid), latitude[valid], longitude[valid], rating[valid]
+
+    # Non-empty cells of the given cell keys, with the restaurant count, the number
+    # of rated restaurants, the sums of the positions and ratings, and the first row
+    @staticmethod
+    def _cell_sums(keys, latitude, longitude, rating, rows):
+        has_rating = ~np.isnan(rating)
+        cells, inverse = np.unique(keys, return_inverse=True)
+        first = np.full(len(cells), len(keys), dtype=np.intp)
+        np.minimum.at(first, inverse, np.arange(len(keys)))
+        return {
+            "keys": cells,
+            "counts": np.bincount(inverse, minlength=len(cells)),
+            "rated": np.bincount(inverse, weights=has_rating, minlength=len(cells)),
+            "latitude": np.bincount(inverse, weights=latitude, minlength=len(cells)),
+            "longitude": np.bincount(inverse, weights=longitude, minlength=len(cells)),
+            "rating": np.bincount(
+                inverse, weights=np.where(has_rating, rating, 0), minlength=len(cells)
+            ),
+            "row": rows[first],
+        }
+
+    def _points(self, x, y, latitude, longitude, rating, rows):
+        keys = self._keys(x, y, self.max_level)
+        order = np.argsort(keys, kind="stable")
+        return {
+            "keys": keys[order],
+            "counts": np.ones(len(order), dtype=np.int32),
+            "latitude": latitude[order].astype(np.float32),
+            "longitude": longitude[order].astype(np.float32),
+            "rating": rating[order].astype(np.float32),
+            "rated": (~np.isnan(rating[order])).astype(np.int32),
+            "row": rows[order].astype(np.int32),
+        }
+
+    # New grid over `latitude`, `longitude` and `rating`, whose rows before `start`
+    # are the rows this grid was built on, and whose rows from `start` on were
+    # appended: the cells of the new rows are merged into the levels instead of
+    # aggregating every row again. The merged means are computed from the stored
+    # (float32) means, so they may differ from a rebuild in the last bits. This
+    # grid is left untouched (callbacks may still be reading it).
+    def appended(self, latitude, longitude, rating, start):
+        grid = copy.copy(self)
+        rows, latitude, longitude, rating = self._valid(
+            np.asarray(latitude)[start:],
+            np.asarray(longitude)[start:],
+            None if rating is None else np.asarray(rating)[start:],
+        )
+        rows = start + rows
+        if not len(rows):
+            return grid
+        grid.rows = np.concatenate([self.rows, rows])
+        x, y = mercator(longitude, latitude)
+
+        extent = (longitude.min(), latitude.min(), longitude.max(), latitude.max())
+        if len(self.rows):
+            west, south, east, north = self.bounds
+            extent = (
+                min(west, extent[0]),
+                min(south, extent[1]),
+                max(east, extent[2]),
+                max(north, extent[3]),
+            )
+        grid.bounds = tuple(float(value) for value in extent)
+
+        grid.levels = [
+            self._merge_cells(
+                table, self._cell_sums(self._keys(x, y, level), latitude, longitude, rating, rows)
+            )
+            for level, table in enumerate(self.levels)
+        ]
+
+        # New restaurants go after the restaurants of the same cell (like a stable sort)
+        points = self._points(x, y, latitude, longitude, rating, rows)
+        positions = np.searchsorted(self.points["keys"], points["keys"], side="right")
+        grid.points = {
+            name: np.insert(values, positions, points[name])
+            for name, values in self.points.items()
+        }
+        return grid
+
+    # Cells of `table` with the cells of `sums` (see `_cell_sums`) added
+    @staticmethod
+    def _merge_cells(table, sums):
+        positions = np.searchsorted(table["keys"], sums["keys"])
+        found = positions < len(table["keys"])
+        found[found] = table["keys"][positions[found]] == sums["keys"][found]
+
+        # Cells that already have restaurants: combine the counts and the means
+        merged = {name: values.copy() for name, values in table.items()}
+        at = positions[found]
+        counts = table["counts"][at] + sums["counts"][found]
+        rated = table["rated"][at] + sums["rated"][found]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name in ("latitude", "longitude"):
+                merged[name][at] = (
+                    table[name][at] * table["counts"][at].astype("float64") + sums[name][found]
+                ) / counts
+            rating_sums = np.where(
+                table["rated"][at] > 0, table["rating"][at] * table["rated"][at].astype("float64"), 0
+            )
+            merged["rating"][at] = (rating_sums + sums["rating"][found]) / rated
+        merged["counts"][at] = counts
+        merged["rated"][at] = rated
+
+        # New cells, in key order
+        new = ~found
+        with np.errstate(invalid="ignore", divide="ignore"):
+            added = {
+                "keys": sums["keys"][new],
+                "counts": sums["counts"][new],
+                "latitude": sums["latitude"][new] / sums["counts"][new],
+                "longitude": sums["longitude"][new] / sums["counts"][new],
+                "rating": sums["rating"][new] / sums["rated"][new],
+                "rated": sums["rated"][new],
+                "row": sums["row"][new],
+            }
+        return {
+            name: np.insert(values, positions[new], added[name].astype(values.dtype))
+            for name, values in merged.items()
+        }
+
+    def _cells(self, level):
+        return (2**level) * self.cells_per_tile
+
+    # Cell key: column in the high 32 bits, row in the low 32 bits
+    def _keys(self, x, y, level):
+        n = self._cells(level)
+        return (np.floor(x * n).astype(np.int64) << 32) | np.floor(y * n).astype(np.int64)
+
+    def _in_view(self, table, level, x0, y0, x1, y1):
+        n = self._cells(level)
+        column0, column1 = int(x0 * n), int(x1 * n)
+        row0, row1 = int(y0 * n), int(y1 * n)
+        keys = table["keys"]
+        start = np.searchsorted(keys, column0 << 32, side="left")
+        end = np.searchsorted(keys, (column1 + 1) << 32, side="left")
+        rows = keys[start:end] & 0xFFFFFFFF
+        return start + np.flatnonzero((rows >= row0) & (rows <= row1))
+
+    # Grid level at which a viewport `span` wide (in Mercator units) is about
+    # `cells_across` cells wide
+    def level_for_span(self, span, cells_across=32):
+        span = max(span, 1e-12)
+        return int(math.floor(math.log2(cells_across / (span * self.cells_per_tile))))
+
+    # Markers of a viewport (west, south, east, north, in degrees), at most `budget` of them.
+    # Returns (level, markers): level is None for individual restaurants; markers maps
+    # "latitude", "longitude", "counts", "rating", "row" to arrays.
+    def query(self, bounds, budget=500, cells_across=32):
+        west, south, east, north = bounds
+        (x0, x1), (y1, y0) = mercator([west, east], [south, north])
+        level = self.level_for_span(x1 - x0, cells_across)
+
+        if level > self.max_level:
+            positions = self._in_view(self.points, self.max_level, x0, y0, x1, y1)
+            if len(positions) <= budget:
+                return None, {key: values[positions] for key, values in self.points.items()}
+            level = self.max_level
+
+        for level in range(max(min(level, self.max_level), 0), -1, -1):
+            table = self.levels[level]
+            positions = self._in_view(table, level, x0, y0, x1, y1)
+            if len(positions) <= budget or level == 0:
+                break
+        if len(positions) > budget:
+            # Even the coarsest level doesn't fit: keep the largest clusters
+            positions = positions[np.argsort(-table["counts"][positions], kind="stable")[:budget]]
+        return level, {key: values[positions] for key, values in table.items()}
@@ -0,0 +1,135 @@
+import dash
+import pandas as pd
+from dash import dcc, html
+from dash.dependencies import Input, Output
+
+from callback_metrics import instrument_callbacks_from_env
+from callback_timing import count, step
+from dataset_archive import read_dataset_csv
+from figure_builder import line_figure, line_patch
+from session_recording import record_sessions_from_env
+from timeseries_pyramid import METHODS, SeriesPyramid
+
+# Zoomable chart of the Amazon stock Close prices (amzn.csv).
+#
+# plotly_exercise_1.py sends every daily point to px.line, which doesn't scale to
+# longer or finer (intraday) series. Here the series is downsampled once into a
+# pyramid of resolutions (see timeseries_pyramid.py), and every zoom / pan of the
+# chart only receives the ~2000 points of the visible window, at the finest
+# resolution that fits: zoomed in far enough, the chart shows every point.
+
+# Most points sent to the browser per window
+POINT_BUDGET = 2000
+
+# Read the stock prices (directly from datasets.zip if it hasn't been extracted)
+df_stock = read_dataset_csv("amzn.csv", usecols=["Date", "Close"], parse_dates=["Date"])
+df_stock = df_stock.sort_values("Date", kind="stable")
+
+# Timestamps in milliseconds: a date axis accepts them, and they are sent as typed arrays
+dates_ms = df_stock["Date"].to_numpy().astype("datetime64[ms]").astype("int64")
+close_pyramid = SeriesPyramid(dates_ms, df_stock["Close"].to_numpy())
+
+
+# Window [x0, x1] (milliseconds, None: open-ended) shown after a relayout event,
+# or None if the event didn't change the x axis (e.g. a new drag mode)
+def window_from_relayout(relayout_data):
+    relayout_data = relayout_data or {}
+    if relayout_data.get("xaxis.autorange"):
+        return None, None
+    if "xaxis.range" in relayout_data:
+        x0, x1 = relayout_data["xaxis.range"]
+    elif "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        x0, x1 = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    else:
+        return None
+    return tuple(pd.Timestamp(value).value // 1_000_000 for value in (x0, x1))
+
+
+def window_figure(method):
+    x, y, _ = close_pyramid.window(budget=POINT_BUDGET, method=method)
+    fig = line_figure(
+        x,
+        y,
+        x_label="Date",
+        y_label="Close Price",
+        title="Daily Close Prices",
+        x_type="date",
+    )
+    # Zoom along time only; the y axis follows the points of the window.
+    # uirevision keeps the zoom when the points are replaced.
+    fig["layout"] = {
+        **fig["layout"],
+        "yaxis": {**fig["layout"]["yaxis"], "fixedrange": True},
+        "uirevision": "stock",
+    }
+    return fig
+
+
+app = dash.Dash(__name__)
+app.layout = html.Div(
+    [
+        html.H1(
+            "Amazon Stock Prices",
+            style={"color": "blue", "textAlign": "center"},
+        ),
+        html.Div(
+            [
+                html.Label(
+                    "Downsampling:",
+                    style={"font-size": "20px", "margin-right": "10px"},
+                ),
+                dcc.RadioItems(
+                    id="downsampling-method",
+                    options={"minmax": "Min / max per bin", "lttb": "Largest triangle (LTTB)"},
+                    value=METHODS[0],
+                    inline=True,
+                ),
+            ]
+        ),
+        dcc.Graph(id="stock-chart", figure=window_figure(METHODS[0])),
+        # Window shown by the chart, [x0, x1] in milliseconds (None: open-ended)
+        dcc.Store(id="stock-window", data=[None, None]),
+    ]
+)
+
+
+# Keep the window shown by the chart after every zoom / pan. Other relayout events
+# (autosize, drag mode, ...) don't change it.
+@app.callback(
+    Output("stock-window", "data"),
+    Input("stock-chart", "relayoutData"),
+    prevent_initial_call=True,
+)
+def update_window(relayout_data):
+    window = window_from_relayout(relayout_data)
+    return dash.no_update if window is None else list(window)
+
+
+# Replace the points of the line with those of the window, at the finest
+# resolution that fits in the point budget
+@app.callback(
+    Output("stock-chart", "figure"),
+    Input("stock-window", "data"),
+    Input("downsampling-method", "value"),
+    prevent_initial_call=True,
+)
+def update_chart(window, method):
+    with step("window"):
+        x, y, level = close_pyramid.window(*window, budget=POINT_BUDGET, method=method)
+    count("points", len(x))
+    count("level", level)
+    with step("figure"):
+        fig = line_patch(x, y)
+    return fig
+
+
+# Measurement mode: per-callback metrics on /metrics (CALLBACK_METRICS=1)
+instrument_callbacks_from_env(app)
+
+# Record the callback requests of the user sessions for load_test.py (RECORD_SESSIONS=file)
+record_sessions_from_env(app)
+
+
+# Execute the application server with debug enabled
+if __name__ == "__main__":
+    app.run(debug=True)
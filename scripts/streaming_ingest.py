@@ -0,0 +1,301 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from multivalue_index import MultiValueColumn
+from rollup_cube import RollupCube
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Streaming ingestion of the restaurants CSV, for datasets larger than RAM.
+#
+# The dashboards load the whole CSV into one DataFrame, which stops working for
+# the full European TripAdvisor dump (tens of GB). This module reads the CSV
+# (or a CSV inside a .zip archive, without extracting it) in chunks, keeps only
+# the columns the callbacks need with compact dtypes, and folds every chunk
+# into the aggregates the callbacks query:
+#
+#   - the region x price_level x rating bucket [x cuisine] counts of RollupCube;
+#   - for every (region, rating bucket) cell, its top-k restaurants by number of
+#     reviews, which is enough to answer "top k" for any region selection and
+#     rating range.
+#
+# No rows are kept after their chunk has been processed, so peak memory depends
+# on the chunk size and on the number of distinct regions / cuisines, not on the
+# size of the file. Progress (rows/sec, current and peak RSS) is reported after
+# every chunk.
+#
+# Run from the folder that contains `datasets/`:
+#   python scripts/streaming_ingest.py datasets.zip --chunksize 20000
+
+INGEST_COLUMNS = [
+    "restaurant_name",
+    "region",
+    "price_level",
+    "cuisines",
+    "avg_rating",
+    "total_reviews_count",
+]
+INGEST_DTYPES = {
+    "region": "category",
+    "price_level": "category",
+    "avg_rating": "float32",
+    "total_reviews_count": "float32",
+}
+DEFAULT_MEMBER = "datasets/tripadvisor_restaurants_greece.csv"
+
+
+# ----- Memory reporting -----
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return float("nan")
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# ----- Input -----
+
+
+# Open a CSV file, or a CSV member of a .zip archive, as a binary stream
+@contextlib.contextmanager
+def open_csv(path, member=None):
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            with archive.open(member or DEFAULT_MEMBER) as f:
+                yield f
+    else:
+        with open(path, "rb") as f:
+            yield f
+
+
+# ----- Aggregation -----
+
+
+# Grows a dictionary of values -> integer codes, in order of first appearance
+class _Dictionary:
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, values):
+        for value in values:
+            if value not in self.codes:
+                self.codes[value] = len(self.values)
+                self.values.append(value)
+
+    # Codes of `values` (-1 for missing values), adding unseen values first
+    def encode(self, values):
+        self.add(pd.unique(values.dropna()))
+        return pd.Index(self.values, dtype=object).get_indexer(values.astype(object))
+
+
+# Return `array` enlarged (never shrunk) to `shape`, new cells set to `fill`
+def _grow(array, shape, fill=0):
+    shape = tuple(max(old, new) for old, new in zip(array.shape, shape))
+    if shape == array.shape:
+        return array
+    grown = np.full(shape, fill, dtype=array.dtype)
+    grown[tuple(slice(0, size) for size in array.shape)] = array
+    return grown
+
+
+class StreamingAggregates:
+    def __init__(self, resolution=0.1, top_k=10):
+        self.resolution = resolution
+        self.top_k = top_k
+
+        self.regions = _Dictionary()
+        self.price_levels = _Dictionary()
+        self.cuisines = _Dictionary()
+
+        # Price axis: slot 0 holds restaurants without a price level, slot i + 1
+        # the i-th price level seen (reordered when the cube is finalized)
+        self.restaurant_cube = np.zeros((0, 1, 0), dtype=np.int64)
+        self.cuisine_cube = np.zeros((0, 1, 0, 0), dtype=np.int64)
+        self.cuisine_first_seen = np.zeros((0, 1, 0, 0), dtype=np.int64)
+        self.top_candidates = pd.DataFrame(
+            {
+                "region_code": pd.Series(dtype=np.intp),
+                "bucket": pd.Series(dtype=np.intp),
+                "row": pd.Series(dtype=np.int64),
+                "restaurant_name": pd.Series(dtype=object),
+                "total_reviews_count": pd.Series(dtype="float32"),
+            }
+        )
+
+        self.row_count = 0
+        self.value_count = 0
+
+    def add_chunk(self, chunk):
+        region_codes = self.regions.encode(chunk["region"])
+        price_slots = self.price_levels.encode(chunk["price_level"]) + 1
+        ratings = chunk["avg_rating"].to_numpy(dtype="float64")
+
+        valid = ~np.isnan(ratings) & (region_codes >= 0)
+        buckets = np.zeros(len(chunk), dtype=np.intp)
+        buckets[valid] = np.rint(ratings[valid] / self.resolution).astype(np.intp)
+        rows = np.flatnonzero(valid)
+
+        # Restaurant counts
+        n_buckets = int(buckets.max(initial=0)) + 1
+        shape = (len(self.regions), len(self.price_levels) + 1, n_buckets)
+        self.restaurant_cube = _grow(self.restaurant_cube, shape)
+        np.add.at(
+            self.restaurant_cube, (region_codes[rows], price_slots[rows], buckets[rows]), 1
+        )
+
+        # Cuisine counts, and the global position of the first value in each cell
+        cuisines_column = MultiValueColumn(chunk["cuisines"])
+        self.cuisines.add(cuisines_column.terms)
+        term_codes = pd.Index(self.cuisines.values, dtype=object).get_indexer(
+            cuisines_column.terms
+        )
+        value_rows = np.repeat(np.arange(len(chunk)), np.diff(cuisines_column.indptr))
+        value_offsets = self.value_count + np.arange(len(value_rows))
+        self.value_count += len(value_rows)
+        keep = valid[value_rows]
+        value_rows = value_rows[keep]
+
+        cuisine_shape = self.restaurant_cube.shape + (len(self.cuisines),)
+        self.cuisine_cube = _grow(self.cuisine_cube, cuisine_shape)
+        self.cuisine_first_seen = _grow(
+            self.cuisine_first_seen, cuisine_shape, fill=np.iinfo(np.int64).max
+        )
+        cells = (
+            region_codes[value_rows],
+            price_slots[value_rows],
+            buckets[value_rows],
+            term_codes[cuisines_column.indices[keep]],
+        )
+        np.add.at(self.cuisine_cube, cells, 1)
+        np.minimum.at(self.cuisine_first_seen, cells, value_offsets[keep])
+
+        # Top-k candidates per (region, rating bucket) cell
+        new_candidates = pd.DataFrame(
+            {
+                "region_code": region_codes[rows],
+                "bucket": buckets[rows],
+                "row": self.row_count + rows,
+                "restaurant_name": chunk["restaurant_name"].to_numpy(dtype=object)[rows],
+                "total_reviews_count": chunk["total_reviews_count"].to_numpy()[rows],
+            }
+        )
+        candidates = pd.concat([self.top_candidates, new_candidates], ignore_index=True)
+        candidates = candidates.sort_values(
+            ["total_reviews_count", "row"], ascending=[False, True], na_position="last"
+        )
+        self.top_candidates = candidates.groupby(["region_code", "bucket"]).head(self.top_k)
+
+        self.row_count += len(chunk)
+
+    # Region codes / rating bucket range matching the dashboard filters
+    def _selection(self, selected_regions, rating_range):
+        codes = None
+        if selected_regions:
+            codes = [
+                self.regions.codes[region]
+                for region in selected_regions
+                if region in self.regions.codes
+            ]
+        low, high = rating_range
+        first_bucket = np.ceil(low / self.resolution - 1e-9)
+        last_bucket = np.floor(high / self.resolution + 1e-9)
+        return codes, first_bucket, last_bucket
+
+    # Top restaurants by number of reviews, for the given filters
+    def top_restaurants(self, selected_regions, rating_range, n=10):
+        codes, first_bucket, last_bucket = self._selection(selected_regions, rating_range)
+        candidates = self.top_candidates
+        mask = (candidates["bucket"] >= first_bucket) & (candidates["bucket"] <= last_bucket)
+        if codes is not None:
+            mask &= candidates["region_code"].isin(codes)
+        # Candidates are kept sorted, so the first n matches are the answer
+        return candidates.loc[mask, ["restaurant_name", "total_reviews_count"]].head(n)
+
+    # Counts as a RollupCube (price levels in sorted order, like value_counts)
+    def to_rollup_cube(self):
+        price_order = np.argsort(np.array(self.price_levels.values, dtype=object))
+        price_axis = np.concatenate([price_order + 1, [0]])
+        return RollupCube.from_arrays(
+            regions=self.regions.values,
+            price_levels=[self.price_levels.values[i] for i in price_order],
+            cuisines=self.cuisines.values,
+            restaurant_cube=self.restaurant_cube[:, price_axis],
+            cuisine_cube=self.cuisine_cube[:, price_axis],
+            cuisine_first_seen=self.cuisine_first_seen[:, price_axis],
+            resolution=self.resolution,
+        )
+
+
+# Read the CSV chunk by chunk and build the aggregates, reporting progress
+def ingest(path, member=None, chunksize=50_000, report=print):
+    aggregates = StreamingAggregates()
+    start = time.perf_counter()
+
+    with open_csv(path, member) as f:
+        for chunk in pd.read_csv(
+            f, usecols=INGEST_COLUMNS, dtype=INGEST_DTYPES, chunksize=chunksize
+        ):
+            aggregates.add_chunk(chunk)
+            elapsed = time.perf_counter() - start
+            if report is not None:
+                report(
+                    f"{aggregates.row_count:>12,} rows  "
+                    f"{aggregates.row_count / elapsed:>10,.0f} rows/s  "
+                    f"RSS {current_rss_mb():>7.1f} MB  peak {peak_rss_mb():>7.1f} MB"
+                )
+
+    return aggregates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream the restaurants CSV in chunks and build the dashboard aggregates"
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default="datasets/tripadvisor_restaurants_greece.csv",
+        help="CSV file, or .zip archive containing it",
+    )
+    parser.add_argument(
+        "--member", help=f"CSV inside the .zip archive (default: {DEFAULT_MEMBER})"
+    )
+    parser.add_argument("--chunksize", type=int, default=50_000, help="rows per chunk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    aggregates = ingest(args.path, member=args.member, chunksize=args.chunksize)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"Ingested {aggregates.row_count:,} rows in {elapsed:.2f} s "
+        f"({aggregates.row_count / elapsed:,.0f} rows/s), peak RSS {peak_rss_mb():.1f} MB"
+    )
+    print(
+        f"{len(aggregates.regions)} regions, {len(aggregates.price_levels)} price levels, "
+        f"{len(aggregates.cuisines)} cuisines, {len(aggregates.top_candidates):,} top-k candidates"
+    )
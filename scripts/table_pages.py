@@ -0,0 +1,307 @@
+import copy
+import math
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Server-side pages of a dash_table.DataTable over the filtered restaurants.
+#
+# The table runs with page_action / sort_action / filter_action = "custom": the
+# browser only sends the page number, the sort columns and the filter query, and
+# only the rows and columns of the visible page are sent back.
+#
+#   - Every sortable column is ranked once at load time (its position in a stable
+#     sort, ascending and descending, missing values last), so sorting a set of
+#     rows is an integer argsort, and an unfiltered sort is the precomputed order.
+#     Rows appended to the dataset are merged into these orders (`appended`).
+#   - The filter query of the table header ({column} op value && ...) is applied
+#     to the rows; text conditions are evaluated once per distinct value of a
+#     dictionary-encoded column, then looked up through its codes.
+#   - The ordered rows of a (row set, filter, sort) are kept in a small LRU, so
+#     moving between pages only slices them: the cost of a page fetch is the
+#     size of the page, not the size of the dataset.
+
+# Operators of the DataTable filter syntax -> operator names. Each can be
+# prefixed with "s" / "i" (case-sensitive / insensitive); without a prefix, text
+# is compared as set by `case_sensitive` (insensitive by default, like the
+# table's filter_options in restaurants_dashboard.py).
+FILTER_OPERATORS = {
+    ">=": "ge",
+    "<=": "le",
+    "!=": "ne",
+    "<": "lt",
+    ">": "gt",
+    "=": "eq",
+    "ge": "ge",
+    "le": "le",
+    "ne": "ne",
+    "lt": "lt",
+    "gt": "gt",
+    "eq": "eq",
+    "contains": "contains",
+    "datestartswith": "datestartswith",
+}
+FILTER_PART = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s*(?P<operator>[si]?(?:"
+    + "|".join(re.escape(operator) for operator in sorted(FILTER_OPERATORS, key=len, reverse=True))
+    + r"))\s*(?P<value>.*?)\s*$"
+)
+
+
+# Parse one part of a filter query ("{avg_rating} >= 4") into (column, operator, value, case),
+# operator being one of the names of FILTER_OPERATORS and case the prefix of the
+# operator ("s", "i", or None without one). None if it can't be parsed.
+def parse_filter_part(part):
+    match = FILTER_PART.match(part)
+    if match is None:
+        return None
+    operator, case = match["operator"], None
+    if operator not in FILTER_OPERATORS:
+        operator, case = operator[1:], operator[0]
+    value = match["value"]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"`":
+        value = value[1:-1].replace("\\" + value[0], value[0])
+    return match["column"], FILTER_OPERATORS[operator], value, case
+
+
+def _compare(values, operator, value):
+    if operator == "eq":
+        return values == value
+    if operator == "ne":
+        return values != value
+    if operator == "lt":
+        return values < value
+    if operator == "le":
+        return values <= value
+    if operator == "gt":
+        return values > value
+    if operator == "ge":
+        return values >= value
+    raise ValueError(operator)
+
+
+class TablePages:
+    def __init__(self, df, columns, max_entries=64, case_sensitive=False):
+        self.df = df
+        self.columns = list(columns)
+        self.row_count = len(df)
+        self.max_entries = max_entries
+        # Text comparisons of the operators without an "s" / "i" prefix
+        self.case_sensitive = case_sensitive
+
+        # column -> (ascending ranks, descending ranks, ascending order, descending order)
+        self._ranks = {column: self._rank(df[column]) for column in self.columns}
+        self._orders = OrderedDict()  # (rowset key, filter, sort) -> ordered rows
+        self._lock = threading.Lock()
+
+        self._arrays = self._column_arrays(df, self.columns)
+
+    # Raw arrays of the columns, to build the records of a page without pandas:
+    # column -> (codes, distinct values + None for code -1) or (values, None)
+    @staticmethod
+    def _column_arrays(df, columns):
+        arrays = {}
+        for column in columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories = np.append(np.asarray(values.cat.categories, dtype=object), None)
+                arrays[column] = (np.asarray(values.array.codes), categories)
+            else:
+                arrays[column] = (values.to_numpy(), None)
+        return arrays
+
+    # Sort keys of the values of a column (NaN for missing values): the values of a
+    # number column, the rank of the value among the distinct values of a text column
+    @staticmethod
+    def _sort_keys(values):
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            return values.to_numpy(dtype="float64", na_value=np.nan)
+        # Rank the distinct values once, then spread the ranks through the codes
+        categories = np.asarray(values.cat.categories, dtype=object).astype(str)
+        category_rank = np.empty(len(categories), dtype=np.int64)
+        category_rank[np.argsort(categories, kind="stable")] = np.arange(len(categories))
+        codes = np.asarray(values.array.codes)
+        keys = category_rank[codes].astype("float64")
+        keys[codes < 0] = np.nan
+        return keys
+
+    # Ranks of the rows in `order` (sorted by `direction_keys`, missing values last)
+    # among the distinct keys
+    @staticmethod
+    def _dense_rank(order, direction_keys, missing):
+        sorted_keys = direction_keys[order]
+        sorted_missing = missing[order]
+        distinct = np.ones(len(order), dtype=bool)
+        distinct[1:] = (sorted_keys[1:] != sorted_keys[:-1]) | (
+            sorted_missing[1:] != sorted_missing[:-1]
+        )
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.cumsum(distinct) - 1
+        return rank
+
+    # Ranks of the values of a column among its distinct values (equal values share a
+    # rank, so that sorts on several columns work) in both directions, and the order
+    # of a stable sort of every row in both directions. Missing values rank last.
+    @classmethod
+    def _rank(cls, values):
+        keys = cls._sort_keys(values)
+        missing = np.isnan(keys)
+        result = []
+        for direction_keys in (np.where(missing, 0, keys), np.where(missing, 0, -keys)):
+            order = np.lexsort((direction_keys, missing))
+            result.append((cls._dense_rank(order, direction_keys, missing), order.astype(np.int32)))
+        (ascending_rank, ascending), (descending_rank, descending) = result
+        return ascending_rank, descending_rank, ascending, descending
+
+    # The ranks of `_rank` for `values`, from the ranks of its rows before `start`:
+    # the orders of these rows are still sorted (the distinct values of a text column
+    # keep their relative order), so only the rows from `start` on are sorted, then
+    # inserted after the rows with the same value, as a stable sort would.
+    @classmethod
+    def _appended_rank(cls, ranks, values, start):
+        keys = cls._sort_keys(values)
+        missing = np.isnan(keys)
+        result = []
+        for direction_keys, order in (
+            (np.where(missing, 0, keys), ranks[2]),
+            (np.where(missing, 0, -keys), ranks[3]),
+        ):
+            new_rows = start + np.lexsort((direction_keys[start:], missing[start:]))
+            # Rows with a value, then missing values (which stay in row order)
+            valid = len(order) - int(missing[:start].sum())
+            positions = np.where(
+                missing[new_rows],
+                len(order),
+                np.searchsorted(direction_keys[order[:valid]], direction_keys[new_rows], side="right"),
+            )
+            order = np.insert(order, positions, new_rows.astype(np.int32))
+            result.append((cls._dense_rank(order, direction_keys, missing), order))
+        (ascending_rank, ascending), (descending_rank, descending) = result
+        return ascending_rank, descending_rank, ascending, descending
+
+    # New pages over `df`, whose rows before `start` are the rows these pages were
+    # built on, and whose rows from `start` on were appended. These pages are left
+    # untouched (callbacks may still be reading them).
+    def appended(self, df, start):
+        pages = copy.copy(self)
+        pages.df = df
+        pages.row_count = len(df)
+        pages._ranks = {
+            column: self._appended_rank(self._ranks[column], df[column], start)
+            for column in self.columns
+        }
+        # Ordered rows are keyed by row set, whose keys change with the dataset version
+        pages._orders = OrderedDict()
+        pages._lock = threading.Lock()
+        pages._arrays = self._column_arrays(df, self.columns)
+        return pages
+
+    # Rows (sorted positions) that match a DataTable filter query
+    def filter_rows(self, rows, filter_query):
+        for part in (filter_query or "").split(" && "):
+            if not part.strip():
+                continue
+            parsed = parse_filter_part(part)
+            if parsed is None or parsed[0] not in self.columns:
+                continue
+            column, operator, value, case = parsed
+            values = self.df[column]
+
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Evaluate the condition on the distinct values, then on the codes
+                categories = pd.Series(values.cat.categories.astype(str))
+                case_sensitive = self.case_sensitive if case is None else case == "s"
+                if not case_sensitive and operator != "datestartswith":
+                    categories, value = categories.str.casefold(), value.casefold()
+                if operator == "contains":
+                    matches = categories.str.contains(value, regex=False)
+                    matches = matches.to_numpy(dtype=bool)
+                elif operator == "datestartswith":
+                    matches = categories.str.startswith(value).to_numpy(dtype=bool)
+                else:
+                    matches = _compare(categories.to_numpy(dtype=object), operator, value)
+                    matches = np.asarray(matches, dtype=bool)
+                codes = np.asarray(values.array.codes)[rows]
+                keep = (codes >= 0) & matches[np.maximum(codes, 0)]
+            else:
+                try:
+                    number = float(value)
+                except ValueError:
+                    return rows[:0]
+                # "contains" on a number column means equality, like the DataTable does
+                operator = "eq" if operator in ("contains", "datestartswith") else operator
+                with np.errstate(invalid="ignore"):
+                    keep = _compare(values.to_numpy()[rows].astype("float64"), operator, number)
+            rows = rows[keep]
+        return rows
+
+    # Rows in the order of a DataTable sort_by ([{"column_id": ..., "direction": ...}])
+    def sort_rows(self, rows, sort_by, all_rows=False):
+        sort_by = [
+            entry for entry in sort_by or [] if entry.get("column_id") in self._ranks
+        ]
+        if not sort_by:
+            return rows
+        if all_rows and len(sort_by) == 1:
+            # Every row: the precomputed order
+            ascending, descending = self._ranks[sort_by[0]["column_id"]][2:]
+            return ascending if sort_by[0]["direction"] == "asc" else descending
+
+        keys = [
+            self._ranks[entry["column_id"]][0 if entry["direction"] == "asc" else 1][rows]
+            for entry in sort_by
+        ]
+        # np.lexsort sorts by the last key first; ties stay in row order
+        return rows[np.lexsort(keys[::-1])]
+
+    # Rows of the table, filtered and ordered; memoized per (key, filter, sort).
+    # `rows` are the sorted positions of the row set `key`, or a function returning
+    # them, which is only called when the ordered rows aren't memoized.
+    def ordered_rows(self, key, rows, filter_query=None, sort_by=None):
+        cache_key = (
+            key,
+            filter_query or "",
+            tuple((entry["column_id"], entry["direction"]) for entry in sort_by or []),
+        )
+        with self._lock:
+            ordered = self._orders.get(cache_key)
+            if ordered is not None:
+                self._orders.move_to_end(cache_key)
+                return ordered
+
+        filtered = self.filter_rows(rows() if callable(rows) else rows, filter_query)
+        ordered = self.sort_rows(filtered, sort_by, all_rows=len(filtered) == self.row_count)
+        with self._lock:
+            self._orders[cache_key] = ordered
+            while len(self._orders) > self.max_entries:
+                self._orders.popitem(last=False)
+        return ordered
+
+    # Records of the given rows, with only the given columns (missing values as None)
+    def records(self, rows, columns=None):
+        data = {}
+        for column in columns or self.columns:
+            values, categories = self._arrays[column]
+            if categories is not None:
+                # Code -1 (missing) picks the trailing None
+                data[column] = categories[values[rows]].tolist()
+            else:
+                data[column] = [
+                    None if value != value else value for value in values[rows].tolist()
+                ]
+        names = list(data)
+        return [dict(zip(names, row)) for row in zip(*data.values())]
+
+    # One page of the table: (records, page count, page number, matching rows)
+    def page(
+        self, key, rows, page_current, page_size, filter_query=None, sort_by=None, columns=None
+    ):
+        ordered = self.ordered_rows(key, rows, filter_query, sort_by)
+        page_count = max(math.ceil(len(ordered) / page_size), 1)
+        page_current = min(max(page_current or 0, 0), page_count - 1)
+        start = page_current * page_size
+        page_rows = ordered[start : start + page_size]
+        return self.records(page_rows, columns), page_count, page_current, len(ordered)
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Multi-resolution downsampling of a long time series, for zoomable line charts.
+#
+# Sending every point of a series to the browser freezes it once the series has
+# millions of points, and a chart can't show more points than it has pixels
+# anyway. The series is downsampled once, at load time, into a pyramid of
+# levels, each `factor` times coarser than the previous one:
+#
+#   level 0: every point;
+#   level k: the series cut into bins of factor^k points, reduced per bin by
+#            - "minmax": the lowest and the highest point of the bin (in time
+#              order), so spikes are never lost (each level is built from the
+#              previous one: the extremes of a bin are among the extremes of its
+#              sub-bins);
+#            - "lttb": Largest-Triangle-Three-Buckets, the point of each bin that
+#              keeps the visual shape of the line best (built from the previous
+#              level, with as many points as the minmax level).
+#
+# Every level keeps the indices of its points and their x values (sorted), so
+# serving a window is a binary search per level, to find the finest level that
+# has at most `budget` points in the window, and a slice: the cost depends on
+# the budget, not on the length of the series.
+
+METHODS = ["minmax", "lttb"]
+
+
+# Indices of the lowest and highest point of each group of `factor` consecutive
+# candidates, from the (lowest, highest) candidates of the previous level
+def _bin_extremes(y, lowest, highest, factor):
+    padding = -len(lowest) % factor
+    # Pad the last bin with its last candidate, which doesn't change its extremes
+    lowest = np.concatenate([lowest, np.repeat(lowest[-1:], padding)]).reshape(-1, factor)
+    highest = np.concatenate([highest, np.repeat(highest[-1:], padding)]).reshape(-1, factor)
+    rows = np.arange(len(lowest))
+    return (
+        lowest[rows, np.argmin(y[lowest], axis=1)],
+        highest[rows, np.argmax(y[highest], axis=1)],
+    )
+
+
+# Points (indices, in time order) of a minmax level
+def _minmax_points(lowest, highest):
+    points = np.column_stack([np.minimum(lowest, highest), np.maximum(lowest, highest)]).ravel()
+    # Bins whose lowest and highest points are the same point
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = points[1:] != points[:-1]
+    return points[keep]
+
+
+# Largest-Triangle-Three-Buckets: `n_out` of the given points (indices into x / y,
+# in time order), always keeping the first and the last one
+def lttb(x, y, points, n_out):
+    n_in = len(points)
+    if n_out >= n_in:
+        return points
+    if n_out < 3:
+        return points[[0, -1]][:n_out]
+    # Plain Python floats: the buckets have a few points each (one pyramid level
+    # to the next), where NumPy calls would cost more than the arithmetic
+    px = x[points].tolist()
+    py = y[points].tolist()
+
+    # Bucket boundaries of the n_out - 2 middle buckets
+    edges = np.linspace(1, n_in - 1, n_out - 1).astype(np.intp).tolist() + [n_in]
+    selected = [0]
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end, next_end = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        # Third corner of the triangles: the mean of the next bucket
+        next_x = sum(px[end:next_end]) / (next_end - end)
+        next_y = sum(py[end:next_end]) / (next_end - end)
+        # Keep the candidate with the largest triangle (previous point, candidate, next mean)
+        x_a, y_a = px[previous], py[previous]
+        best_area = -1.0
+        for candidate in range(start, end):
+            area = abs((x_a - next_x) * (py[candidate] - y_a) - (x_a - px[candidate]) * (next_y - y_a))
+            if area > best_area:
+                best_area, previous = area, candidate
+        selected.append(previous)
+    selected.append(n_in - 1)
+    return points[selected]
+
+
+class SeriesPyramid:
+    # x: sorted numbers (e.g. timestamps in milliseconds), y: values
+    def __init__(self, x, y, factor=4, min_points=512, methods=METHODS):
+        self.x = np.asarray(x, dtype="float64")
+        self.y = np.asarray(y, dtype="float64")
+        if len(self.x) and np.any(np.diff(self.x) < 0):
+            raise ValueError("x must be sorted")
+        self.factor = factor
+
+        everything = np.arange(len(self.x))
+        # method -> list of levels, each a (point indices, x of the points) pair
+        self.levels = {method: [(everything, self.x)] for method in methods}
+
+        lowest = highest = everything
+        while len(lowest) > min_points:
+            lowest, highest = _bin_extremes(self.y, lowest, highest, factor)
+            points = _minmax_points(lowest, highest)
+            if "minmax" in self.levels:
+                self.levels["minmax"].append((points, self.x[points]))
+            if "lttb" in self.levels:
+                previous = self.levels["lttb"][-1][0]
+                lttb_points = lttb(self.x, self.y, previous, len(points))
+                self.levels["lttb"].append((lttb_points, self.x[lttb_points]))
+
+    @property
+    def bounds(self):
+        return float(self.x[0]), float(self.x[-1])
+
+    # (x, y, level) of the points of the window [x0, x1] (None: open-ended), at the
+    # finest level with at most `budget` points in the window. One point on each
+    # side of the window is included, so the line runs to the edges of the chart.
+    def window(self, x0=None, x1=None, budget=2000, method="minmax"):
+        levels = self.levels[method]
+        for level, (points, points_x) in enumerate(levels):
+            start = 0 if x0 is None else int(np.searchsorted(points_x, x0, side="left"))
+            end = len(points) if x1 is None else int(np.searchsorted(points_x, x1, side="right"))
+            if end - start <= budget:
+                break
+        start, end = max(start - 1, 0), min(end + 1, len(points))
+        selected = points[start:end]
+        return self.x[selected], self.y[selected], level
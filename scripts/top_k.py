@@ -0,0 +1,93 @@
+import copy
+
+import numpy as np
+
+# Top-k selection for the "Top 10 Restaurants" charts.
+#
+# `df.sort_values(by="total_reviews_count", ascending=False).head(10)` sorts every
+# row just to keep ten. Here:
+#
+#   - `top_k_positions` selects the k largest values with a partial selection
+#     (np.partition, O(n)) and only sorts the few candidates;
+#   - `TopKIndex` precomputes the top-k rows of every group (city, or city and
+#     price level) once at load time, so a dropdown lookup is a dict access.
+#
+# Ordering is deterministic: descending value, ties in original row order,
+# missing values last. This is the order of a stable `sort_values`; the default
+# (quicksort) sort used before gave the same results except for the order of
+# restaurants with exactly the same number of reviews, which it left unspecified.
+#
+# When rows are appended to the dataset, `TopKIndex.appended` ranks only the new
+# rows and merges them into the top-k lists of their groups.
+
+
+# Positions of the k largest entries of `values` (restricted to `rows` if given),
+# in the order described above
+def top_k_positions(values, k, rows=None):
+    values = np.asarray(values)
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.intp)
+        values = values[rows]
+    # Compact (float32) columns are only converted for the selected rows
+    values = values.astype("float64", copy=False)
+
+    # Missing values rank below every number, like na_position="last"
+    keys = np.where(np.isnan(values), -np.inf, values)
+    if len(keys) > k:
+        threshold = np.partition(keys, len(keys) - k)[len(keys) - k]
+        candidates = np.flatnonzero(keys >= threshold)
+    else:
+        candidates = np.arange(len(keys))
+    top = candidates[np.argsort(-keys[candidates], kind="stable")][:k]
+
+    return top if rows is None else rows[top]
+
+
+class TopKIndex:
+    def __init__(self, df, value_column, group_columns, k=10):
+        self.k = k
+        self.group_columns = list(group_columns)
+
+        values = df[value_column].to_numpy(dtype="float64")
+        keys = np.where(np.isnan(values), -np.inf, values)
+        order = np.argsort(-keys, kind="stable")
+
+        # Rows in descending order, grouped, keeping the first k of each group
+        ordered = df[self.group_columns].iloc[order].reset_index(drop=True)
+        groups = ordered.groupby(self.group_columns, observed=True, sort=False, dropna=True)
+        ranked = groups.cumcount().to_numpy()
+        keep = np.flatnonzero(ranked < k)
+
+        self.rows = {}
+        kept = ordered.iloc[keep]
+        for key, positions in kept.groupby(
+            self.group_columns, observed=True, sort=False
+        ).indices.items():
+            # Single-column groups are looked up by value, not by a 1-tuple
+            if len(self.group_columns) == 1 and isinstance(key, tuple):
+                key = key[0]
+            self.rows[key] = order[keep[positions]]
+
+    # New index over `df`, whose rows before `start` are the rows this index was
+    # built on and whose rows from `start` on were appended: each group keeps the
+    # best k of its current top-k rows and of the top-k new rows. This index is
+    # left untouched.
+    def appended(self, df, value_column, start):
+        values = df[value_column].to_numpy(dtype="float64")
+        keys = np.where(np.isnan(values), -np.inf, values)
+        delta = TopKIndex(df.iloc[start:], value_column, self.group_columns, self.k)
+
+        index = copy.copy(self)
+        index.rows = dict(self.rows)
+        for key, new_rows in delta.rows.items():
+            rows = np.concatenate(
+                [self.rows.get(key, np.empty(0, dtype=np.intp)), start + new_rows]
+            )
+            # Descending value, ties in row order
+            index.rows[key] = rows[np.lexsort((rows, -keys[rows]))][: self.k]
+        return index
+
+    # Row positions of the top-k rows of a group (empty for unknown groups)
+    def lookup(self, *key):
+        key = key[0] if len(key) == 1 else key
+        return self.rows.get(key, np.empty(0, dtype=np.intp))
@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+
+from dataset_archive import read_dataset_csv
+from figure_store import dataset_fingerprint
+
+# Country × year store of the international tourism arrivals.
+#
+# international_tourism.csv is "wide": one row per country and one column per
+# year (1960, 1961, ...), so every question about a year is a column lookup by
+# name followed by an `isin` filter over the country names. `TourismCube` melts
+# it once into integer-indexed arrays:
+#
+#   - `countries` / `codes`: the countries (World Bank aggregates such as
+#     "North America" are left out), and `country_index` from name to position;
+#   - `years`: the years, as integers;
+#   - `arrivals[country, year]`: the number of arrivals (NaN when unknown);
+#   - `rank_order[year]`: the country positions sorted by arrivals, descending,
+#     countries without a value last; `ranked_counts[year]` of them have one.
+#
+# The arrays are saved to `datasets/.cache/tourism/<content hash>.npz`, so later
+# runs don't parse the CSV again until it changes.
+
+DATASET_NAME = "international_tourism.csv"
+CACHE_DIR = os.path.join("datasets", ".cache", "tourism")
+
+# World Bank codes of regional and income groups, which are not countries
+AGGREGATE_CODES = set(
+    """
+    AFE AFW ARB CEB CSS EAP EAR EAS ECA ECS EMU EUU FCS HIC HPC IBD IBT IDA
+    IDB IDX INX LAC LCN LDC LIC LMC LMY LTE MEA MIC MNA NAC OED OSS PRE PSS
+    PST SAS SSA SSF SST TEA TEC TLA TMN TSA TSS UMC WLD
+    """.split()
+)
+
+
+class TourismCube:
+    def __init__(self, countries, codes, years, arrivals):
+        self.countries = np.asarray(countries, dtype=object)
+        self.codes = np.asarray(codes, dtype=object)
+        self.years = np.asarray(years, dtype=np.int64)
+        self.arrivals = np.asarray(arrivals, dtype="float64")
+        self.country_index = {country: i for i, country in enumerate(self.countries)}
+
+        # Missing values rank below every number; ties keep the CSV order
+        keys = np.where(np.isnan(self.arrivals), -np.inf, self.arrivals)
+        self.rank_order = np.argsort(-keys.T, axis=1, kind="stable")
+        self.ranked_counts = (~np.isnan(self.arrivals)).sum(axis=0)
+
+    # Melt the wide frame of the CSV (one column per year)
+    @classmethod
+    def from_wide(cls, df):
+        df = df[~df["Country Code"].isin(AGGREGATE_CODES)]
+        year_columns = [column for column in df.columns if str(column).isdigit()]
+        return cls(
+            countries=df["Country Name"].to_numpy(),
+            codes=df["Country Code"].to_numpy(),
+            years=[int(column) for column in year_columns],
+            arrivals=df[year_columns].to_numpy(dtype="float64"),
+        )
+
+    # Position of a year on the year axis (KeyError for years out of the data)
+    def year_position(self, year):
+        position = int(np.searchsorted(self.years, year))
+        if position == len(self.years) or self.years[position] != year:
+            raise KeyError(year)
+        return position
+
+    # Years with at least one known value
+    def years_with_data(self):
+        return self.years[self.ranked_counts > 0]
+
+    # Arrivals of the given countries in a year, in the given order (NaN for
+    # unknown countries or values)
+    def values(self, countries, year):
+        positions = np.array(
+            [self.country_index.get(country, -1) for country in countries], dtype=np.intp
+        )
+        values = np.full(len(positions), np.nan)
+        known = positions >= 0
+        values[known] = self.arrivals[positions[known], self.year_position(year)]
+        return values
+
+    # The k countries with the most arrivals in a year, and their arrivals
+    def top(self, year, k):
+        position = self.year_position(year)
+        rows = self.rank_order[position, : min(k, self.ranked_counts[position])]
+        return self.countries[rows], self.arrivals[rows, position]
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            countries=self.countries.astype(str),
+            codes=self.codes.astype(str),
+            years=self.years,
+            arrivals=self.arrivals,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(
+                countries=arrays["countries"],
+                codes=arrays["codes"],
+                years=arrays["years"],
+                arrivals=arrays["arrivals"],
+            )
+
+
+# Load the cube of the tourism dataset, from the cache if it matches the CSV
+def load_tourism_cube(cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, f"{dataset_fingerprint(DATASET_NAME)}.npz")
+    try:
+        return TourismCube.load(path)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    cube = TourismCube.from_wide(read_dataset_csv(DATASET_NAME))
+    os.makedirs(cache_dir, exist_ok=True)
+    cube.save(path)
+    return cube
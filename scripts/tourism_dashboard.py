@@ -0,0 +1,136 @@
+import dash
+import numpy as np
+from dash import dcc, html
+from dash.dependencies import Input, Output
+
+from callback_metrics import instrument_callbacks_from_env
+from callback_timing import count, step
+from figure_builder import bar_figure, bar_patch, bar_race_figure
+from figure_store import cached_figure
+from session_recording import record_sessions_from_env
+from tourism_cube import DATASET_NAME, load_tourism_cube
+
+# International tourism arrivals dashboard (international_tourism.csv).
+#
+# plotly_exercise_2.py reads the wide CSV and filters the countries with `isin`
+# on every run. Here the CSV is melted once into a country × year cube (see
+# tourism_cube.py), with the countries of every year already ranked:
+#
+#   - the "bar race" of the countries with the most arrivals is a Plotly
+#     animation: its frames (one per year, only the bars of that year) are built
+#     once, stored in the figure store, and sent with the page. Playing it or
+#     scrubbing through the years happens in the browser, without a request;
+#   - the comparison chart of a few countries reads their arrivals in the
+#     selected year from the cube, and only its bars are sent (a Patch).
+
+# Countries of the bar race
+TOP_COUNTRIES = 15
+
+# Countries compared by default (those of plotly_exercise_2.py)
+DEFAULT_COUNTRIES = ["Greece", "Spain", "France", "Italy"]
+
+tourism_cube = load_tourism_cube()
+years = tourism_cube.years_with_data().tolist()
+
+
+def build_bar_race():
+    frames = [(year, *tourism_cube.top(year, TOP_COUNTRIES)) for year in years]
+    return bar_race_figure(
+        frames,
+        x_label="Number of Tourists",
+        y_label="Country",
+        title=f"Top {TOP_COUNTRIES} Countries by Tourist Arrivals in {{label}}",
+    )
+
+
+# The frames only change with the dataset, so they are built once and then read
+# from the figure store (as serialized JSON, ready to be sent)
+bar_race = cached_figure(
+    {"name": "tourism-bar-race", "top": TOP_COUNTRIES},
+    build_bar_race,
+    datasets=[DATASET_NAME],
+    as_dict=True,
+)
+
+
+# Arrivals of the selected countries in a year, sorted in descending order
+# (countries without a value in that year are left out)
+def comparison_bars(countries, year):
+    values = tourism_cube.values(countries, year)
+    order = np.argsort(-values, kind="stable")
+    order = order[~np.isnan(values[order])]
+    return [countries[i] for i in order], values[order]
+
+
+app = dash.Dash(__name__)
+app.layout = html.Div(
+    [
+        html.H1(
+            "International Tourism Arrivals",
+            style={"color": "blue", "textAlign": "center"},
+        ),
+        dcc.Graph(id="tourism-bar-race", figure=bar_race, style={"height": "600px"}),
+        html.Div(
+            [
+                html.Label(
+                    "Compare countries:",
+                    style={"font-size": "20px", "margin-right": "10px"},
+                ),
+                dcc.Dropdown(
+                    id="country-dropdown",
+                    options=sorted(tourism_cube.countries.tolist()),
+                    value=DEFAULT_COUNTRIES,
+                    multi=True,
+                ),
+                dcc.Slider(
+                    id="year-slider",
+                    min=years[0],
+                    max=years[-1],
+                    step=1,
+                    value=years[-1],
+                    marks={year: str(year) for year in years if year % 10 == 0},
+                    tooltip={"placement": "bottom"},
+                ),
+            ]
+        ),
+        dcc.Graph(
+            id="tourism-comparison",
+            figure=bar_figure(
+                *comparison_bars(DEFAULT_COUNTRIES, years[-1]),
+                x_label="Country",
+                y_label="Number of Tourists",
+                title=f"Tourist Arrivals in {years[-1]}",
+            ),
+        ),
+    ]
+)
+
+
+# Replace the bars and the title of the comparison chart; the slider sends one
+# request per year it stops on, and each response holds a few numbers
+@app.callback(
+    Output("tourism-comparison", "figure"),
+    Input("country-dropdown", "value"),
+    Input("year-slider", "value"),
+    prevent_initial_call=True,
+)
+def update_comparison(countries, year):
+    with step("lookup"):
+        names, values = comparison_bars(countries or [], year)
+    count("bars", len(names))
+    with step("figure"):
+        fig = bar_patch(names, values)
+        fig["layout"]["title"]["text"] = f"Tourist Arrivals in {year}"
+    return fig
+
+
+# Measurement mode: per-callback metrics on /metrics (CALLBACK_METRICS=1)
+instrument_callbacks_from_env(app)
+
+# Record the callback requests of the user sessions for load_test.py (RECORD_SESSIONS=file)
+record_sessions_from_env(app)
+
+
+# Execute the application server with debug enabled
+if __name__ == "__main__":
+    app.run(debug=True)